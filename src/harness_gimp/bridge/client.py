@@ -1,8 +1,17 @@
-import json
+import functools
 import os
-from typing import Any, Dict
-from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
+import time
+from typing import TYPE_CHECKING, Any, Callable, ClassVar, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from harness_gimp.core import codec
+
+if TYPE_CHECKING:
+    from harness_gimp.bridge.transport import ConnectionPool
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_CACHE_SIZE = 128
+_MSGPACK_HEADERS = {"Content-Type": codec.MSGPACK_CONTENT_TYPE, "Accept": codec.MSGPACK_CONTENT_TYPE}
 
 
 class BridgeClientError(Exception):
@@ -12,46 +21,165 @@ class BridgeClientError(Exception):
         self.message = message
 
 
+@functools.lru_cache(maxsize=32)
+def _get_pool(host: str, port: int, socket_path: Optional[str] = None, secure: bool = False) -> "ConnectionPool":
+    # http.client pulls in ssl and email; only pay for it once a bridge URL is actually used.
+    from harness_gimp.bridge.transport import ConnectionPool
+
+    return ConnectionPool(host, port, socket_path=socket_path, secure=secure)
+
+
 class BridgeClient:
-    def __init__(self, url: str | None = None):
+    _local_handlers: ClassVar[Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]]] = {}
+
+    def __init__(self, url: str | None = None, wire: str = "json"):
         self.url = url or os.getenv("HARNESS_GIMP_BRIDGE_URL", "http://127.0.0.1:41749")
+        if wire not in ("json", "msgpack"):
+            raise BridgeClientError("INVALID_INPUT", f"Unsupported wire format: {wire}")
+        self.wire = "msgpack" if wire == "msgpack" and codec.msgpack is not None else "json"
+        parts = urlsplit(self.url)
+        if parts.scheme == "unix":
+            self._pool = _get_pool("localhost", 0, socket_path=parts.path)
+            base_path = ""
+        elif parts.scheme in ("http", "https"):
+            secure = parts.scheme == "https"
+            self._pool = _get_pool(parts.hostname or "127.0.0.1", parts.port or (443 if secure else 80), secure=secure)
+            base_path = parts.path.rstrip("/")
+        else:
+            raise BridgeClientError("INVALID_INPUT", f"Unsupported bridge URL scheme: {self.url}")
+        self._health_path = base_path + "/health"
+        self._rpc_path = base_path + "/rpc"
+        self._batch_path = base_path + "/rpc/batch"
+        self._cache: Dict[Tuple[str, bytes], Tuple[float, Dict[str, Any]]] = {}
+
+    @classmethod
+    def register_local(cls, method: str, fn: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]]) -> None:
+        if fn is None:
+            cls._local_handlers.pop(method, None)
+        else:
+            cls._local_handlers[method] = fn
+
+    def close(self) -> None:
+        self._pool.close()
+
+    async def aclose(self) -> None:
+        self._pool.close()
+
+    def _cached(self, key: Tuple[str, bytes]) -> Optional[Dict[str, Any]]:
+        hit = self._cache.get(key)
+        if hit is None:
+            return None
+        if hit[0] < time.monotonic():
+            self._cache.pop(key, None)
+            return None
+        return hit[1]
+
+    def _store(self, key: Tuple[str, bytes], cache_ttl: float, result: Dict[str, Any]) -> None:
+        if len(self._cache) >= _CACHE_SIZE:
+            self._cache.pop(next(iter(self._cache)), None)
+        self._cache[key] = (time.monotonic() + cache_ttl, result)
 
-    def health(self) -> Dict[str, Any]:
-        req = Request(f"{self.url}/health", method="GET")
+    def health(self, cache_ttl: float = 0) -> Dict[str, Any]:
+        key = (self._health_path, b"")
+        if cache_ttl > 0:
+            cached = self._cached(key)
+            if cached is not None:
+                return cached
         try:
-            with urlopen(req, timeout=5) as response:
-                return json.loads(response.read().decode("utf-8"))
-        except HTTPError as exc:
-            raise BridgeClientError("BRIDGE_HTTP_ERROR", f"HTTP {exc.code} on /health") from exc
-        except URLError as exc:
+            status, raw, _ = self._pool.request("GET", self._health_path, timeout=5)
+        except OSError as exc:
             raise BridgeClientError("BRIDGE_UNAVAILABLE", str(exc)) from exc
+        if status >= 400:
+            raise BridgeClientError("BRIDGE_HTTP_ERROR", f"HTTP {status} on {self._health_path}")
+        result = codec.loads(raw)
+        if cache_ttl > 0:
+            self._store(key, cache_ttl, result)
+        return result
 
-    def call(self, method: str, params: Dict[str, Any], timeout_seconds: float = 30) -> Dict[str, Any]:
-        payload = json.dumps({"method": method, "params": params}).encode("utf-8")
-        req = Request(
-            f"{self.url}/rpc",
-            data=payload,
-            headers={"Content-Type": "application/json"},
-            method="POST",
-        )
+    def _post(self, path: str, request: Any, timeout_seconds: float) -> Any:
+        if self.wire == "msgpack":
+            payload, headers = codec.packb(request), _MSGPACK_HEADERS
+        else:
+            payload, headers = codec.dumps(request), _JSON_HEADERS
         try:
-            with urlopen(req, timeout=timeout_seconds) as response:
-                body = json.loads(response.read().decode("utf-8"))
-        except HTTPError as exc:
-            payload_raw = exc.read().decode("utf-8", errors="replace") if exc.fp else ""
+            status, raw, content_type = self._pool.request("POST", path, body=payload, headers=headers, timeout=timeout_seconds)
+        except TimeoutError as exc:
+            raise BridgeClientError("BRIDGE_TIMEOUT", f"No bridge response within {timeout_seconds}s: {exc}") from exc
+        except OSError as exc:
+            raise BridgeClientError("BRIDGE_UNAVAILABLE", str(exc)) from exc
+        if status == 415 and self.wire == "msgpack":
+            # The bridge rejected the body before dispatching it; fall back to JSON for good.
+            self.wire = "json"
+            return self._post(path, request, timeout_seconds)
+        decode = codec.unpackb if content_type.startswith(codec.MSGPACK_CONTENT_TYPE) else codec.loads
+        if status >= 400:
             try:
-                payload = json.loads(payload_raw) if payload_raw else {}
-            except json.JSONDecodeError:
+                payload = decode(raw) if raw else {}
+            except ValueError:
                 payload = {}
             err = payload.get("error") if isinstance(payload, dict) else None
             if isinstance(err, dict) and "code" in err:
-                raise BridgeClientError(str(err.get("code", "ERROR")), str(err.get("message", "bridge error"))) from exc
-            raise BridgeClientError("BRIDGE_HTTP_ERROR", f"HTTP {exc.code}: {payload_raw[:200]}") from exc
-        except URLError as exc:
-            raise BridgeClientError("BRIDGE_UNAVAILABLE", str(exc)) from exc
-        except Exception as exc:
+                raise BridgeClientError(str(err.get("code", "ERROR")), str(err.get("message", "bridge error")))
+            raise BridgeClientError("BRIDGE_HTTP_ERROR", f"HTTP {status}: {raw[:200].decode('utf-8', errors='replace')}")
+        try:
+            return decode(raw)
+        except (ValueError, TypeError) as exc:
             raise BridgeClientError("ERROR", str(exc)) from exc
-        if not body.get("ok"):
-            err = body.get("error") or {}
-            raise BridgeClientError(err.get("code", "ERROR"), err.get("message", "unknown bridge error"))
-        return body.get("result") or {}
+
+    def _call_local(self, fn: Callable[[Dict[str, Any]], Dict[str, Any]], params: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return fn(params) or {}
+        except BridgeClientError:
+            raise
+        except Exception as exc:
+            code = getattr(exc, "code", None)
+            if not isinstance(code, str):
+                raise
+            raise BridgeClientError(code, str(getattr(exc, "message", exc))) from exc
+
+    def call(
+        self, method: str, params: Dict[str, Any], timeout_seconds: float = 30, cache_ttl: float = 0
+    ) -> Dict[str, Any]:
+        fn = self._local_handlers.get(method)
+        if fn is not None:
+            return self._call_local(fn, params)
+        key = None
+        if cache_ttl > 0:
+            try:
+                key = (method, codec.dumps(params, sort_keys=True))
+            except TypeError:
+                key = None
+            cached = self._cached(key) if key is not None else None
+            if cached is not None:
+                return cached
+        body = self._post(self._rpc_path, {"method": method, "params": params}, timeout_seconds)
+        if body.get("ok"):
+            result = body.get("result") or {}
+            if key is not None:
+                self._store(key, cache_ttl, result)
+            return result
+        err = body.get("error") or {}
+        raise BridgeClientError(err.get("code", "ERROR"), err.get("message", "unknown bridge error"))
+
+    def call_many(self, calls: List[Tuple[str, Dict[str, Any]]], timeout_seconds: float = 30) -> List[Any]:
+        # The bridge runs entries sequentially, so timeout_seconds applies per entry.
+        request = [{"method": m, "params": p} for m, p in calls]
+        body = self._post(self._batch_path, request, timeout_seconds * max(1, len(calls)))
+        entries = body.get("results") if isinstance(body, dict) else None
+        if not isinstance(entries, list) or len(entries) != len(calls):
+            raise BridgeClientError("ERROR", f"malformed batch response for {len(calls)} calls")
+        if not all(isinstance(entry, dict) for entry in entries):
+            raise BridgeClientError("ERROR", "malformed batch response entry")
+        results: List[Any] = []
+        for entry in entries:
+            if entry.get("ok"):
+                results.append(entry.get("result") or {})
+            else:
+                err = entry.get("error") or {}
+                results.append(BridgeClientError(err.get("code", "ERROR"), err.get("message", "unknown bridge error")))
+        return results
+
+    async def call_async(self, method: str, params: Dict[str, Any], timeout_seconds: float = 30) -> Dict[str, Any]:
+        import asyncio
+
+        return await asyncio.to_thread(self.call, method, params, timeout_seconds)
@@ -1,15 +1,25 @@
-import json
+import array
+import collections
+import contextlib
+import errno
+import functools
 import hashlib
 import os
 import re
 import shutil
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List
+from types import MappingProxyType
+from typing import Any, Callable, Deque, Dict, Iterator, List, Mapping, Tuple
 
 from harness_gimp import __version__
+from harness_gimp.core import codec
 from harness_gimp.core.gimp import GimpExecutionError, resolve_gimp_binary, resolve_profile_dir, run_python_batch
 
 
@@ -20,19 +30,22 @@ class BridgeOperationError(Exception):
         self.message = message
 
 
-ACTION_METHODS = [
+ACTION_METHODS: Tuple[str, ...] = (
     "system.health",
     "system.version",
     "system.actions",
     "system.doctor",
     "system.soak",
+    "system.verify",
     "project.plan_edit",
+    "project.plan_edit_batch",
     "image.inspect",
     "image.validate",
     "image.diff",
     "image.snapshot",
     "image.undo",
     "image.redo",
+    "history.gc",
     "image.open",
     "image.save",
     "image.clone",
@@ -80,75 +93,196 @@ ACTION_METHODS = [
     "macro.run",
     "preset.list",
     "preset.apply",
-]
+    "batch.run",
+)
+ACTION_METHODS_SET = frozenset(ACTION_METHODS)
+
 
+IMAGE_CACHE_SIZE = 4
 
 HISTORY_ROOT = Path.cwd() / ".harness-gimp-history"
 HISTORY_STATE = HISTORY_ROOT / "state.json"
 
-PRESETS: Dict[str, List[Dict[str, Any]]] = {
-    "web-optimize": [
-        {"method": "image.resize", "params": {"width": 1920, "height": 1080}},
-        {"method": "adjust.levels", "params": {"black": 5, "white": 250, "gamma": 1.0}},
-    ],
-    "thumbnail": [
-        {"method": "image.resize", "params": {"width": 512, "height": 512}},
-        {"method": "adjust.brightness_contrast", "params": {"brightness": 4, "contrast": 8}},
-    ],
-    "social-crop": [
-        {"method": "image.crop", "params": {"x": 0, "y": 0, "width": 1080, "height": 1080}},
-    ],
-}
+
+def _frozen_steps(*steps: Dict[str, Any]) -> Tuple[Mapping[str, Any], ...]:
+    return tuple(
+        MappingProxyType({"method": step["method"], "params": MappingProxyType(dict(step.get("params", {})))})
+        for step in steps
+    )
+
+
+PRESETS: Mapping[str, Tuple[Mapping[str, Any], ...]] = MappingProxyType(
+    {
+        "web-optimize": _frozen_steps(
+            {"method": "image.resize", "params": {"width": 1920, "height": 1080}},
+            {"method": "adjust.levels", "params": {"black": 5, "white": 250, "gamma": 1.0}},
+        ),
+        "thumbnail": _frozen_steps(
+            {"method": "image.resize", "params": {"width": 512, "height": 512}},
+            {"method": "adjust.brightness_contrast", "params": {"brightness": 4, "contrast": 8}},
+        ),
+        "social-crop": _frozen_steps(
+            {"method": "image.crop", "params": {"x": 0, "y": 0, "width": 1080, "height": 1080}},
+        ),
+    }
+)
+
+_COMPILED_PRESETS: Mapping[str, Tuple[Tuple[str, Mapping[str, Any]], ...]] = MappingProxyType(
+    {
+        name: tuple((str(step["method"]), step["params"]) for step in steps)
+        for name, steps in PRESETS.items()
+    }
+)
+_PRESET_NAMES = tuple(sorted(PRESETS))
+
+
+PLAN_ACTIONS: Mapping[str, str] = MappingProxyType(
+    {
+        "resize": "image.resize",
+        "crop": "image.crop",
+        "crop-center": "image.crop_center",
+        "rotate": "image.rotate",
+        "flip": "image.flip",
+        "canvas-size": "image.canvas_size",
+        "montage-grid": "image.montage_grid",
+        "brightness-contrast": "adjust.brightness_contrast",
+        "levels": "adjust.levels",
+        "curves": "adjust.curves",
+        "hue-saturation": "adjust.hue_saturation",
+        "color-balance": "adjust.color_balance",
+        "color-temperature": "adjust.color_temperature",
+        "invert": "adjust.invert",
+        "desaturate": "adjust.desaturate",
+        "blur": "filter.blur",
+        "gaussian-blur": "filter.gaussian_blur",
+        "sharpen": "filter.sharpen",
+        "unsharp-mask": "filter.unsharp_mask",
+        "noise-reduction": "filter.noise_reduction",
+        "layer-add": "layer.add",
+        "layer-remove": "layer.remove",
+        "layer-rename": "layer.rename",
+        "layer-opacity": "layer.opacity",
+        "layer-blend-mode": "layer.blend_mode",
+        "layer-duplicate": "layer.duplicate",
+        "layer-merge-down": "layer.merge_down",
+        "layer-reorder": "layer.reorder",
+        "select-all": "selection.all",
+        "select-none": "selection.none",
+        "invert-selection": "selection.invert",
+        "feather-selection": "selection.feather",
+        "select-rectangle": "selection.rectangle",
+        "select-ellipse": "selection.ellipse",
+        "add-layer-mask": "mask.add",
+        "apply-layer-mask": "mask.apply",
+        "add-text": "text.add",
+        "update-text": "text.update",
+        "stroke-selection": "annotation.stroke_selection",
+    }
+)
+
+
+_known_paths = threading.local()
+
+
+@contextlib.contextmanager
+def _path_scope() -> Iterator[None]:
+    # Within one multi-step request, a path that existed once is not stat'ed again.
+    if getattr(_known_paths, "seen", None) is not None:
+        yield
+        return
+    _known_paths.seen = set()
+    try:
+        yield
+    finally:
+        _known_paths.seen = None
 
 
 def _require_path(path: str) -> Path:
-    p = Path(path)
-    if not p.exists():
-        raise BridgeOperationError("NOT_FOUND", f"File not found: {path}")
-    return p
+    seen = getattr(_known_paths, "seen", None)
+    if seen is None or path not in seen:
+        try:
+            os.stat(path)
+        except (OSError, ValueError) as exc:
+            raise BridgeOperationError("NOT_FOUND", f"File not found: {path}") from exc
+        if seen is not None:
+            seen.add(path)
+    return Path(path)
 
 
-def _script(payload: Dict[str, Any]) -> str:
-    blob = json.dumps(payload)
-    return f"""
+_SCRIPT_TEMPLATE = """
+import functools
+import hashlib
 import json
+import os
+from operator import itemgetter
 from gi.repository import Gimp, Gio
 
-payload = json.loads(r'''{blob}''')
+payload = json.loads(__PAYLOAD_JSON__)
 pdb = Gimp.get_pdb()
+_state = globals().get("HARNESS_STATE")
 
 def call(name, props):
   proc = pdb.lookup_procedure(name)
   if proc is None:
-    raise RuntimeError(f"Missing procedure: {{name}}")
+    raise RuntimeError(f"Missing procedure: {name}")
   cfg = proc.create_config()
   for k, v in props.items():
     cfg.set_property(k, v)
   result = proc.run(cfg)
   status = result.index(0)
   if status != Gimp.PDBStatusType.SUCCESS:
-    raise RuntimeError(f"{{name}} failed: {{status}}")
+    raise RuntimeError(f"{name} failed: {status}")
   return [result.index(i + 1) for i in range(len(proc.get_return_values()))]
 
-def load_image(path):
-  return call("gimp-file-load", {{
+def _load_image(path):
+  return call("gimp-file-load", {
     "run-mode": Gimp.RunMode.NONINTERACTIVE,
     "file": Gio.File.new_for_path(path),
-  }})[0]
+  })[0]
+
+def _cache_key(path):
+  # Keyed on content, not mtime and size: a same-size rewrite within one mtime tick must miss.
+  # Hashing the file is still far cheaper than the gimp-file-load the cache saves.
+  digest = hashlib.sha256()
+  with open(path, "rb") as f:
+    for chunk in iter(functools.partial(f.read, 1 << 20), b""):
+      digest.update(chunk)
+  return (os.path.realpath(path), digest.hexdigest())
+
+def _remember(key, image):
+  cache = _state.setdefault("images", {})
+  for stale in [k for k in cache if k[0] == key[0]]:
+    delete_image(cache.pop(stale))
+  while len(cache) >= __IMAGE_CACHE_SIZE__:
+    delete_image(cache.pop(next(iter(cache))))
+  cache[key] = image
+
+def load_image(path):
+  if _state is None:
+    return _load_image(path)
+  key = _cache_key(path)
+  cached = _state.setdefault("images", {}).get(key)
+  if cached is None:
+    cached = _load_image(path)
+    _remember(key, cached)
+  return cached.duplicate()
 
 def save_image(image, path):
-  call("gimp-file-save", {{
+  call("gimp-file-save", {
     "run-mode": Gimp.RunMode.NONINTERACTIVE,
     "image": image,
     "file": Gio.File.new_for_path(path),
     "options": None,
-  }})
+  })
+  if _state is not None and path.lower().endswith(".xcf"):
+    # XCF round-trips exactly, so the saved image can stand in for the next load.
+    _remember(_cache_key(path), image.duplicate())
 
 def delete_image(image):
   try:
     image.delete()
   except Exception:
-    call("gimp-image-delete", {{"image": image}})
+    call("gimp-image-delete", {"image": image})
 
 def image_layers(image):
   return list(image.get_layers())
@@ -156,7 +290,7 @@ def image_layers(image):
 def layer_by_index(image, index):
   layers = image_layers(image)
   if index < 0 or index >= len(layers):
-    raise RuntimeError(f"Invalid layer index: {{index}}")
+    raise RuntimeError(f"Invalid layer index: {index}")
   return layers[index]
 
 def image_dimensions(image):
@@ -168,10 +302,16 @@ def enum_member(enum_cls, candidate_names):
   for name in candidate_names:
     if hasattr(enum_cls, name):
       return getattr(enum_cls, name)
-  raise RuntimeError(f"Missing enum values: {{candidate_names}}")
+  raise RuntimeError(f"Missing enum values: {candidate_names}")
 
+_ENUM_NAME = str.maketrans("- ", "__")
+
+def enum_name(value):
+  return str(value).strip().translate(_ENUM_NAME).upper()
+
+@functools.lru_cache(maxsize=64)
 def layer_mode_from_name(name):
-  normalized = str(name).strip().upper().replace("-", "_").replace(" ", "_")
+  normalized = enum_name(name)
   candidates = [normalized]
   if not normalized.endswith("_LEGACY"):
     candidates.append(normalized + "_LEGACY")
@@ -182,110 +322,98 @@ def _gegl_color(hex_value):
   return Gegl.Color.new(str(hex_value))
 
 def _apply_gegl_filter(drawable, operation_name, filter_name, config_values):
-  flt = call("gimp-drawable-filter-new", {{
+  flt = call("gimp-drawable-filter-new", {
     "drawable": drawable,
     "operation-name": operation_name,
     "name": filter_name,
-  }})[0]
+  })[0]
   cfg = flt.get_config()
   for key, value in config_values.items():
     cfg.set_property(key, value)
-  call("gimp-drawable-merge-filters", {{"drawable": drawable}})
+  if _fusion["active"]:
+    # Leave the filter on the drawable's stack so consecutive GEGL steps render as one graph.
+    _fusion["pending"].setdefault(drawable.get_id(), drawable)
+    return
+  call("gimp-drawable-merge-filters", {"drawable": drawable})
 
-action = payload.get("action")
+_fusion = {"active": False, "pending": {}}
+FUSABLE = {"color_temperature", "gaussian_blur", "blur", "unsharp_mask", "sharpen", "noise_reduction"}
 
-if action == "inspect":
+def _merge_pending_filters():
+  pending = _fusion["pending"]
+  while pending:
+    call("gimp-drawable-merge-filters", {"drawable": pending.pop(next(iter(pending)))})
+
+def _h_inspect(payload):
   image = load_image(payload["image"])
   width, height = image_dimensions(image)
   layers = image_layers(image)
   out = []
   for idx, layer in enumerate(layers):
-    out.append({{"index": idx, "name": layer.get_name(), "opacity": layer.get_opacity(), "mode": str(layer.get_mode())}})
+    out.append({"index": idx, "name": layer.get_name(), "opacity": layer.get_opacity(), "mode": str(layer.get_mode())})
   delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"width": width, "height": height, "layerCount": len(layers), "layers": out}}))
+  return {"width": width, "height": height, "layerCount": len(layers), "layers": out}
 
-elif action == "resize":
-  image = load_image(payload["image"])
-  call("gimp-image-scale", {{"image": image, "new-width": int(payload["width"]), "new-height": int(payload["height"])}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"], "width": int(payload["width"]), "height": int(payload["height"])}}))
+def _op_resize(image, payload):
+  call("gimp-image-scale", {"image": image, "new-width": int(payload["width"]), "new-height": int(payload["height"])})
+  return {"output": payload["output"], "width": int(payload["width"]), "height": int(payload["height"])}
 
-elif action == "crop":
-  image = load_image(payload["image"])
-  call("gimp-image-crop", {{
+def _op_crop(image, payload):
+  call("gimp-image-crop", {
     "image": image,
     "new-width": int(payload["width"]),
     "new-height": int(payload["height"]),
     "offx": int(payload["x"]),
     "offy": int(payload["y"]),
-  }})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+  })
+  return {"output": payload["output"]}
 
-elif action == "rotate":
+def _op_rotate(image, payload):
   degrees = int(payload["degrees"])
-  image = load_image(payload["image"])
-  mapping = {{
+  mapping = {
     90: Gimp.RotationType.DEGREES90,
     180: Gimp.RotationType.DEGREES180,
     270: Gimp.RotationType.DEGREES270,
-  }}
+  }
   if degrees not in mapping:
     raise RuntimeError("rotate currently supports 90/180/270")
-  call("gimp-image-rotate", {{"image": image, "rotate-type": mapping[degrees]}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"], "degrees": degrees}}))
+  call("gimp-image-rotate", {"image": image, "rotate-type": mapping[degrees]})
+  return {"output": payload["output"], "degrees": degrees}
 
-elif action == "flip":
-  image = load_image(payload["image"])
+def _op_flip(image, payload):
   axis = str(payload["axis"]).lower()
   orientation = Gimp.OrientationType.HORIZONTAL if axis == "horizontal" else Gimp.OrientationType.VERTICAL
-  call("gimp-image-flip", {{"image": image, "flip-type": orientation}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"], "axis": axis}}))
+  call("gimp-image-flip", {"image": image, "flip-type": orientation})
+  return {"output": payload["output"], "axis": axis}
 
-elif action == "canvas_size":
-  image = load_image(payload["image"])
-  call("gimp-image-resize", {{
+def _op_canvas_size(image, payload):
+  call("gimp-image-resize", {
     "image": image,
     "new-width": int(payload["width"]),
     "new-height": int(payload["height"]),
     "offx": int(payload.get("offsetX", 0)),
     "offy": int(payload.get("offsetY", 0)),
-  }})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+  })
+  return {"output": payload["output"]}
 
-elif action == "export":
-  image = load_image(payload["image"])
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+def _op_export(image, payload):
+  return {"output": payload["output"]}
 
-elif action == "brightness_contrast":
-  image = load_image(payload["image"])
+def _op_brightness_contrast(image, payload):
   layer = layer_by_index(image, int(payload.get("layerIndex", 0)))
   brightness = max(-1.0, min(1.0, float(payload["brightness"]) / 127.0))
   contrast = max(-1.0, min(1.0, float(payload["contrast"]) / 127.0))
-  call("gimp-drawable-brightness-contrast", {{"drawable": layer, "brightness": brightness, "contrast": contrast}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"], "brightness": brightness, "contrast": contrast}}))
+  call("gimp-drawable-brightness-contrast", {"drawable": layer, "brightness": brightness, "contrast": contrast})
+  return {"output": payload["output"], "brightness": brightness, "contrast": contrast}
 
-elif action == "levels":
-  image = load_image(payload["image"])
+def _op_levels(image, payload):
   layer = layer_by_index(image, int(payload.get("layerIndex", 0)))
   black = max(0.0, min(255.0, float(payload["black"])))
   white = max(0.0, min(255.0, float(payload["white"])))
   gamma = float(payload["gamma"])
   if white <= black:
     raise RuntimeError("white must be greater than black")
-  call("gimp-drawable-levels", {{
+  call("gimp-drawable-levels", {
     "drawable": layer,
     "channel": Gimp.HistogramChannel.VALUE,
     "low-input": black / 255.0,
@@ -295,74 +423,65 @@ elif action == "levels":
     "low-output": 0.0,
     "high-output": 1.0,
     "clamp-output": True,
-  }})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+  })
+  return {"output": payload["output"]}
 
-elif action == "hue_saturation":
-  image = load_image(payload["image"])
+def _op_hue_saturation(image, payload):
   layer = layer_by_index(image, int(payload.get("layerIndex", 0)))
-  call("gimp-drawable-hue-saturation", {{
+  call("gimp-drawable-hue-saturation", {
     "drawable": layer,
     "hue-range": Gimp.HueRange.ALL,
     "hue-offset": float(payload["hue"]),
     "lightness": float(payload["lightness"]),
     "saturation": float(payload["saturation"]),
     "overlap": 0.0,
-  }})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+  })
+  return {"output": payload["output"]}
 
-elif action == "color_balance":
-  image = load_image(payload["image"])
+def _op_color_balance(image, payload):
   layer = layer_by_index(image, int(payload.get("layerIndex", 0)))
-  transfer_name = str(payload.get("transferMode", "MIDTONES")).upper()
-  transfer_map = {{
+  transfer_name = enum_name(payload.get("transferMode", "MIDTONES"))
+  transfer_map = {
     "SHADOWS": Gimp.TransferMode.SHADOWS,
     "MIDTONES": Gimp.TransferMode.MIDTONES,
     "HIGHLIGHTS": Gimp.TransferMode.HIGHLIGHTS,
-  }}
+  }
   if transfer_name not in transfer_map:
     raise RuntimeError("transferMode must be SHADOWS|MIDTONES|HIGHLIGHTS")
-  call("gimp-drawable-color-balance", {{
+  call("gimp-drawable-color-balance", {
     "drawable": layer,
     "transfer-mode": transfer_map[transfer_name],
     "preserve-lum": True,
     "cyan-red": float(payload["cyanRed"]) / 100.0,
     "magenta-green": float(payload["magentaGreen"]) / 100.0,
     "yellow-blue": float(payload["yellowBlue"]) / 100.0,
-  }})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"], "transferMode": transfer_name}}))
+  })
+  return {"output": payload["output"], "transferMode": transfer_name}
 
-elif action == "curves":
-  image = load_image(payload["image"])
+def _op_curves(image, payload):
   layer = layer_by_index(image, int(payload.get("layerIndex", 0)))
-  channel_name = str(payload.get("channel", "value")).upper()
-  channel_map = {{
+  channel_name = enum_name(payload.get("channel", "value"))
+  channel_map = {
     "VALUE": Gimp.HistogramChannel.VALUE,
     "RED": Gimp.HistogramChannel.RED,
     "GREEN": Gimp.HistogramChannel.GREEN,
     "BLUE": Gimp.HistogramChannel.BLUE,
     "ALPHA": Gimp.HistogramChannel.ALPHA,
-  }}
+  }
   if channel_name not in channel_map:
     raise RuntimeError("channel must be value|red|green|blue|alpha")
   points = payload.get("points", [])
   if not isinstance(points, list) or len(points) < 2:
     raise RuntimeError("points must be a non-empty list")
-  normalized = []
-  for pt in points:
+  normalized = [None] * len(points)
+  for i, pt in enumerate(points):
     if isinstance(pt, dict):
       x_raw = pt.get("x", 0.0)
       y_raw = pt.get("y", 0.0)
     elif isinstance(pt, (list, tuple)) and len(pt) >= 2:
       x_raw, y_raw = pt[0], pt[1]
     else:
-      raise RuntimeError("points must be objects {{x,y}} or [x,y] pairs")
+      raise RuntimeError("points must be objects {x,y} or [x,y] pairs")
     x = float(x_raw)
     y = float(y_raw)
     if x > 1.0 or y > 1.0:
@@ -370,13 +489,13 @@ elif action == "curves":
       y /= 255.0
     x = max(0.0, min(1.0, x))
     y = max(0.0, min(1.0, y))
-    normalized.append((x, y))
-  normalized.sort(key=lambda p: p[0])
+    normalized[i] = (x, y)
+  normalized.sort(key=itemgetter(0))
   black = int(max(0, min(255, round(normalized[0][0] * 255))))
   white = int(max(1, min(255, round(normalized[-1][0] * 255))))
   if white <= black:
     white = min(255, black + 1)
-  call("gimp-drawable-levels", {{
+  call("gimp-drawable-levels", {
     "drawable": layer,
     "channel": channel_map[channel_name],
     "low-input": black / 255.0,
@@ -386,122 +505,95 @@ elif action == "curves":
     "low-output": 0.0,
     "high-output": 1.0,
     "clamp-output": True,
-  }})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"], "implementedAs": "levels-approximation"}}))
+  })
+  return {"output": payload["output"], "implementedAs": "levels-approximation"}
 
-elif action == "color_temperature":
-  image = load_image(payload["image"])
+def _op_color_temperature(image, payload):
   layer = layer_by_index(image, int(payload.get("layerIndex", 0)))
   temp = float(payload.get("temperature", 6500.0))
   _apply_gegl_filter(
     layer,
     "gegl:color-temperature",
     "color-temp",
-    {{"original-temperature": 6500.0, "intended-temperature": temp}},
+    {"original-temperature": 6500.0, "intended-temperature": temp},
   )
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"], "temperature": temp}}))
+  return {"output": payload["output"], "temperature": temp}
 
-elif action == "invert":
-  image = load_image(payload["image"])
+def _op_invert(image, payload):
   layer = layer_by_index(image, int(payload.get("layerIndex", 0)))
-  call("gimp-drawable-invert", {{"drawable": layer, "linear": False}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+  call("gimp-drawable-invert", {"drawable": layer, "linear": False})
+  return {"output": payload["output"]}
 
-elif action == "desaturate":
-  image = load_image(payload["image"])
+def _op_desaturate(image, payload):
   layer = layer_by_index(image, int(payload.get("layerIndex", 0)))
-  mode_name = str(payload.get("mode", "luma")).upper()
-  mode_map = {{
+  mode_name = enum_name(payload.get("mode", "luma"))
+  mode_map = {
     "LUMA": Gimp.DesaturateMode.LUMA,
     "AVERAGE": Gimp.DesaturateMode.AVERAGE,
     "LIGHTNESS": Gimp.DesaturateMode.LIGHTNESS,
-  }}
+  }
   if mode_name not in mode_map:
     raise RuntimeError("mode must be luma|average|lightness")
-  call("gimp-drawable-desaturate", {{"drawable": layer, "desaturate-mode": mode_map[mode_name]}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"], "mode": mode_name.lower()}}))
+  call("gimp-drawable-desaturate", {"drawable": layer, "desaturate-mode": mode_map[mode_name]})
+  return {"output": payload["output"], "mode": mode_name.lower()}
 
-elif action == "gaussian_blur":
-  image = load_image(payload["image"])
+def _op_gaussian_blur(image, payload):
   layer = layer_by_index(image, int(payload.get("layerIndex", 0)))
   rx = float(payload.get("radiusX", 4.0))
   ry = float(payload.get("radiusY", rx))
-  _apply_gegl_filter(layer, "gegl:gaussian-blur", "gaussian-blur", {{"std-dev-x": rx, "std-dev-y": ry}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"], "radiusX": rx, "radiusY": ry}}))
+  _apply_gegl_filter(layer, "gegl:gaussian-blur", "gaussian-blur", {"std-dev-x": rx, "std-dev-y": ry})
+  return {"output": payload["output"], "radiusX": rx, "radiusY": ry}
 
-elif action == "blur":
-  image = load_image(payload["image"])
+def _op_blur(image, payload):
   layer = layer_by_index(image, int(payload.get("layerIndex", 0)))
   radius = float(payload.get("radius", 4.0))
-  _apply_gegl_filter(layer, "gegl:gaussian-blur", "blur", {{"std-dev-x": radius, "std-dev-y": radius}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"], "radius": radius}}))
+  _apply_gegl_filter(layer, "gegl:gaussian-blur", "blur", {"std-dev-x": radius, "std-dev-y": radius})
+  return {"output": payload["output"], "radius": radius}
 
-elif action == "unsharp_mask":
-  image = load_image(payload["image"])
+def _op_unsharp_mask(image, payload):
   layer = layer_by_index(image, int(payload.get("layerIndex", 0)))
   radius = float(payload.get("radius", 2.0))
   amount = float(payload.get("amount", 1.0))
   threshold = float(payload.get("threshold", 0.0))
-  _apply_gegl_filter(layer, "gegl:unsharp-mask", "unsharp", {{"std-dev": radius, "scale": amount, "threshold": threshold}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"], "radius": radius, "amount": amount, "threshold": threshold}}))
+  _apply_gegl_filter(layer, "gegl:unsharp-mask", "unsharp", {"std-dev": radius, "scale": amount, "threshold": threshold})
+  return {"output": payload["output"], "radius": radius, "amount": amount, "threshold": threshold}
 
-elif action == "sharpen":
-  image = load_image(payload["image"])
+def _op_sharpen(image, payload):
   layer = layer_by_index(image, int(payload.get("layerIndex", 0)))
   radius = float(payload.get("radius", 2.0))
   amount = float(payload.get("amount", 1.0))
-  _apply_gegl_filter(layer, "gegl:unsharp-mask", "sharpen", {{"std-dev": radius, "scale": amount, "threshold": 0.0}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"], "radius": radius, "amount": amount}}))
+  _apply_gegl_filter(layer, "gegl:unsharp-mask", "sharpen", {"std-dev": radius, "scale": amount, "threshold": 0.0})
+  return {"output": payload["output"], "radius": radius, "amount": amount}
 
-elif action == "noise_reduction":
-  image = load_image(payload["image"])
+def _op_noise_reduction(image, payload):
   layer = layer_by_index(image, int(payload.get("layerIndex", 0)))
   strength = int(max(1, min(10, int(payload.get("strength", 3)))))
-  _apply_gegl_filter(layer, "gegl:noise-reduction", "noise-reduction", {{"iterations": strength}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"], "strength": strength}}))
+  _apply_gegl_filter(layer, "gegl:noise-reduction", "noise-reduction", {"iterations": strength})
+  return {"output": payload["output"], "strength": strength}
 
-elif action == "layer_list":
+def _h_layer_list(payload):
   image = load_image(payload["image"])
   layers = image_layers(image)
   out = []
   for idx, layer in enumerate(layers):
-    out.append({{
+    out.append({
       "index": idx,
       "name": layer.get_name(),
       "opacity": layer.get_opacity(),
       "mode": str(layer.get_mode()),
-    }})
+    })
   delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"layers": out, "count": len(out)}}))
+  return {"layers": out, "count": len(out)}
 
-elif action == "layer_add":
-  image = load_image(payload["image"])
+def _op_layer_add(image, payload):
   width, height = image_dimensions(image)
   existing = image_layers(image)
   if existing:
-    ltype = call("gimp-drawable-type", {{"drawable": existing[0]}})[0]
+    ltype = call("gimp-drawable-type", {"drawable": existing[0]})[0]
   else:
     ltype = enum_member(Gimp.ImageType, ["RGBA_IMAGE", "RGB_IMAGE"])
   mode = enum_member(Gimp.LayerMode, ["NORMAL", "NORMAL_LEGACY"])
-  layer = call("gimp-layer-new", {{
+  layer = call("gimp-layer-new", {
     "image": image,
     "name": payload["name"],
     "width": width,
@@ -509,61 +601,43 @@ elif action == "layer_add":
     "type": ltype,
     "opacity": 100.0,
     "mode": mode,
-  }})[0]
-  call("gimp-image-insert-layer", {{"image": image, "layer": layer, "parent": None, "position": int(payload.get("position", 0))}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+  })[0]
+  call("gimp-image-insert-layer", {"image": image, "layer": layer, "parent": None, "position": int(payload.get("position", 0))})
+  return {"output": payload["output"]}
 
-elif action == "layer_remove":
-  image = load_image(payload["image"])
+def _op_layer_remove(image, payload):
   layer = layer_by_index(image, int(payload["layerIndex"]))
-  call("gimp-image-remove-layer", {{"image": image, "layer": layer}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+  call("gimp-image-remove-layer", {"image": image, "layer": layer})
+  return {"output": payload["output"]}
 
-elif action == "layer_rename":
-  image = load_image(payload["image"])
+def _op_layer_rename(image, payload):
   layer = layer_by_index(image, int(payload["layerIndex"]))
   layer.set_name(payload["name"])
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+  return {"output": payload["output"]}
 
-elif action == "layer_opacity":
-  image = load_image(payload["image"])
+def _op_layer_opacity(image, payload):
   layer = layer_by_index(image, int(payload["layerIndex"]))
   layer.set_opacity(float(payload["opacity"]))
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+  return {"output": payload["output"]}
 
-elif action == "layer_blend_mode":
-  image = load_image(payload["image"])
+def _op_layer_blend_mode(image, payload):
   layer = layer_by_index(image, int(payload["layerIndex"]))
   mode = layer_mode_from_name(payload["mode"])
   layer.set_mode(mode)
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"], "mode": str(mode)}}))
+  return {"output": payload["output"], "mode": str(mode)}
 
-elif action == "layer_duplicate":
-  image = load_image(payload["image"])
+def _op_layer_duplicate(image, payload):
   layer = layer_by_index(image, int(payload["layerIndex"]))
-  dup = call("gimp-layer-copy", {{"layer": layer}})[0]
-  call("gimp-image-insert-layer", {{
+  dup = call("gimp-layer-copy", {"layer": layer})[0]
+  call("gimp-image-insert-layer", {
     "image": image,
     "layer": dup,
     "parent": None,
     "position": int(payload.get("position", int(payload["layerIndex"]) + 1)),
-  }})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+  })
+  return {"output": payload["output"]}
 
-elif action == "layer_merge_down":
-  image = load_image(payload["image"])
+def _op_layer_merge_down(image, payload):
   idx = int(payload["layerIndex"])
   layers = image_layers(image)
   if len(layers) < 2:
@@ -571,112 +645,89 @@ elif action == "layer_merge_down":
   if idx < 0 or idx >= (len(layers) - 1):
     raise RuntimeError("layerIndex must reference a layer with another layer below it")
   layer = layers[idx]
-  call("gimp-image-merge-down", {{"image": image, "merge-layer": layer, "merge-type": Gimp.MergeType.EXPAND_AS_NECESSARY}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+  call("gimp-image-merge-down", {"image": image, "merge-layer": layer, "merge-type": Gimp.MergeType.EXPAND_AS_NECESSARY})
+  return {"output": payload["output"]}
 
-elif action == "layer_reorder":
-  image = load_image(payload["image"])
+def _op_layer_reorder(image, payload):
   layer = layer_by_index(image, int(payload["layerIndex"]))
-  call("gimp-image-reorder-item", {{
+  call("gimp-image-reorder-item", {
     "image": image,
     "item": layer,
     "parent": None,
     "position": int(payload["index"]),
-  }})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+  })
+  return {"output": payload["output"]}
 
-elif action in ("selection_all", "selection_none", "selection_invert"):
-  image = load_image(payload["image"])
-  proc_map = {{
+def _op_selection_toggle(image, payload):
+  action = payload["action"]
+  proc_map = {
     "selection_all": "gimp-selection-all",
     "selection_none": "gimp-selection-none",
     "selection_invert": "gimp-selection-invert",
-  }}
-  call(proc_map[action], {{"image": image}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"], "action": action}}))
+  }
+  call(proc_map[action], {"image": image})
+  return {"output": payload["output"], "action": action}
 
-elif action == "selection_feather":
-  image = load_image(payload["image"])
-  call("gimp-selection-feather", {{"image": image, "radius": float(payload.get("radius", 5.0))}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+def _op_selection_feather(image, payload):
+  call("gimp-selection-feather", {"image": image, "radius": float(payload.get("radius", 5.0))})
+  return {"output": payload["output"]}
 
-elif action == "selection_rectangle":
-  image = load_image(payload["image"])
-  call("gimp-image-select-rectangle", {{
+def _op_selection_rectangle(image, payload):
+  call("gimp-image-select-rectangle", {
     "image": image,
     "operation": Gimp.ChannelOps.REPLACE,
     "x": float(payload["x"]),
     "y": float(payload["y"]),
     "width": float(payload["width"]),
     "height": float(payload["height"]),
-  }})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+  })
+  return {"output": payload["output"]}
 
-elif action == "selection_ellipse":
-  image = load_image(payload["image"])
-  call("gimp-image-select-ellipse", {{
+def _op_selection_ellipse(image, payload):
+  call("gimp-image-select-ellipse", {
     "image": image,
     "operation": Gimp.ChannelOps.REPLACE,
     "x": float(payload["x"]),
     "y": float(payload["y"]),
     "width": float(payload["width"]),
     "height": float(payload["height"]),
-  }})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+  })
+  return {"output": payload["output"]}
 
-elif action == "mask_add":
-  image = load_image(payload["image"])
+def _op_mask_add(image, payload):
   layer = layer_by_index(image, int(payload["layerIndex"]))
-  mode_name = str(payload.get("mode", "WHITE")).upper()
-  mode_map = {{
+  mode_name = enum_name(payload.get("mode", "WHITE"))
+  mode_map = {
     "WHITE": Gimp.AddMaskType.WHITE,
     "BLACK": Gimp.AddMaskType.BLACK,
     "ALPHA": Gimp.AddMaskType.ALPHA,
     "SELECTION": Gimp.AddMaskType.SELECTION,
     "COPY": Gimp.AddMaskType.COPY,
-  }}
+  }
   if mode_name not in mode_map:
     raise RuntimeError("mask mode must be one of WHITE|BLACK|ALPHA|SELECTION|COPY")
-  mask = call("gimp-layer-create-mask", {{"layer": layer, "mask-type": mode_map[mode_name]}})[0]
-  call("gimp-layer-add-mask", {{"layer": layer, "mask": mask}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"], "mode": mode_name}}))
+  mask = call("gimp-layer-create-mask", {"layer": layer, "mask-type": mode_map[mode_name]})[0]
+  call("gimp-layer-add-mask", {"layer": layer, "mask": mask})
+  return {"output": payload["output"], "mode": mode_name}
 
-elif action == "mask_apply":
-  image = load_image(payload["image"])
+def _op_mask_apply(image, payload):
   layer = layer_by_index(image, int(payload["layerIndex"]))
-  call("gimp-layer-remove-mask", {{"layer": layer, "mode": Gimp.MaskApplyMode.APPLY}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+  call("gimp-layer-remove-mask", {"layer": layer, "mode": Gimp.MaskApplyMode.APPLY})
+  return {"output": payload["output"]}
 
-elif action == "text_add":
-  image = load_image(payload["image"])
+def _op_text_add(image, payload):
   font_name = str(payload.get("font", "")).strip()
-  font = call("gimp-context-get-font", {{}})[0]
+  font = call("gimp-context-get-font", {})[0]
   if font_name:
     try:
-      candidate = call("gimp-font-get-by-name", {{"name": font_name}})[0]
+      candidate = call("gimp-font-get-by-name", {"name": font_name})[0]
       if candidate is not None:
         font = candidate
     except Exception:
       pass
   if payload.get("color"):
-    call("gimp-context-set-foreground", {{"foreground": _gegl_color(payload.get("color"))}})
-  text_layer = call("gimp-text-font", {{
+    call("gimp-context-set-foreground", {"foreground": _gegl_color(payload.get("color"))})
+  text_layer = call("gimp-text-font", {
     "image": image,
     "drawable": None,
     "x": float(payload.get("x", 0)),
@@ -686,55 +737,160 @@ elif action == "text_add":
     "antialias": True,
     "size": float(payload.get("size", 24)),
     "font": font,
-  }})[0]
+  })[0]
   if payload.get("color"):
     try:
-      call("gimp-text-layer-set-color", {{"layer": text_layer, "color": _gegl_color(payload.get("color"))}})
+      call("gimp-text-layer-set-color", {"layer": text_layer, "color": _gegl_color(payload.get("color"))})
     except Exception:
       pass
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+  return {"output": payload["output"]}
 
-elif action == "text_update":
-  image = load_image(payload["image"])
+def _op_text_update(image, payload):
   layer = layer_by_index(image, int(payload["layerIndex"]))
   try:
-    call("gimp-text-layer-set-text", {{"layer": layer, "text": str(payload.get("text", ""))}})
+    call("gimp-text-layer-set-text", {"layer": layer, "text": str(payload.get("text", ""))})
   except Exception as exc:
     raise RuntimeError("layerIndex must reference a text layer") from exc
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+  return {"output": payload["output"]}
 
-elif action == "stroke_selection":
-  image = load_image(payload["image"])
+def _op_stroke_selection(image, payload):
   layer = layer_by_index(image, int(payload.get("layerIndex", 0)))
-  call("gimp-context-set-line-width", {{"line-width": float(payload.get("width", 1.0))}})
+  call("gimp-context-set-line-width", {"line-width": float(payload.get("width", 1.0))})
   if payload.get("color"):
-    call("gimp-context-set-foreground", {{"foreground": _gegl_color(payload.get("color"))}})
+    call("gimp-context-set-foreground", {"foreground": _gegl_color(payload.get("color"))})
   try:
-    call("gimp-drawable-edit-stroke-selection", {{"drawable": layer}})
+    call("gimp-drawable-edit-stroke-selection", {"drawable": layer})
   except Exception:
-    call("gimp-selection-all", {{"image": image}})
-    call("gimp-drawable-edit-stroke-selection", {{"drawable": layer}})
-  save_image(image, payload["output"])
-  delete_image(image)
-  print("HARNESS_JSON:" + json.dumps({{"output": payload["output"]}}))
+    call("gimp-selection-all", {"image": image})
+    call("gimp-drawable-edit-stroke-selection", {"drawable": layer})
+  return {"output": payload["output"]}
+
+OPS = {
+  "resize": _op_resize,
+  "crop": _op_crop,
+  "rotate": _op_rotate,
+  "flip": _op_flip,
+  "canvas_size": _op_canvas_size,
+  "export": _op_export,
+  "brightness_contrast": _op_brightness_contrast,
+  "levels": _op_levels,
+  "hue_saturation": _op_hue_saturation,
+  "color_balance": _op_color_balance,
+  "curves": _op_curves,
+  "color_temperature": _op_color_temperature,
+  "invert": _op_invert,
+  "desaturate": _op_desaturate,
+  "gaussian_blur": _op_gaussian_blur,
+  "blur": _op_blur,
+  "unsharp_mask": _op_unsharp_mask,
+  "sharpen": _op_sharpen,
+  "noise_reduction": _op_noise_reduction,
+  "layer_add": _op_layer_add,
+  "layer_remove": _op_layer_remove,
+  "layer_rename": _op_layer_rename,
+  "layer_opacity": _op_layer_opacity,
+  "layer_blend_mode": _op_layer_blend_mode,
+  "layer_duplicate": _op_layer_duplicate,
+  "layer_merge_down": _op_layer_merge_down,
+  "layer_reorder": _op_layer_reorder,
+  "selection_all": _op_selection_toggle,
+  "selection_none": _op_selection_toggle,
+  "selection_invert": _op_selection_toggle,
+  "selection_feather": _op_selection_feather,
+  "selection_rectangle": _op_selection_rectangle,
+  "selection_ellipse": _op_selection_ellipse,
+  "mask_add": _op_mask_add,
+  "mask_apply": _op_mask_apply,
+  "text_add": _op_text_add,
+  "text_update": _op_text_update,
+  "stroke_selection": _op_stroke_selection,
+}
 
-else:
+def _edit(op):
+  def run(payload):
+    image = load_image(payload["image"])
+    try:
+      result = op(image, payload)
+      save_image(image, payload["output"])
+    finally:
+      delete_image(image)
+    return result
+  return run
+
+def _h_chain(payload):
+  image = load_image(payload["image"])
+  try:
+    results = []
+    for step in payload["steps"]:
+      step = dict(step, image=payload["image"], output=payload["output"])
+      _fusion["active"] = step["action"] in FUSABLE
+      if not _fusion["active"]:
+        _merge_pending_filters()
+      results.append(OPS[step["action"]](image, step))
+    _merge_pending_filters()
+    save_image(image, payload["output"])
+  finally:
+    _fusion["active"] = False
+    _fusion["pending"].clear()
+    delete_image(image)
+  return {"output": payload["output"], "results": results}
+
+HANDLERS = {action: _edit(op) for action, op in OPS.items()}
+HANDLERS["inspect"] = _h_inspect
+HANDLERS["layer_list"] = _h_layer_list
+HANDLERS["chain"] = _h_chain
+
+action = payload.get("action")
+handler = HANDLERS.get(action)
+if handler is None:
   raise RuntimeError("Unsupported action: " + str(action))
-"""
+result = handler(payload)
+if _state is not None:
+  _state["result"] = result
+else:
+  print("HARNESS_JSON:" + json.dumps(result))
+""".replace("__IMAGE_CACHE_SIZE__", str(IMAGE_CACHE_SIZE))
+SCRIPT_VERSION = hashlib.sha256(_SCRIPT_TEMPLATE.encode("utf-8")).hexdigest()[:16]
 
 
-def _run_action(action: str, payload: Dict[str, Any], timeout_seconds: float = 240.0) -> Dict[str, Any]:
-    data = dict(payload)
-    data["action"] = action
-    try:
-        result = run_python_batch(_script(data), timeout_seconds=timeout_seconds)
-    except GimpExecutionError as exc:
-        raise BridgeOperationError("ERROR", str(exc)) from exc
-    mutating = {
+def _script(payload: Dict[str, Any]) -> str:
+    return _SCRIPT_TEMPLATE.replace("__PAYLOAD_JSON__", repr(codec.dumps(payload).decode("utf-8")), 1)
+
+
+@functools.lru_cache(maxsize=2048)
+def _resolved(path: str) -> str:
+    return str(Path(path).resolve())
+
+
+_CHAIN_METHODS = ACTION_METHODS_SET - {
+    "system.health",
+    "system.version",
+    "system.actions",
+    "system.doctor",
+    "system.soak",
+    "system.verify",
+    "project.plan_edit",
+    "project.plan_edit_batch",
+    "image.inspect",
+    "image.validate",
+    "image.diff",
+    "image.snapshot",
+    "image.undo",
+    "image.redo",
+    "history.gc",
+    "image.open",
+    "image.clone",
+    "image.crop_center",
+    "image.montage_grid",
+    "layer.list",
+    "macro.run",
+    "preset.list",
+    "preset.apply",
+    "batch.run",
+}
+
+_MUTATING_ACTIONS = frozenset(
+    {
         "resize",
         "crop",
         "rotate",
@@ -772,26 +928,148 @@ def _run_action(action: str, payload: Dict[str, Any], timeout_seconds: float = 2
         "text_add",
         "text_update",
         "stroke_selection",
+        "chain",
     }
-    if action in mutating and "image" in payload:
-        image_path = Path(str(payload["image"]))
-        output = Path(str(payload.get("output") or payload["image"]))
-        try:
-            same_target = image_path.resolve() == output.resolve()
-        except Exception:
-            same_target = str(image_path) == str(output)
-        if same_target and image_path.exists():
-            _snapshot_image(image_path, f"auto-after-{action}")
+)
+
+_capture = threading.local()
+
+
+def _run_action(action: str, payload: Dict[str, Any], timeout_seconds: float = 240.0) -> Dict[str, Any]:
+    steps = getattr(_capture, "steps", None)
+    if steps is not None:
+        steps.append((action, dict(payload), timeout_seconds))
+        return {}
+    data = dict(payload)
+    data["action"] = action
+    try:
+        result = run_python_batch(_script(data), timeout_seconds=timeout_seconds)
+    except GimpExecutionError as exc:
+        raise BridgeOperationError("ERROR", str(exc)) from exc
+    if action in _MUTATING_ACTIONS and "image" in payload:
+        image = str(payload["image"])
+        output = str(payload.get("output") or image)
+        if output == image:
+            same_target = True
+        else:
+            try:
+                same_target = _resolved(os.path.abspath(image)) == _resolved(os.path.abspath(output))
+            except Exception:
+                same_target = False
+        if same_target and os.path.exists(image):
+            _snapshot_image(Path(image), f"auto-after-{action}")
     return result
 
 
+def _run_chain(calls: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    if getattr(_capture, "steps", None) is not None or any(method not in _CHAIN_METHODS for method, _ in calls):
+        return [handle_method(method, params) for method, params in calls]
+    _capture.steps = steps = []
+    _capture.snapshot = False
+    try:
+        for method, params in calls:
+            _HANDLERS[method](params)
+    finally:
+        _capture.steps = None
+    image = steps[0][1].get("image") if steps else None
+    if len(steps) != len(calls) or any(p.get("image") != image or p.get("output") != image for _, p, _ in steps):
+        # Nothing was snapshotted while capturing, so each handler snapshots once when it runs for real.
+        return [handle_method(method, params) for method, params in calls]
+    if _capture.snapshot:
+        _snapshot_image(Path(image), "auto-before-chain")
+    payload = {"image": image, "output": image, "steps": [dict(p, action=a) for a, p, _ in steps]}
+    result = _run_action("chain", payload, timeout_seconds=sum(t for _, _, t in steps))
+    return list(result["results"])
+
+
 def _output_or_input(params: Dict[str, Any], image: str) -> str:
     return str(Path(params.get("output") or image))
 
 
+@functools.lru_cache(maxsize=None)
+def _pil() -> Tuple[Any, Any, Any]:
+    from PIL import Image, ImageColor, ImageOps
+
+    return Image, ImageColor, ImageOps
+
+
+_TILE_FORMATS = ("PNG", "JPEG", "WEBP")
+
+
+def _open_tile(source_path: Path) -> Any:
+    Image = _pil()[0]
+    try:
+        return Image.open(source_path, formats=_TILE_FORMATS)
+    except Image.UnidentifiedImageError:
+        return Image.open(source_path)
+
+
+@functools.lru_cache(maxsize=None)
+def _pyvips() -> Any:
+    try:
+        import pyvips
+    except (ImportError, OSError):
+        return None
+    return pyvips
+
+
+def _vips_tile(pyvips: Any, source_path: Path, tile_w: int, tile_h: int, fit_mode: str) -> Any:
+    # thumbnail() shrinks on load (JPEG DCT scaling, WebP/PDF scale) before resampling.
+    if fit_mode == "cover":
+        thumb = pyvips.Image.thumbnail(str(source_path), tile_w, height=tile_h, crop="centre")
+    else:
+        thumb = pyvips.Image.thumbnail(str(source_path), tile_w, height=tile_h, size="down")
+    thumb = thumb.colourspace("srgb")
+    if thumb.bands > 3:
+        thumb = thumb.extract_band(0, n=3)
+    return _pil()[0].frombytes("RGB", (thumb.width, thumb.height), thumb.write_to_memory())
+
+
+def _montage_tile(source_path: Path, tile_w: int, tile_h: int, fit_mode: str) -> Any:
+    pyvips = _pyvips()
+    if pyvips is not None:
+        try:
+            return _vips_tile(pyvips, source_path, tile_w, tile_h, fit_mode)
+        except pyvips.Error:
+            pass
+    Image, _, ImageOps = _pil()
+    with _open_tile(source_path) as src:
+        # JPEG can decode straight at a reduced scale when the tile is much smaller than the source.
+        src.draft("RGB", (tile_w, tile_h))
+        if src.mode != "RGB":
+            src = src.convert("RGB")
+        if fit_mode == "cover":
+            return ImageOps.fit(src, (tile_w, tile_h), method=Image.Resampling.LANCZOS)
+        src.thumbnail((tile_w, tile_h), resample=Image.Resampling.LANCZOS)
+        src.load()
+        return src
+
+
+def _paste_tiles(canvas: Any, tiles: Any, cols: int, tile_w: int, tile_h: int, gutter: int) -> None:
+    for i, tile in enumerate(tiles):
+        r = i // cols
+        c = i % cols
+        x = c * (tile_w + gutter) + (tile_w - tile.width) // 2
+        y = r * (tile_h + gutter) + (tile_h - tile.height) // 2
+        canvas.paste(tile, (x, y))
+
+
+def _bounded_map(
+    executor: ThreadPoolExecutor, fn: Callable[[Any], Any], items: List[Any], window: int
+) -> Iterator[Any]:
+    # Executor.map submits everything at once, so decoded tiles pile up behind a slow one.
+    pending: Deque[Any] = collections.deque()
+    for item in items:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, item))
+    while pending:
+        yield pending.popleft().result()
+
+
 def _montage_grid(params: Dict[str, Any]) -> Dict[str, Any]:
     try:
-        from PIL import Image, ImageColor, ImageOps
+        Image, ImageColor, _ = _pil()
     except Exception as exc:
         raise BridgeOperationError("ERROR", "Pillow is required for image.montage_grid") from exc
 
@@ -834,22 +1112,16 @@ def _montage_grid(params: Dict[str, Any]) -> Dict[str, Any]:
     canvas_h = rows * tile_h + (rows - 1) * gutter
     canvas = Image.new("RGB", (canvas_w, canvas_h), bg_rgb)
 
-    for i, source_path in enumerate(image_paths):
-        src = Image.open(source_path).convert("RGB")
-        if fit_mode == "cover":
-            tile = ImageOps.fit(src, (tile_w, tile_h), method=Image.Resampling.LANCZOS)
-        else:
-            tile = src.copy()
-            tile.thumbnail((tile_w, tile_h), resample=Image.Resampling.LANCZOS)
-            fitted = Image.new("RGB", (tile_w, tile_h), bg_rgb)
-            fitted.paste(tile, ((tile_w - tile.width) // 2, (tile_h - tile.height) // 2))
-            tile = fitted
+    def make_tile(path: Path) -> Any:
+        return _montage_tile(path, tile_w, tile_h, fit_mode)
 
-        r = i // cols
-        c = i % cols
-        x = c * (tile_w + gutter)
-        y = r * (tile_h + gutter)
-        canvas.paste(tile, (x, y))
+    workers = min(len(image_paths), os.cpu_count() or 1)
+    if workers == 1:
+        _paste_tiles(canvas, map(make_tile, image_paths), cols, tile_w, tile_h, gutter)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            tiles = _bounded_map(executor, make_tile, image_paths, workers * 2)
+            _paste_tiles(canvas, tiles, cols, tile_w, tile_h, gutter)
 
     canvas.save(output)
     return {
@@ -864,7 +1136,7 @@ def _montage_grid(params: Dict[str, Any]) -> Dict[str, Any]:
 
 def _exif_orientation(path: Path) -> int | None:
     try:
-        from PIL import Image
+        Image = _pil()[0]
     except Exception:
         return None
     try:
@@ -878,6 +1150,40 @@ def _exif_orientation(path: Path) -> int | None:
         return None
 
 
+def _header_dimensions(path: Path) -> Tuple[int, int] | None:
+    # Pillow only parses the header here; rotated EXIF and formats it cannot read go through GIMP.
+    try:
+        Image = _pil()[0]
+    except Exception:
+        return None
+    try:
+        with Image.open(path) as image:
+            if image.getexif().get(274, 1) != 1:
+                return None
+            return image.size
+    except Exception:
+        return None
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_color(value: str) -> str:
+    # Normalise at the bridge so a bad color fails fast instead of inside a GIMP run.
+    text = value.strip()
+    if text.startswith("#") and len(text) in (7, 9):
+        try:
+            return "#" + bytes.fromhex(text[1:]).hex()
+        except ValueError:
+            pass
+    try:
+        ImageColor = _pil()[1]
+    except ImportError:
+        return text
+    try:
+        return "#" + bytes(ImageColor.getrgb(text)).hex()
+    except ValueError as exc:
+        raise BridgeOperationError("INVALID_INPUT", f"Invalid color: {value}") from exc
+
+
 def _layer_index(params: Dict[str, Any], default: int = -1) -> int:
     raw = params.get("layerIndex", params.get("layerId", default))
     try:
@@ -887,711 +1193,1173 @@ def _layer_index(params: Dict[str, Any], default: int = -1) -> int:
 
 
 def _history_load() -> Dict[str, Any]:
-    if HISTORY_STATE.exists():
-        return json.loads(HISTORY_STATE.read_text(encoding="utf-8"))
-    return {"images": {}}
+    try:
+        raw = HISTORY_STATE.read_bytes()
+    except FileNotFoundError:
+        return {"images": {}}
+    return codec.loads(raw)
+
+
+_JOURNALS: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+_JOURNAL_LOCK = threading.Lock()
+# Held from storing a blob until the journal references it, and for all of history.gc.
+_BLOB_LOCK = threading.Lock()
+
+
+def _journal_path(image_key: str) -> Path:
+    return HISTORY_ROOT / "index" / (_new_sha256(image_key.encode("utf-8")).hexdigest()[:32] + ".jsonl")
 
 
-def _history_save(state: Dict[str, Any]) -> None:
-    HISTORY_ROOT.mkdir(parents=True, exist_ok=True)
-    HISTORY_STATE.write_text(json.dumps(state, indent=2), encoding="utf-8")
+def _legacy_history(image_key: str) -> Dict[str, Any]:
+    entry = _history_load().get("images", {}).get(image_key) or {}
+    return {"snapshots": list(entry.get("snapshots", [])), "index": int(entry.get("index", -1))}
+
+
+def _apply_history_op(image_state: Dict[str, Any], op: Dict[str, Any]) -> None:
+    if op["op"] == "push":
+        del image_state["snapshots"][image_state["index"] + 1 :]
+        image_state["snapshots"].append(op["snapshot"])
+        image_state["index"] = len(image_state["snapshots"]) - 1
+    elif op["op"] == "seek":
+        image_state["index"] = int(op["index"])
+
+
+def _image_history(image_key: str) -> Dict[str, Any]:
+    journal = _journal_path(image_key)
+    with _JOURNAL_LOCK:
+        try:
+            with open(journal, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                offset, image_state = _JOURNALS.get(str(journal), (0, None))
+                if image_state is None or size < offset:
+                    offset, image_state = 0, _legacy_history(image_key)
+                f.seek(offset)
+                tail = f.read(size - offset)
+        except FileNotFoundError:
+            _JOURNALS.pop(str(journal), None)
+            return _legacy_history(image_key)
+        # Only whole lines; a concurrent append may still be in flight.
+        end = tail.rfind(b"\n") + 1
+        for line in tail[:end].splitlines():
+            if line:
+                _apply_history_op(image_state, codec.loads(line))
+        _JOURNALS[str(journal)] = (offset + end, image_state)
+        return {"snapshots": list(image_state["snapshots"]), "index": image_state["index"]}
+
+
+def _history_append(image_key: str, op: Dict[str, Any]) -> None:
+    journal = _journal_path(image_key)
+    journal.parent.mkdir(parents=True, exist_ok=True)
+    with open(journal, "ab") as f:
+        f.write(codec.dumps(op) + b"\n")
+
+
+_SAFE_NAME_RE = re.compile(r"[^a-zA-Z0-9._-]+")
 
 
 def _safe_name(text: str) -> str:
-    cleaned = re.sub(r"[^a-zA-Z0-9._-]+", "-", text).strip("-")
+    cleaned = _SAFE_NAME_RE.sub("-", text).strip("-")
     return cleaned or "snapshot"
 
 
+_COPY_FALLBACK_ERRNOS = frozenset({errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF})
+
+
+def _copy_file(src: Path, dst: Path) -> None:
+    if hasattr(os, "copy_file_range"):
+        if os.path.exists(dst) and os.path.samefile(src, dst):
+            raise shutil.SameFileError(f"{src} and {dst} are the same file")
+        try:
+            # Lets the kernel share extents (reflink) on Btrfs/XFS and skip the userspace copy elsewhere.
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            return
+        except OSError as exc:
+            if exc.errno not in _COPY_FALLBACK_ERRNOS:
+                raise
+    shutil.copyfile(src, dst)
+
+
+def _store_blob(image: Path) -> Path:
+    # Not the memoised _sha256: a same-size rewrite within one mtime tick would alias the previous blob.
+    digest = _hash_file(str(image))
+    blob = HISTORY_ROOT / "objects" / digest[:2] / (digest[2:] + image.suffix.lower())
+    if not blob.exists():
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=blob.parent, suffix=".tmp")
+        os.close(fd)
+        try:
+            _copy_file(image, Path(tmp))
+            os.replace(tmp, blob)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+            raise
+    return blob
+
+
+def _snapshot_path(entry: Any) -> Path:
+    return Path(entry["blob"] if isinstance(entry, dict) else entry)
+
+
 def _snapshot_image(image: Path, description: str) -> Dict[str, Any]:
-    state = _history_load()
     image_key = str(image.resolve())
     stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
-    entry_dir = HISTORY_ROOT / _safe_name(image.stem)
-    entry_dir.mkdir(parents=True, exist_ok=True)
-    snapshot = entry_dir / f"{stamp}__{_safe_name(description)}{image.suffix.lower()}"
-    shutil.copyfile(image, snapshot)
-    image_state = state["images"].setdefault(image_key, {"snapshots": [], "index": -1})
-    image_state["snapshots"] = image_state["snapshots"][: image_state["index"] + 1]
-    image_state["snapshots"].append(str(snapshot))
-    image_state["index"] = len(image_state["snapshots"]) - 1
-    _history_save(state)
-    return {"snapshot": str(snapshot), "index": image_state["index"], "count": len(image_state["snapshots"])}
+    with _BLOB_LOCK:
+        blob = _store_blob(image)
+        image_state = _image_history(image_key)
+        op = {"op": "push", "snapshot": {"blob": str(blob), "description": description, "createdAt": stamp}}
+        _apply_history_op(image_state, op)
+        _history_append(image_key, op)
+    return {"snapshot": str(blob), "index": image_state["index"], "count": len(image_state["snapshots"])}
 
 
 def _undo_redo(image: Path, direction: int) -> Dict[str, Any]:
-    state = _history_load()
     image_key = str(image.resolve())
-    image_state = state.get("images", {}).get(image_key)
-    if not image_state or not image_state.get("snapshots"):
+    image_state = _image_history(image_key)
+    if not image_state["snapshots"]:
         raise BridgeOperationError("INVALID_INPUT", f"No snapshot history for: {image}")
-    idx = int(image_state.get("index", -1))
-    next_idx = idx + direction
+    next_idx = image_state["index"] + direction
     if next_idx < 0 or next_idx >= len(image_state["snapshots"]):
         raise BridgeOperationError("INVALID_INPUT", "No further history step available")
-    target = Path(image_state["snapshots"][next_idx])
+    target = _snapshot_path(image_state["snapshots"][next_idx])
     if not target.exists():
         raise BridgeOperationError("NOT_FOUND", f"Snapshot missing: {target}")
-    shutil.copyfile(target, image)
-    image_state["index"] = next_idx
-    _history_save(state)
+    _copy_file(target, image)
+    _history_append(image_key, {"op": "seek", "index": next_idx})
     return {"image": str(image), "snapshot": str(target), "index": next_idx, "count": len(image_state["snapshots"])}
 
 
+# Content fingerprints, not a security boundary: lets FIPS-mode OpenSSL builds keep the fast path.
+_new_sha256 = functools.partial(hashlib.new, "sha256", usedforsecurity=False)
+
+
 def _sha256(path: Path) -> str:
-    h = hashlib.sha256()
-    with path.open("rb") as f:
-        for chunk in iter(lambda: f.read(1024 * 1024), b""):
-            h.update(chunk)
-    return h.hexdigest()
+    st = os.stat(path)
+    return _sha256_file(os.path.realpath(path), st.st_ino, st.st_mtime_ns, st.st_size)
 
 
-def _maybe_auto_snapshot(image: Path, params: Dict[str, Any], label: str) -> None:
-    output = Path(str(params.get("output") or image))
+@functools.lru_cache(maxsize=1024)
+def _sha256_file(path: str, inode: int, mtime_ns: int, size: int) -> str:
+    return _hash_file(path)
+
+
+def _hash_file(path: str) -> str:
+    with open(path, "rb", buffering=0) as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, _new_sha256).hexdigest()
+        h = _new_sha256()
+        view = memoryview(bytearray(1024 * 1024))
+        while n := f.readinto(view):
+            h.update(view[:n])
+        return h.hexdigest()
+
+
+def _writes_in_place(image: Path, params: Dict[str, Any]) -> bool:
+    output = params.get("output")
+    if not output or str(output) == str(image):
+        return True
     try:
-        same_target = output.resolve() == image.resolve()
+        return Path(str(output)).resolve() == image.resolve()
     except Exception:
-        same_target = str(output) == str(image)
-    if same_target:
-        _snapshot_image(image, f"auto-before-{label}")
+        return False
 
 
-def handle_method(method: str, params: Dict[str, Any]) -> Dict[str, Any]:
-    if method == "system.health":
-        return {"ok": True}
-    if method == "system.version":
-        return {"packageVersion": __version__}
-    if method == "system.actions":
-        return {"actions": ACTION_METHODS}
-    if method == "system.doctor":
-        verbose = bool(params.get("verbose", False))
-        bridge_url_env = os.getenv("HARNESS_GIMP_BRIDGE_URL")
-        bridge_url = bridge_url_env or "http://127.0.0.1:41749"
-        try:
-            gimp_bin = resolve_gimp_binary()
-        except GimpExecutionError as exc:
-            return {"healthy": False, "issues": [str(exc)]}
-        proc = subprocess.run([str(gimp_bin), "--version"], capture_output=True, text=True, timeout=15)
-        data = {
-            "healthy": proc.returncode == 0,
-            "gimpBinary": str(gimp_bin),
-            "gimpVersionRaw": (proc.stdout or proc.stderr).strip(),
-            "issues": [] if proc.returncode == 0 else ["Unable to run gimp --version"],
-            "nonFatalWarningsSuppressed": True,
+def _maybe_auto_snapshot(image: Path, params: Dict[str, Any], label: str) -> None:
+    if params.get("_skipAutoSnapshot") or not _writes_in_place(image, params):
+        return
+    if getattr(_capture, "steps", None) is not None:
+        # _run_chain takes one snapshot for the whole chain once it knows the steps can be chained.
+        _capture.snapshot = True
+        return
+    _snapshot_image(image, f"auto-before-{label}")
+
+
+_Handler = Callable[[Dict[str, Any]], Dict[str, Any]]
+_HANDLERS: Dict[str, _Handler] = {}
+
+
+def _register(*methods: str) -> Callable[[_Handler], _Handler]:
+    def decorator(fn: _Handler) -> _Handler:
+        for method in methods:
+            _HANDLERS[method] = fn
+        return fn
+
+    return decorator
+
+
+@_register("system.health")
+def _system_health(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {"ok": True}
+
+
+@_register("system.version")
+def _system_version(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {"packageVersion": __version__, "scriptVersion": SCRIPT_VERSION}
+
+
+@_register("system.actions")
+def _system_actions(params: Dict[str, Any]) -> Dict[str, Any]:
+    # The tuple is shared as-is; every wire codec encodes it as an array.
+    return {"actions": ACTION_METHODS}
+
+
+@_register("system.doctor")
+def _system_doctor(params: Dict[str, Any]) -> Dict[str, Any]:
+    verbose = bool(params.get("verbose", False))
+    bridge_url_env = os.getenv("HARNESS_GIMP_BRIDGE_URL")
+    bridge_url = bridge_url_env or "http://127.0.0.1:41749"
+    try:
+        gimp_bin = resolve_gimp_binary(refresh=True)
+    except GimpExecutionError as exc:
+        return {"healthy": False, "issues": [str(exc)]}
+    proc = subprocess.run([str(gimp_bin), "--version"], capture_output=True, text=True, timeout=15)
+    data = {
+        "healthy": proc.returncode == 0,
+        "gimpBinary": str(gimp_bin),
+        "gimpVersionRaw": (proc.stdout or proc.stderr).strip(),
+        "issues": [] if proc.returncode == 0 else ["Unable to run gimp --version"],
+        "nonFatalWarningsSuppressed": True,
+    }
+    if verbose:
+        data["runtime"] = {
+            "pythonExecutable": sys.executable,
+            "modulePath": str(Path(__file__).resolve()),
+            "bridgeUrl": bridge_url,
+            "bridgeUrlSource": "HARNESS_GIMP_BRIDGE_URL" if bridge_url_env else "default",
+            "gimpProfileDir": str(resolve_profile_dir(refresh=True)),
+            "invocationHint": "Prefer `harness-gimp` or `harnessgg-gimp` over `python -m harness_gimp` to reduce module collision risk.",
         }
-        if verbose:
-            data["runtime"] = {
-                "pythonExecutable": sys.executable,
-                "modulePath": str(Path(__file__).resolve()),
-                "bridgeUrl": bridge_url,
-                "bridgeUrlSource": "HARNESS_GIMP_BRIDGE_URL" if bridge_url_env else "default",
-                "gimpProfileDir": str(resolve_profile_dir()),
-                "invocationHint": "Prefer `harness-gimp` or `harnessgg-gimp` over `python -m harness_gimp` to reduce module collision risk.",
-            }
-        return data
-    if method == "system.soak":
-        iterations = int(params.get("iterations", 100))
-        action = str(params.get("action", "system.health"))
-        action_params = params.get("action_params", {}) or {}
-        failures = 0
-        for _ in range(max(1, iterations)):
+    return data
+
+
+@_register("system.soak")
+def _system_soak(params: Dict[str, Any]) -> Dict[str, Any]:
+    iterations = int(params.get("iterations", 100))
+    action = str(params.get("action", "system.health"))
+    action_params = params.get("action_params", {}) or {}
+    rounds = max(1, iterations)
+    handler = _HANDLERS.get(action)
+    failures = 0
+    if handler is None:
+        failures = rounds
+    elif action != "system.health":
+        for _ in range(rounds):
             try:
-                if action == "system.health":
-                    handle_method("system.health", {})
-                else:
-                    handle_method(action, action_params)
+                handler(action_params)
             except Exception:
                 failures += 1
-        return {"iterations": iterations, "action": action, "failures": failures, "stable": failures == 0}
-    if method == "project.plan_edit":
-        image = str(_require_path(str(params.get("image", ""))))
-        action = str(params.get("action", "")).strip()
-        action_params = params.get("params", {}) or {}
-        method_map = {
-            "resize": "image.resize",
-            "crop": "image.crop",
-            "crop-center": "image.crop_center",
-            "rotate": "image.rotate",
-            "flip": "image.flip",
-            "canvas-size": "image.canvas_size",
-            "montage-grid": "image.montage_grid",
-            "brightness-contrast": "adjust.brightness_contrast",
-            "levels": "adjust.levels",
-            "curves": "adjust.curves",
-            "hue-saturation": "adjust.hue_saturation",
-            "color-balance": "adjust.color_balance",
-            "color-temperature": "adjust.color_temperature",
-            "invert": "adjust.invert",
-            "desaturate": "adjust.desaturate",
-            "blur": "filter.blur",
-            "gaussian-blur": "filter.gaussian_blur",
-            "sharpen": "filter.sharpen",
-            "unsharp-mask": "filter.unsharp_mask",
-            "noise-reduction": "filter.noise_reduction",
-            "layer-add": "layer.add",
-            "layer-remove": "layer.remove",
-            "layer-rename": "layer.rename",
-            "layer-opacity": "layer.opacity",
-            "layer-blend-mode": "layer.blend_mode",
-            "layer-duplicate": "layer.duplicate",
-            "layer-merge-down": "layer.merge_down",
-            "layer-reorder": "layer.reorder",
-            "select-all": "selection.all",
-            "select-none": "selection.none",
-            "invert-selection": "selection.invert",
-            "feather-selection": "selection.feather",
-            "select-rectangle": "selection.rectangle",
-            "select-ellipse": "selection.ellipse",
-            "add-layer-mask": "mask.add",
-            "apply-layer-mask": "mask.apply",
-            "add-text": "text.add",
-            "update-text": "text.update",
-            "stroke-selection": "annotation.stroke_selection",
-        }
-        if action not in method_map:
+    return {"iterations": iterations, "action": action, "failures": failures, "stable": failures == 0}
+
+
+@_register("system.verify")
+def _system_verify(params: Dict[str, Any]) -> Dict[str, Any]:
+    iterations = max(1, int(params.get("iterations", 10)))
+    handler = _HANDLERS["system.health"]
+    failures = 0
+    latencies_ms = array.array("d", [0.0]) * iterations
+    clock = time.perf_counter
+    for i in range(iterations):
+        start = clock()
+        try:
+            handler({})
+        except Exception:
+            failures += 1
+        latencies_ms[i] = (clock() - start) * 1000
+    return {
+        "iterations": iterations,
+        "failures": failures,
+        "latencyMs": {
+            "min": round(min(latencies_ms), 3),
+            "max": round(max(latencies_ms), 3),
+            "avg": round(sum(latencies_ms) / iterations, 3),
+        },
+        "samplesMs": [round(sample, 3) for sample in latencies_ms],
+    }
+
+
+@_register("project.plan_edit")
+def _project_plan_edit(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    action = str(params.get("action", "")).strip()
+    action_params = params.get("params", {}) or {}
+    if action not in PLAN_ACTIONS:
+        raise BridgeOperationError("INVALID_INPUT", f"Unsupported plan action: {action}")
+    merged = {"image": image}
+    merged.update(action_params)
+    _maybe_auto_snapshot(image_path, merged, f"plan-{action}")
+    merged["_skipAutoSnapshot"] = True
+    return handle_method(PLAN_ACTIONS[action], merged)
+
+
+@_register("project.plan_edit_batch")
+def _project_plan_edit_batch(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    steps = params.get("steps")
+    if not isinstance(steps, list) or not steps:
+        raise BridgeOperationError("INVALID_INPUT", "steps must be a non-empty list")
+    actions = []
+    calls = []
+    for step in steps:
+        if not isinstance(step, dict):
+            raise BridgeOperationError("INVALID_INPUT", "each plan step must be an object")
+        action = str(step.get("action", "")).strip()
+        if action not in PLAN_ACTIONS:
             raise BridgeOperationError("INVALID_INPUT", f"Unsupported plan action: {action}")
         merged = {"image": image}
-        merged.update(action_params)
-        return handle_method(method_map[action], merged)
-    if method == "image.open":
-        image = str(_require_path(str(params.get("image", ""))))
-        return _run_action("inspect", {"image": image}, timeout_seconds=180)
-    if method == "image.save":
-        image = str(_require_path(str(params.get("image", ""))))
-        output = str(params.get("output", "")).strip()
-        if not output:
-            raise BridgeOperationError("INVALID_INPUT", "output is required")
-        return _run_action("export", {"image": image, "output": output})
-    if method == "image.clone":
-        source = _require_path(str(params.get("source", "")))
-        target = Path(str(params.get("target", "")))
-        if not str(target):
-            raise BridgeOperationError("INVALID_INPUT", "target is required")
-        if target.exists() and not bool(params.get("overwrite", False)):
-            raise BridgeOperationError("INVALID_INPUT", f"Target exists: {target}")
-        target.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copyfile(source, target)
-        return {"source": str(source), "target": str(target)}
-    if method == "image.inspect":
-        image = str(_require_path(str(params.get("image", ""))))
-        data = _run_action("inspect", {"image": image}, timeout_seconds=180)
-        exif_orientation = _exif_orientation(Path(image))
-        data["exifOrientation"] = exif_orientation
-        data["orientationWarning"] = bool(exif_orientation and exif_orientation != 1)
-        return data
-    if method == "image.validate":
-        image = str(_require_path(str(params.get("image", ""))))
-        data = _run_action("inspect", {"image": image}, timeout_seconds=180)
-        return {"isValid": data["width"] > 0 and data["height"] > 0, "details": data}
-    if method == "image.diff":
-        source = _require_path(str(params.get("source", "")))
-        target = _require_path(str(params.get("target", "")))
-        src_info = _run_action("inspect", {"image": str(source)}, timeout_seconds=180)
-        tgt_info = _run_action("inspect", {"image": str(target)}, timeout_seconds=180)
-        src_hash = _sha256(source)
-        tgt_hash = _sha256(target)
-        return {
-            "sameBytes": src_hash == tgt_hash,
-            "source": {"path": str(source), "sha256": src_hash, "width": src_info["width"], "height": src_info["height"]},
-            "target": {"path": str(target), "sha256": tgt_hash, "width": tgt_info["width"], "height": tgt_info["height"]},
-            "sameDimensions": (src_info["width"], src_info["height"]) == (tgt_info["width"], tgt_info["height"]),
-        }
-    if method == "image.snapshot":
-        image = _require_path(str(params.get("image", "")))
-        description = str(params.get("description", "snapshot"))
-        return _snapshot_image(image, description)
-    if method == "image.undo":
-        image = _require_path(str(params.get("image", "")))
-        return _undo_redo(image, -1)
-    if method == "image.redo":
-        image = _require_path(str(params.get("image", "")))
-        return _undo_redo(image, 1)
-    if method == "image.resize":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "resize")
-        width = int(params.get("width", 0))
-        height = int(params.get("height", 0))
-        if width <= 0 or height <= 0:
-            raise BridgeOperationError("INVALID_INPUT", "width and height must be > 0")
-        return _run_action("resize", {"image": image, "width": width, "height": height, "output": _output_or_input(params, image)})
-    if method == "image.crop":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "crop")
-        width = int(params.get("width", 0))
-        height = int(params.get("height", 0))
-        if width <= 0 or height <= 0:
-            raise BridgeOperationError("INVALID_INPUT", "width and height must be > 0")
-        return _run_action(
-            "crop",
-            {
-                "image": image,
-                "width": width,
-                "height": height,
-                "x": int(params.get("x", 0)),
-                "y": int(params.get("y", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "image.crop_center":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "crop-center")
-        width = int(params.get("width", 0))
-        height = int(params.get("height", 0))
-        if width <= 0 or height <= 0:
-            raise BridgeOperationError("INVALID_INPUT", "width and height must be > 0")
+        merged.update(step.get("params", {}) or {})
+        actions.append(action)
+        calls.append((PLAN_ACTIONS[action], merged))
+    if any(_writes_in_place(image_path, merged) for _, merged in calls):
+        _snapshot_image(image_path, "auto-before-plan")
+    for _, merged in calls:
+        merged["_skipAutoSnapshot"] = True
+    with _path_scope():
+        results = [
+            {"action": action, "method": method, "result": result}
+            for action, (method, _), result in zip(actions, calls, _run_chain(calls))
+        ]
+    return {"image": image, "steps": results}
+
+
+@_register("image.open")
+def _image_open(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    return _run_action("inspect", {"image": image}, timeout_seconds=180)
+
+
+@_register("image.save")
+def _image_save(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    output = str(params.get("output", "")).strip()
+    if not output:
+        raise BridgeOperationError("INVALID_INPUT", "output is required")
+    return _run_action("export", {"image": image, "output": output})
+
+
+@_register("image.clone")
+def _image_clone(params: Dict[str, Any]) -> Dict[str, Any]:
+    source = _require_path(str(params.get("source", "")))
+    target = Path(str(params.get("target", "")))
+    if not str(target):
+        raise BridgeOperationError("INVALID_INPUT", "target is required")
+    if target.exists() and not bool(params.get("overwrite", False)):
+        raise BridgeOperationError("INVALID_INPUT", f"Target exists: {target}")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    _copy_file(source, target)
+    return {"source": str(source), "target": str(target)}
+
+
+@_register("image.inspect")
+def _image_inspect(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    data = _run_action("inspect", {"image": image}, timeout_seconds=180)
+    exif_orientation = _exif_orientation(image_path)
+    data["exifOrientation"] = exif_orientation
+    data["orientationWarning"] = bool(exif_orientation and exif_orientation != 1)
+    return data
+
+
+@_register("image.validate")
+def _image_validate(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    data = _run_action("inspect", {"image": image}, timeout_seconds=180)
+    return {"isValid": data["width"] > 0 and data["height"] > 0, "details": data}
+
+
+@_register("image.diff")
+def _image_diff(params: Dict[str, Any]) -> Dict[str, Any]:
+    source = _require_path(str(params.get("source", "")))
+    target = _require_path(str(params.get("target", "")))
+    src_stat, tgt_stat = os.stat(source), os.stat(target)
+    same_file = (src_stat.st_dev, src_stat.st_ino) == (tgt_stat.st_dev, tgt_stat.st_ino)
+    same_size = src_stat.st_size == tgt_stat.st_size
+    # Different sizes already settle sameBytes; only hash then if the caller wants the digests.
+    want_hashes = same_size or bool(params.get("hashes", True))
+    src_hash = tgt_hash = None
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        src_job = executor.submit(_run_action, "inspect", {"image": str(source)}, timeout_seconds=180)
+        tgt_job = src_job
+        if not same_file:
+            tgt_job = executor.submit(_run_action, "inspect", {"image": str(target)}, timeout_seconds=180)
+        if want_hashes:
+            # With equal sizes sameBytes rests on the digests, so bypass the memo: a same-size
+            # rewrite within one mtime tick would otherwise report the previous content's digest.
+            digest = _sha256 if same_file or not same_size else (lambda path: _hash_file(str(path)))
+            src_hash_job = executor.submit(digest, source)
+            tgt_hash_job = src_hash_job if same_file else executor.submit(digest, target)
+            src_hash, tgt_hash = src_hash_job.result(), tgt_hash_job.result()
+        src_info, tgt_info = src_job.result(), tgt_job.result()
+    return {
+        "sameBytes": same_file or (same_size and src_hash == tgt_hash),
+        "source": {"path": str(source), "sha256": src_hash, "width": src_info["width"], "height": src_info["height"]},
+        "target": {"path": str(target), "sha256": tgt_hash, "width": tgt_info["width"], "height": tgt_info["height"]},
+        "sameDimensions": (src_info["width"], src_info["height"]) == (tgt_info["width"], tgt_info["height"]),
+    }
+
+
+@_register("image.snapshot")
+def _image_snapshot(params: Dict[str, Any]) -> Dict[str, Any]:
+    image = _require_path(str(params.get("image", "")))
+    description = str(params.get("description", "snapshot"))
+    return _snapshot_image(image, description)
+
+
+@_register("image.undo")
+def _image_undo(params: Dict[str, Any]) -> Dict[str, Any]:
+    image = _require_path(str(params.get("image", "")))
+    return _undo_redo(image, -1)
+
+
+@_register("image.redo")
+def _image_redo(params: Dict[str, Any]) -> Dict[str, Any]:
+    image = _require_path(str(params.get("image", "")))
+    return _undo_redo(image, 1)
+
+
+@_register("history.gc")
+def _history_gc(params: Dict[str, Any]) -> Dict[str, Any]:
+    with _BLOB_LOCK:
+        return _collect_blobs()
+
+
+def _collect_blobs() -> Dict[str, Any]:
+    entries = [entry for legacy in _history_load()["images"].values() for entry in legacy.get("snapshots", [])]
+    index = HISTORY_ROOT / "index"
+    if index.is_dir():
+        for journal in index.glob("*.jsonl"):
+            # Replaying without the legacy prefix truncates less, so it can only keep extra blobs.
+            image_state: Dict[str, Any] = {"snapshots": [], "index": -1}
+            for line in journal.read_bytes().splitlines():
+                if line.strip():
+                    _apply_history_op(image_state, codec.loads(line))
+            entries.extend(image_state["snapshots"])
+    referenced = {str(_snapshot_path(entry)) for entry in entries}
+    removed = 0
+    freed = 0
+    objects = HISTORY_ROOT / "objects"
+    if objects.is_dir():
+        for blob in objects.glob("*/*"):
+            if blob.suffix == ".tmp" or str(blob) in referenced:
+                continue
+            freed += blob.stat().st_size
+            blob.unlink()
+            removed += 1
+        for bucket in objects.iterdir():
+            with contextlib.suppress(OSError):
+                bucket.rmdir()
+    return {"removed": removed, "freedBytes": freed}
+
+
+@_register("image.resize")
+def _image_resize(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "resize")
+    width = int(params.get("width", 0))
+    height = int(params.get("height", 0))
+    if width <= 0 or height <= 0:
+        raise BridgeOperationError("INVALID_INPUT", "width and height must be > 0")
+    return _run_action("resize", {"image": image, "width": width, "height": height, "output": _output_or_input(params, image)})
+
+
+@_register("image.crop")
+def _image_crop(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "crop")
+    width = int(params.get("width", 0))
+    height = int(params.get("height", 0))
+    if width <= 0 or height <= 0:
+        raise BridgeOperationError("INVALID_INPUT", "width and height must be > 0")
+    return _run_action(
+        "crop",
+        {
+            "image": image,
+            "width": width,
+            "height": height,
+            "x": int(params.get("x", 0)),
+            "y": int(params.get("y", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("image.crop_center")
+def _image_crop_center(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "crop-center")
+    width = int(params.get("width", 0))
+    height = int(params.get("height", 0))
+    if width <= 0 or height <= 0:
+        raise BridgeOperationError("INVALID_INPUT", "width and height must be > 0")
+    size = _header_dimensions(image_path)
+    if size is None:
         inspect = _run_action("inspect", {"image": image}, timeout_seconds=180)
-        src_w = int(inspect["width"])
-        src_h = int(inspect["height"])
-        if width > src_w or height > src_h:
-            raise BridgeOperationError("INVALID_INPUT", "crop size cannot exceed source dimensions")
-        x = int((src_w - width) // 2)
-        y = int((src_h - height) // 2)
-        return _run_action(
-            "crop",
-            {"image": image, "width": width, "height": height, "x": x, "y": y, "output": _output_or_input(params, image)},
-        )
-    if method == "image.rotate":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "rotate")
-        degrees = int(params.get("degrees", 0))
-        if degrees not in {90, 180, 270}:
-            raise BridgeOperationError("INVALID_INPUT", "degrees must be one of 90, 180, 270")
-        return _run_action("rotate", {"image": image, "degrees": degrees, "output": _output_or_input(params, image)})
-    if method == "image.flip":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "flip")
-        axis = str(params.get("axis", "horizontal")).lower()
-        if axis not in {"horizontal", "vertical"}:
-            raise BridgeOperationError("INVALID_INPUT", "axis must be horizontal or vertical")
-        return _run_action("flip", {"image": image, "axis": axis, "output": _output_or_input(params, image)})
-    if method == "image.canvas_size":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "canvas-size")
-        width = int(params.get("width", 0))
-        height = int(params.get("height", 0))
-        if width <= 0 or height <= 0:
-            raise BridgeOperationError("INVALID_INPUT", "width and height must be > 0")
-        return _run_action(
-            "canvas_size",
-            {
-                "image": image,
-                "width": width,
-                "height": height,
-                "offsetX": int(params.get("offsetX", 0)),
-                "offsetY": int(params.get("offsetY", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "image.export":
-        image = str(_require_path(str(params.get("image", ""))))
-        output = str(params.get("output", "")).strip()
-        if not output:
-            raise BridgeOperationError("INVALID_INPUT", "output is required")
-        return _run_action("export", {"image": image, "output": output})
-    if method == "image.montage_grid":
-        return _montage_grid(params)
-    if method == "adjust.brightness_contrast":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "brightness-contrast")
-        return _run_action(
-            "brightness_contrast",
-            {
-                "image": image,
-                "brightness": float(params.get("brightness", 0)),
-                "contrast": float(params.get("contrast", 0)),
-                "layerIndex": int(params.get("layerIndex", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "adjust.levels":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "levels")
-        return _run_action(
-            "levels",
-            {
-                "image": image,
-                "black": float(params.get("black", 0)),
-                "white": float(params.get("white", 255)),
-                "gamma": float(params.get("gamma", 1.0)),
-                "layerIndex": int(params.get("layerIndex", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "adjust.hue_saturation":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "hue-saturation")
-        return _run_action(
-            "hue_saturation",
-            {
-                "image": image,
-                "hue": float(params.get("hue", 0)),
-                "saturation": float(params.get("saturation", 0)),
-                "lightness": float(params.get("lightness", 0)),
-                "layerIndex": int(params.get("layerIndex", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "adjust.color_balance":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "color-balance")
-        return _run_action(
-            "color_balance",
-            {
-                "image": image,
-                "transferMode": str(params.get("transferMode", "MIDTONES")),
-                "cyanRed": float(params.get("cyanRed", 0)),
-                "magentaGreen": float(params.get("magentaGreen", 0)),
-                "yellowBlue": float(params.get("yellowBlue", 0)),
-                "layerIndex": int(params.get("layerIndex", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "adjust.curves":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "curves")
-        points = params.get("points")
-        if not isinstance(points, list):
-            raise BridgeOperationError("INVALID_INPUT", "points must be a list of {x,y} objects or [x,y] pairs")
-        return _run_action(
-            "curves",
-            {
-                "image": image,
-                "channel": str(params.get("channel", "value")),
-                "points": points,
-                "layerIndex": int(params.get("layerIndex", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "adjust.color_temperature":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "color-temperature")
-        return _run_action(
-            "color_temperature",
-            {
-                "image": image,
-                "temperature": float(params.get("temperature", 6500.0)),
-                "layerIndex": int(params.get("layerIndex", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "adjust.invert":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "invert")
-        return _run_action(
-            "invert",
-            {"image": image, "layerIndex": int(params.get("layerIndex", 0)), "output": _output_or_input(params, image)},
-        )
-    if method == "adjust.desaturate":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "desaturate")
-        return _run_action(
-            "desaturate",
-            {
-                "image": image,
-                "mode": str(params.get("mode", "luma")),
-                "layerIndex": int(params.get("layerIndex", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "filter.blur":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "blur")
-        return _run_action(
-            "blur",
-            {
-                "image": image,
-                "radius": float(params.get("radius", 4.0)),
-                "layerIndex": int(params.get("layerIndex", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "filter.gaussian_blur":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "gaussian-blur")
-        return _run_action(
-            "gaussian_blur",
-            {
-                "image": image,
-                "radiusX": float(params.get("radiusX", 4.0)),
-                "radiusY": float(params.get("radiusY", params.get("radiusX", 4.0))),
-                "layerIndex": int(params.get("layerIndex", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "filter.sharpen":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "sharpen")
-        return _run_action(
-            "sharpen",
-            {
-                "image": image,
-                "radius": float(params.get("radius", 2.0)),
-                "amount": float(params.get("amount", 1.0)),
-                "layerIndex": int(params.get("layerIndex", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "filter.unsharp_mask":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "unsharp-mask")
-        return _run_action(
-            "unsharp_mask",
-            {
-                "image": image,
-                "radius": float(params.get("radius", 2.0)),
-                "amount": float(params.get("amount", 1.0)),
-                "threshold": float(params.get("threshold", 0.0)),
-                "layerIndex": int(params.get("layerIndex", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "filter.noise_reduction":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "noise-reduction")
-        return _run_action(
-            "noise_reduction",
-            {
-                "image": image,
-                "strength": int(params.get("strength", 3)),
-                "layerIndex": int(params.get("layerIndex", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "layer.list":
-        image = str(_require_path(str(params.get("image", ""))))
-        return _run_action("layer_list", {"image": image}, timeout_seconds=180)
-    if method == "layer.add":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "layer-add")
-        name = str(params.get("name", "")).strip()
-        if not name:
-            raise BridgeOperationError("INVALID_INPUT", "name is required")
-        return _run_action(
-            "layer_add",
-            {"image": image, "name": name, "position": int(params.get("position", 0)), "output": _output_or_input(params, image)},
-        )
-    if method == "layer.remove":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "layer-remove")
-        return _run_action(
-            "layer_remove",
-            {"image": image, "layerIndex": int(params.get("layerIndex", -1)), "output": _output_or_input(params, image)},
-        )
-    if method == "layer.rename":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "layer-rename")
-        name = str(params.get("name", "")).strip()
-        if not name:
-            raise BridgeOperationError("INVALID_INPUT", "name is required")
-        return _run_action(
-            "layer_rename",
-            {
-                "image": image,
-                "layerIndex": int(params.get("layerIndex", -1)),
-                "name": name,
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "layer.opacity":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "layer-opacity")
-        opacity = float(params.get("opacity", -1))
-        if opacity < 0 or opacity > 100:
-            raise BridgeOperationError("INVALID_INPUT", "opacity must be between 0 and 100")
-        return _run_action(
-            "layer_opacity",
-            {
-                "image": image,
-                "layerIndex": int(params.get("layerIndex", -1)),
-                "opacity": opacity,
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "layer.blend_mode":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "layer-blend-mode")
-        mode = str(params.get("mode", "")).strip()
-        if not mode:
-            raise BridgeOperationError("INVALID_INPUT", "mode is required")
-        return _run_action(
-            "layer_blend_mode",
-            {
-                "image": image,
-                "layerIndex": int(params.get("layerIndex", -1)),
-                "mode": mode,
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "layer.merge_down":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "layer-merge-down")
-        return _run_action(
-            "layer_merge_down",
-            {"image": image, "layerIndex": int(params.get("layerIndex", -1)), "output": _output_or_input(params, image)},
-        )
-    if method == "layer.duplicate":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "layer-duplicate")
-        return _run_action(
-            "layer_duplicate",
-            {
-                "image": image,
-                "layerIndex": int(params.get("layerIndex", -1)),
-                "position": int(params.get("position", int(params.get("layerIndex", 0)) + 1)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "layer.reorder":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "layer-reorder")
-        return _run_action(
-            "layer_reorder",
-            {
-                "image": image,
-                "layerIndex": int(params.get("layerIndex", -1)),
-                "index": int(params.get("index", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method in {"selection.all", "selection.none", "selection.invert"}:
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, method.replace(".", "-"))
-        action = {
-            "selection.all": "selection_all",
-            "selection.none": "selection_none",
-            "selection.invert": "selection_invert",
-        }[method]
-        return _run_action(action, {"image": image, "output": _output_or_input(params, image)})
-    if method == "selection.feather":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "selection-feather")
-        return _run_action(
-            "selection_feather",
-            {"image": image, "radius": float(params.get("radius", 5.0)), "output": _output_or_input(params, image)},
-        )
-    if method == "selection.rectangle":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "selection-rectangle")
-        return _run_action(
-            "selection_rectangle",
-            {
-                "image": image,
-                "x": float(params.get("x", 0)),
-                "y": float(params.get("y", 0)),
-                "width": float(params.get("width", 0)),
-                "height": float(params.get("height", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "selection.ellipse":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "selection-ellipse")
-        return _run_action(
-            "selection_ellipse",
-            {
-                "image": image,
-                "x": float(params.get("x", 0)),
-                "y": float(params.get("y", 0)),
-                "width": float(params.get("width", 0)),
-                "height": float(params.get("height", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "mask.add":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "mask-add")
-        return _run_action(
-            "mask_add",
-            {
-                "image": image,
-                "layerIndex": _layer_index(params, -1),
-                "mode": str(params.get("mode", "WHITE")),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "mask.apply":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "mask-apply")
-        return _run_action(
-            "mask_apply",
-            {"image": image, "layerIndex": _layer_index(params, -1), "output": _output_or_input(params, image)},
-        )
-    if method == "text.add":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "text-add")
-        return _run_action(
-            "text_add",
-            {
-                "image": image,
-                "text": str(params.get("text", "")),
-                "x": int(params.get("x", 0)),
-                "y": int(params.get("y", 0)),
-                "font": str(params.get("font", "Sans")),
-                "size": float(params.get("size", 36)),
-                "color": params.get("color"),
-                "layerIndex": int(params.get("layerIndex", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "text.update":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "text-update")
-        return _run_action(
-            "text_update",
-            {
-                "image": image,
-                "text": str(params.get("text", "")),
-                "layerIndex": _layer_index(params, -1),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "annotation.stroke_selection":
-        image = str(_require_path(str(params.get("image", ""))))
-        _maybe_auto_snapshot(Path(image), params, "stroke-selection")
-        return _run_action(
-            "stroke_selection",
-            {
-                "image": image,
-                "width": float(params.get("width", 1.0)),
-                "color": params.get("color", "#ffffff"),
-                "layerIndex": int(params.get("layerIndex", 0)),
-                "output": _output_or_input(params, image),
-            },
-        )
-    if method == "macro.run":
-        image = str(_require_path(str(params.get("image", ""))))
-        macro = params.get("macro")
-        macro_params = params.get("params", {}) or {}
-        macro_steps: List[Dict[str, Any]]
-        if isinstance(macro, list):
-            macro_steps = macro
-        else:
-            macro_path = _require_path(str(macro))
-            macro_steps = json.loads(macro_path.read_text(encoding="utf-8"))
-        if not isinstance(macro_steps, list):
-            raise BridgeOperationError("INVALID_INPUT", "macro must be a list of steps")
-        outputs = []
-        for step in macro_steps:
-            if not isinstance(step, dict) or "method" not in step:
-                raise BridgeOperationError("INVALID_INPUT", "each macro step must contain method")
-            step_method = str(step["method"])
-            step_params = dict(step.get("params", {}))
-            step_params.setdefault("image", image)
-            for k, v in macro_params.items():
-                step_params.setdefault(k, v)
-            outputs.append({"method": step_method, "result": handle_method(step_method, step_params)})
-        return {"steps": outputs}
-    if method == "preset.list":
-        return {"presets": sorted(PRESETS.keys())}
-    if method == "preset.apply":
-        image = str(_require_path(str(params.get("image", ""))))
-        name = str(params.get("preset", "")).strip()
-        if name not in PRESETS:
-            raise BridgeOperationError("INVALID_INPUT", f"Unknown preset: {name}")
-        results = []
-        for step in PRESETS[name]:
-            p = dict(step.get("params", {}))
-            p.setdefault("image", image)
-            p.setdefault("output", image)
-            results.append({"method": step["method"], "result": handle_method(step["method"], p)})
-        return {"preset": name, "results": results}
-    raise BridgeOperationError("INVALID_INPUT", f"Unknown method: {method}")
+        size = int(inspect["width"]), int(inspect["height"])
+    src_w, src_h = size
+    if width > src_w or height > src_h:
+        raise BridgeOperationError("INVALID_INPUT", "crop size cannot exceed source dimensions")
+    x = int((src_w - width) // 2)
+    y = int((src_h - height) // 2)
+    return _run_action(
+        "crop",
+        {"image": image, "width": width, "height": height, "x": x, "y": y, "output": _output_or_input(params, image)},
+    )
+
+
+@_register("image.rotate")
+def _image_rotate(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "rotate")
+    degrees = int(params.get("degrees", 0))
+    if degrees not in {90, 180, 270}:
+        raise BridgeOperationError("INVALID_INPUT", "degrees must be one of 90, 180, 270")
+    return _run_action("rotate", {"image": image, "degrees": degrees, "output": _output_or_input(params, image)})
+
+
+@_register("image.flip")
+def _image_flip(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "flip")
+    axis = str(params.get("axis", "horizontal")).lower()
+    if axis not in {"horizontal", "vertical"}:
+        raise BridgeOperationError("INVALID_INPUT", "axis must be horizontal or vertical")
+    return _run_action("flip", {"image": image, "axis": axis, "output": _output_or_input(params, image)})
+
+
+@_register("image.canvas_size")
+def _image_canvas_size(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "canvas-size")
+    width = int(params.get("width", 0))
+    height = int(params.get("height", 0))
+    if width <= 0 or height <= 0:
+        raise BridgeOperationError("INVALID_INPUT", "width and height must be > 0")
+    return _run_action(
+        "canvas_size",
+        {
+            "image": image,
+            "width": width,
+            "height": height,
+            "offsetX": int(params.get("offsetX", 0)),
+            "offsetY": int(params.get("offsetY", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("image.export")
+def _image_export(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    output = str(params.get("output", "")).strip()
+    if not output:
+        raise BridgeOperationError("INVALID_INPUT", "output is required")
+    return _run_action("export", {"image": image, "output": output})
+
+
+@_register("image.montage_grid")
+def _image_montage_grid(params: Dict[str, Any]) -> Dict[str, Any]:
+    return _montage_grid(params)
+
+
+@_register("adjust.brightness_contrast")
+def _adjust_brightness_contrast(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "brightness-contrast")
+    return _run_action(
+        "brightness_contrast",
+        {
+            "image": image,
+            "brightness": float(params.get("brightness", 0)),
+            "contrast": float(params.get("contrast", 0)),
+            "layerIndex": int(params.get("layerIndex", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("adjust.levels")
+def _adjust_levels(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "levels")
+    return _run_action(
+        "levels",
+        {
+            "image": image,
+            "black": float(params.get("black", 0)),
+            "white": float(params.get("white", 255)),
+            "gamma": float(params.get("gamma", 1.0)),
+            "layerIndex": int(params.get("layerIndex", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("adjust.hue_saturation")
+def _adjust_hue_saturation(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "hue-saturation")
+    return _run_action(
+        "hue_saturation",
+        {
+            "image": image,
+            "hue": float(params.get("hue", 0)),
+            "saturation": float(params.get("saturation", 0)),
+            "lightness": float(params.get("lightness", 0)),
+            "layerIndex": int(params.get("layerIndex", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("adjust.color_balance")
+def _adjust_color_balance(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "color-balance")
+    return _run_action(
+        "color_balance",
+        {
+            "image": image,
+            "transferMode": str(params.get("transferMode", "MIDTONES")),
+            "cyanRed": float(params.get("cyanRed", 0)),
+            "magentaGreen": float(params.get("magentaGreen", 0)),
+            "yellowBlue": float(params.get("yellowBlue", 0)),
+            "layerIndex": int(params.get("layerIndex", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("adjust.curves")
+def _adjust_curves(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "curves")
+    points = params.get("points")
+    if not isinstance(points, list):
+        raise BridgeOperationError("INVALID_INPUT", "points must be a list of {x,y} objects or [x,y] pairs")
+    return _run_action(
+        "curves",
+        {
+            "image": image,
+            "channel": str(params.get("channel", "value")),
+            "points": points,
+            "layerIndex": int(params.get("layerIndex", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("adjust.color_temperature")
+def _adjust_color_temperature(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "color-temperature")
+    return _run_action(
+        "color_temperature",
+        {
+            "image": image,
+            "temperature": float(params.get("temperature", 6500.0)),
+            "layerIndex": int(params.get("layerIndex", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("adjust.invert")
+def _adjust_invert(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "invert")
+    return _run_action(
+        "invert",
+        {"image": image, "layerIndex": int(params.get("layerIndex", 0)), "output": _output_or_input(params, image)},
+    )
+
+
+@_register("adjust.desaturate")
+def _adjust_desaturate(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "desaturate")
+    return _run_action(
+        "desaturate",
+        {
+            "image": image,
+            "mode": str(params.get("mode", "luma")),
+            "layerIndex": int(params.get("layerIndex", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("filter.blur")
+def _filter_blur(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "blur")
+    return _run_action(
+        "blur",
+        {
+            "image": image,
+            "radius": float(params.get("radius", 4.0)),
+            "layerIndex": int(params.get("layerIndex", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("filter.gaussian_blur")
+def _filter_gaussian_blur(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "gaussian-blur")
+    return _run_action(
+        "gaussian_blur",
+        {
+            "image": image,
+            "radiusX": float(params.get("radiusX", 4.0)),
+            "radiusY": float(params.get("radiusY", params.get("radiusX", 4.0))),
+            "layerIndex": int(params.get("layerIndex", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("filter.sharpen")
+def _filter_sharpen(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "sharpen")
+    return _run_action(
+        "sharpen",
+        {
+            "image": image,
+            "radius": float(params.get("radius", 2.0)),
+            "amount": float(params.get("amount", 1.0)),
+            "layerIndex": int(params.get("layerIndex", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("filter.unsharp_mask")
+def _filter_unsharp_mask(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "unsharp-mask")
+    return _run_action(
+        "unsharp_mask",
+        {
+            "image": image,
+            "radius": float(params.get("radius", 2.0)),
+            "amount": float(params.get("amount", 1.0)),
+            "threshold": float(params.get("threshold", 0.0)),
+            "layerIndex": int(params.get("layerIndex", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("filter.noise_reduction")
+def _filter_noise_reduction(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "noise-reduction")
+    return _run_action(
+        "noise_reduction",
+        {
+            "image": image,
+            "strength": int(params.get("strength", 3)),
+            "layerIndex": int(params.get("layerIndex", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("layer.list")
+def _layer_list(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    return _run_action("layer_list", {"image": image}, timeout_seconds=180)
+
+
+@_register("layer.add")
+def _layer_add(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "layer-add")
+    name = str(params.get("name", "")).strip()
+    if not name:
+        raise BridgeOperationError("INVALID_INPUT", "name is required")
+    return _run_action(
+        "layer_add",
+        {"image": image, "name": name, "position": int(params.get("position", 0)), "output": _output_or_input(params, image)},
+    )
+
+
+@_register("layer.remove")
+def _layer_remove(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "layer-remove")
+    return _run_action(
+        "layer_remove",
+        {"image": image, "layerIndex": int(params.get("layerIndex", -1)), "output": _output_or_input(params, image)},
+    )
+
+
+@_register("layer.rename")
+def _layer_rename(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "layer-rename")
+    name = str(params.get("name", "")).strip()
+    if not name:
+        raise BridgeOperationError("INVALID_INPUT", "name is required")
+    return _run_action(
+        "layer_rename",
+        {
+            "image": image,
+            "layerIndex": int(params.get("layerIndex", -1)),
+            "name": name,
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("layer.opacity")
+def _layer_opacity(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "layer-opacity")
+    opacity = float(params.get("opacity", -1))
+    if opacity < 0 or opacity > 100:
+        raise BridgeOperationError("INVALID_INPUT", "opacity must be between 0 and 100")
+    return _run_action(
+        "layer_opacity",
+        {
+            "image": image,
+            "layerIndex": int(params.get("layerIndex", -1)),
+            "opacity": opacity,
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("layer.blend_mode")
+def _layer_blend_mode(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "layer-blend-mode")
+    mode = str(params.get("mode", "")).strip()
+    if not mode:
+        raise BridgeOperationError("INVALID_INPUT", "mode is required")
+    return _run_action(
+        "layer_blend_mode",
+        {
+            "image": image,
+            "layerIndex": int(params.get("layerIndex", -1)),
+            "mode": mode,
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("layer.merge_down")
+def _layer_merge_down(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "layer-merge-down")
+    return _run_action(
+        "layer_merge_down",
+        {"image": image, "layerIndex": int(params.get("layerIndex", -1)), "output": _output_or_input(params, image)},
+    )
+
+
+@_register("layer.duplicate")
+def _layer_duplicate(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "layer-duplicate")
+    return _run_action(
+        "layer_duplicate",
+        {
+            "image": image,
+            "layerIndex": int(params.get("layerIndex", -1)),
+            "position": int(params.get("position", int(params.get("layerIndex", 0)) + 1)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("layer.reorder")
+def _layer_reorder(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "layer-reorder")
+    return _run_action(
+        "layer_reorder",
+        {
+            "image": image,
+            "layerIndex": int(params.get("layerIndex", -1)),
+            "index": int(params.get("index", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+def _selection_toggle(method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, method.replace(".", "-"))
+    return _run_action(method.replace(".", "_"), {"image": image, "output": _output_or_input(params, image)})
+
+
+for _method in ("selection.all", "selection.none", "selection.invert"):
+    _HANDLERS[_method] = functools.partial(_selection_toggle, _method)
+
+
+@_register("selection.feather")
+def _selection_feather(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "selection-feather")
+    return _run_action(
+        "selection_feather",
+        {"image": image, "radius": float(params.get("radius", 5.0)), "output": _output_or_input(params, image)},
+    )
+
+
+@_register("selection.rectangle")
+def _selection_rectangle(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "selection-rectangle")
+    return _run_action(
+        "selection_rectangle",
+        {
+            "image": image,
+            "x": float(params.get("x", 0)),
+            "y": float(params.get("y", 0)),
+            "width": float(params.get("width", 0)),
+            "height": float(params.get("height", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("selection.ellipse")
+def _selection_ellipse(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "selection-ellipse")
+    return _run_action(
+        "selection_ellipse",
+        {
+            "image": image,
+            "x": float(params.get("x", 0)),
+            "y": float(params.get("y", 0)),
+            "width": float(params.get("width", 0)),
+            "height": float(params.get("height", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("mask.add")
+def _mask_add(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "mask-add")
+    return _run_action(
+        "mask_add",
+        {
+            "image": image,
+            "layerIndex": _layer_index(params, -1),
+            "mode": str(params.get("mode", "WHITE")),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("mask.apply")
+def _mask_apply(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "mask-apply")
+    return _run_action(
+        "mask_apply",
+        {"image": image, "layerIndex": _layer_index(params, -1), "output": _output_or_input(params, image)},
+    )
+
+
+@_register("text.add")
+def _text_add(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "text-add")
+    return _run_action(
+        "text_add",
+        {
+            "image": image,
+            "text": str(params.get("text", "")),
+            "x": int(params.get("x", 0)),
+            "y": int(params.get("y", 0)),
+            "font": str(params.get("font", "Sans")),
+            "size": float(params.get("size", 36)),
+            "color": _parse_color(str(params["color"])) if params.get("color") else None,
+            "layerIndex": int(params.get("layerIndex", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("text.update")
+def _text_update(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "text-update")
+    return _run_action(
+        "text_update",
+        {
+            "image": image,
+            "text": str(params.get("text", "")),
+            "layerIndex": _layer_index(params, -1),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+@_register("annotation.stroke_selection")
+def _annotation_stroke_selection(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    _maybe_auto_snapshot(image_path, params, "stroke-selection")
+    return _run_action(
+        "stroke_selection",
+        {
+            "image": image,
+            "width": float(params.get("width", 1.0)),
+            "color": _parse_color(str(params.get("color") or "#ffffff")),
+            "layerIndex": int(params.get("layerIndex", 0)),
+            "output": _output_or_input(params, image),
+        },
+    )
+
+
+_MacroSteps = Tuple[Tuple[str, Mapping[str, Any]], ...]
+
+
+def _compile_macro(steps: Any) -> _MacroSteps:
+    if not isinstance(steps, list):
+        raise BridgeOperationError("INVALID_INPUT", "macro must be a list of steps")
+    compiled = []
+    for step in steps:
+        if not isinstance(step, dict) or "method" not in step:
+            raise BridgeOperationError("INVALID_INPUT", "each macro step must contain method")
+        base = step.get("params") or {}
+        if not isinstance(base, dict):
+            raise BridgeOperationError("INVALID_INPUT", "macro step params must be an object")
+        compiled.append((str(step["method"]), MappingProxyType(dict(base))))
+    return tuple(compiled)
+
+
+@functools.lru_cache(maxsize=128)
+def _load_macro(path: str, mtime_ns: int, size: int) -> _MacroSteps:
+    return _compile_macro(codec.loads(Path(path).read_bytes()))
+
+
+@_register("macro.run")
+def _macro_run(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    macro = params.get("macro")
+    macro_params = params.get("params", {}) or {}
+    if isinstance(macro, list):
+        macro_steps = _compile_macro(macro)
+    else:
+        macro_path = _require_path(str(macro))
+        st = os.stat(macro_path)
+        macro_steps = _load_macro(os.path.realpath(macro_path), st.st_mtime_ns, st.st_size)
+    handlers = []
+    for method, _ in macro_steps:
+        handler = _HANDLERS.get(method)
+        if handler is None:
+            raise BridgeOperationError("INVALID_INPUT", f"Unknown method: {method}")
+        handlers.append(handler)
+    outputs = []
+    with _path_scope():
+        for (method, base), handler in zip(macro_steps, handlers):
+            # Step params win over the macro image, which wins over shared macro params.
+            step_params = {**macro_params, "image": image, **base}
+            outputs.append({"method": method, "result": handler(step_params)})
+    return {"steps": outputs}
+
+
+@_register("preset.list")
+def _preset_list(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {"presets": list(_PRESET_NAMES)}
+
+
+@_register("preset.apply")
+def _preset_apply(params: Dict[str, Any]) -> Dict[str, Any]:
+    image_path = _require_path(str(params.get("image", "")))
+    image = str(image_path)
+    name = str(params.get("preset", "")).strip()
+    if name not in PRESETS:
+        raise BridgeOperationError("INVALID_INPUT", f"Unknown preset: {name}")
+    calls = [(method, {"image": image, "output": image, **base}) for method, base in _COMPILED_PRESETS[name]]
+    with _path_scope():
+        results = [{"method": m, "result": r} for (m, _), r in zip(calls, _run_chain(calls))]
+    return {"preset": name, "results": results}
+
+
+@_register("batch.run")
+def _batch_run(params: Dict[str, Any]) -> Dict[str, Any]:
+    ops = params.get("ops")
+    if not isinstance(ops, list) or not ops:
+        raise BridgeOperationError("INVALID_INPUT", "ops must be a non-empty list of {method, params}")
+    calls = []
+    for op in ops:
+        if not isinstance(op, dict) or "method" not in op:
+            raise BridgeOperationError("INVALID_INPUT", "each batch op must contain method")
+        method = str(op["method"])
+        if method not in _HANDLERS or method == "batch.run":
+            raise BridgeOperationError("INVALID_INPUT", f"Unknown method: {method}")
+        op_params = op.get("params") or {}
+        if not isinstance(op_params, dict):
+            raise BridgeOperationError("INVALID_INPUT", "batch op params must be an object")
+        calls.append((method, dict(op_params)))
+    # Ops that all edit one image in place collapse into a single GIMP load/save via _run_chain.
+    with _path_scope():
+        results = [{"method": m, "result": r} for (m, _), r in zip(calls, _run_chain(calls))]
+    return {"results": results}
+
+
+def handle_method(method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    handler = _HANDLERS.get(method)
+    if handler is None:
+        raise BridgeOperationError("INVALID_INPUT", f"Unknown method: {method}")
+    return handler(params)
@@ -1,11 +1,17 @@
+from types import MappingProxyType
+from typing import Mapping
+
 PROTOCOL_VERSION = "1.0"
 
-ERROR_CODES = {
-    "OK": 0,
-    "ERROR": 1,
-    "NOT_FOUND": 2,
-    "VALIDATION_FAILED": 3,
-    "INVALID_INPUT": 4,
-    "BRIDGE_UNAVAILABLE": 5,
-    "BRIDGE_HTTP_ERROR": 6,
-}
+ERROR_CODES: Mapping[str, int] = MappingProxyType(
+    {
+        "OK": 0,
+        "ERROR": 1,
+        "NOT_FOUND": 2,
+        "VALIDATION_FAILED": 3,
+        "INVALID_INPUT": 4,
+        "BRIDGE_UNAVAILABLE": 5,
+        "BRIDGE_HTTP_ERROR": 6,
+        "BRIDGE_TIMEOUT": 7,
+    }
+)
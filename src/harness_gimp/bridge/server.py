@@ -1,46 +1,196 @@
-import json
-from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
-from typing import Any, Dict
+import functools
+import os
+import queue
+import socketserver
+import stat
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Dict, Tuple
 
 from harness_gimp.bridge.operations import BridgeOperationError, handle_method
+from harness_gimp.core import codec
+from harness_gimp.core.gimp import prewarm_worker
+
+
+_HEALTH_OK: Dict[str, Any] = {"ok": True}
+_NOT_FOUND: Dict[str, Any] = {"ok": False, "error": "not found"}
+_NOT_AN_OBJECT: Dict[str, Any] = {"ok": False, "error": {"code": "INVALID_INPUT", "message": "request must be an object"}}
+_NOT_A_LIST: Dict[str, Any] = {"ok": False, "error": {"code": "INVALID_INPUT", "message": "batch body must be a list"}}
+_LENGTH_REQUIRED: Dict[str, Any] = {"ok": False, "error": {"code": "INVALID_INPUT", "message": "Content-Length is required"}}
+_NO_MSGPACK: Dict[str, Any] = {"ok": False, "error": {"code": "INVALID_INPUT", "message": "msgpack is not installed on the bridge"}}
+
+
+@functools.lru_cache(maxsize=None)
+def _response_head(status: int, content_type: str, close: bool) -> bytes:
+    head = f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\nContent-Type: {content_type}\r\nContent-Length: %d\r\n"
+    if close:
+        head += "Connection: close\r\n"
+    return (head + "\r\n").encode("latin-1")
+
+
+def _dispatch(payload: Any) -> Tuple[int, Dict[str, Any]]:
+    if not isinstance(payload, dict):
+        return 400, _NOT_AN_OBJECT
+    try:
+        result = handle_method(payload.get("method"), payload.get("params") or {})
+        return 200, {"ok": True, "result": result}
+    except BridgeOperationError as exc:
+        return 400, {"ok": False, "error": {"code": exc.code, "message": exc.message}}
+    except Exception as exc:  # pragma: no cover
+        return 500, {"ok": False, "error": {"code": "ERROR", "message": str(exc)}}
 
 
 class BridgeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Idle keep-alive sockets give their pooled worker back after this long; clients reconnect transparently.
+    timeout = 5
+    msgpack_wire = False
+
     def do_GET(self) -> None:  # noqa: N802
+        self.msgpack_wire = False
         if self.path == "/health":
-            self._send_json(200, {"ok": True})
+            self._send_json(200, _HEALTH_OK)
             return
-        self._send_json(404, {"ok": False, "error": "not found"})
+        self._send_json(404, _NOT_FOUND)
 
     def do_POST(self) -> None:  # noqa: N802
+        self.msgpack_wire = False
+        if self.path == "/rpc/batch":
+            self._handle_batch()
+            return
         if self.path != "/rpc":
-            self._send_json(404, {"ok": False, "error": "not found"})
+            self.close_connection = True
+            self._send_json(404, _NOT_FOUND)
             return
-        length = int(self.headers.get("Content-Length", "0"))
-        raw = self.rfile.read(length).decode("utf-8") if length else "{}"
+        ok, payload = self._read_payload()
+        if ok:
+            self._send_json(*_dispatch(payload))
+
+    def _handle_batch(self) -> None:
+        ok, payload = self._read_payload()
+        if not ok:
+            return
+        if not isinstance(payload, list):
+            self._send_json(400, _NOT_A_LIST)
+            return
+        self._send_json(200, {"ok": True, "results": [_dispatch(entry)[1] for entry in payload]})
+
+    def _read_payload(self) -> Tuple[bool, Any]:
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            self.close_connection = True
+            self._send_json(411, _LENGTH_REQUIRED)
+            return False, None
+        if self.headers.get("Content-Type", "").startswith(codec.MSGPACK_CONTENT_TYPE):
+            if codec.msgpack is None:
+                self.close_connection = True
+                self._send_json(415, _NO_MSGPACK)
+                return False, None
+            self.msgpack_wire = True
         try:
-            payload = json.loads(raw)
-            method = payload.get("method")
-            params = payload.get("params") or {}
-            result = handle_method(method, params)
-            self._send_json(200, {"ok": True, "result": result})
-        except BridgeOperationError as exc:
-            self._send_json(400, {"ok": False, "error": {"code": exc.code, "message": exc.message}})
-        except Exception as exc:  # pragma: no cover
+            return True, self._read_json()
+        except Exception as exc:
+            # The body may be partially unread; never parse it as the next request.
+            self.close_connection = True
             self._send_json(500, {"ok": False, "error": {"code": "ERROR", "message": str(exc)}})
+            return False, None
+
+    def _read_json(self) -> Any:
+        length = int(self.headers.get("Content-Length", "0"))
+        if length < 0:
+            raise ValueError(f"invalid Content-Length: {length}")
+        if self.msgpack_wire:
+            return codec.unpackb(self.rfile.read(length)) if length else {}
+        return codec.loads(self.rfile.read(length)) if length else {}
 
     def log_message(self, format: str, *args: Any) -> None:  # noqa: A003
         return
 
     def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
-        body = json.dumps(payload).encode("utf-8")
-        self.send_response(status)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Content-Length", str(len(body)))
-        self.end_headers()
-        self.wfile.write(body)
+        if self.msgpack_wire:
+            body, content_type = codec.packb(payload), codec.MSGPACK_CONTENT_TYPE
+        else:
+            body, content_type = codec.dumps(payload), "application/json"
+        # One write for head and body; send_response/send_header would format each line separately.
+        self.wfile.write(_response_head(status, content_type, self.close_connection) % len(body) + body)
+
+
+class _WorkerPoolMixIn(socketserver.ThreadingMixIn):
+    # Reuses a bounded set of daemon threads instead of one new thread per connection.
+    # A keep-alive client holds its worker until it disconnects or idles out (BridgeHandler.timeout),
+    # so a burst above max_workers queues for at most that long.
+    daemon_threads = True
+    max_workers = 64
+    _requests: Any = None
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        if self._requests is None:
+            self._requests = queue.SimpleQueue()
+            self._pool_lock = threading.Lock()
+            self._workers = 0
+            self._idle = 0
+        with self._pool_lock:
+            if self._idle:
+                self._idle -= 1
+            elif self._workers < self.max_workers:
+                self._workers += 1
+                threading.Thread(target=self._serve_pooled, daemon=True).start()
+        self._requests.put((request, client_address))
+
+    def _serve_pooled(self) -> None:
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            self.process_request_thread(*item)
+            with self._pool_lock:
+                self._idle += 1
+
+    def server_close(self) -> None:
+        super().server_close()
+        if self._requests is not None:
+            for _ in range(self._workers):
+                self._requests.put(None)
+
+
+class BridgeHTTPServer(_WorkerPoolMixIn, HTTPServer):
+    pass
+
+
+if hasattr(socketserver, "UnixStreamServer"):
+
+    class BridgeUnixServer(_WorkerPoolMixIn, socketserver.UnixStreamServer):
+        pass
 
 
 def run_bridge_server(host: str, port: int) -> None:
-    server = ThreadingHTTPServer((host, port), BridgeHandler)
+    server = BridgeHTTPServer((host, port), BridgeHandler)
+    prewarm_worker()
     server.serve_forever()
+
+
+def _unlink_socket(socket_path: str) -> None:
+    try:
+        mode = os.lstat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(f"Refusing to replace non-socket file: {socket_path}")
+    os.unlink(socket_path)
+
+
+def _bind_unix_server(socket_path: str) -> socketserver.BaseServer:
+    if not hasattr(socketserver, "UnixStreamServer"):
+        raise OSError("Unix domain sockets are not supported on this platform")
+    _unlink_socket(socket_path)
+    return BridgeUnixServer(socket_path, BridgeHandler)
+
+
+def run_bridge_unix_server(socket_path: str) -> None:
+    server = _bind_unix_server(socket_path)
+    prewarm_worker()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        _unlink_socket(socket_path)
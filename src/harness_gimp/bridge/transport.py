@@ -0,0 +1,117 @@
+import select
+import socket
+import threading
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from typing import Dict, List, Optional, Tuple
+
+_NO_HEADERS: Dict[str, str] = {}
+
+
+class _TCPHTTPConnection(HTTPConnection):
+    def connect(self) -> None:
+        # http.client already disables Nagle; also keep idle pooled sockets alive.
+        super().connect()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+
+class _TCPHTTPSConnection(HTTPSConnection):
+    def connect(self) -> None:
+        super().connect()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+
+class _UnixHTTPConnection(HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+def _is_dropped(sock: socket.socket) -> bool:
+    # An idle keep-alive socket is only readable once the bridge has closed it.
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+class ConnectionPool:
+    def __init__(self, host: str, port: int, socket_path: Optional[str] = None, secure: bool = False):
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.secure = secure
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conns: List[HTTPConnection] = []
+        self._generation = 0
+
+    def _new_connection(self, timeout: float) -> HTTPConnection:
+        if self.socket_path:
+            return _UnixHTTPConnection(self.socket_path, timeout)
+        if self.secure:
+            return _TCPHTTPSConnection(self.host, self.port, timeout=timeout)
+        return _TCPHTTPConnection(self.host, self.port, timeout=timeout)
+
+    def _connection(self, timeout: float) -> Tuple[HTTPConnection, bool]:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "generation", None) != self._generation:
+            conn = self._new_connection(timeout)
+            with self._lock:
+                self._conns.append(conn)
+                self._local.conn = conn
+                self._local.generation = self._generation
+        elif conn.sock is not None and _is_dropped(conn.sock):
+            conn.close()
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, conn.sock is not None
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 30,
+    ) -> Tuple[int, bytes, str]:
+        conn, reused = self._connection(timeout)
+        sent = False
+        try:
+            conn.request(method, path, body=body, headers=headers or _NO_HEADERS)
+            sent = True
+            response = conn.getresponse()
+            return response.status, response.read(), response.getheader("Content-Type", "")
+        except ConnectionError:
+            conn.close()
+            # Once a POST is written the bridge may already have applied it; never replay it.
+            if not reused or (sent and method != "GET"):
+                raise
+        except HTTPException as exc:
+            conn.close()
+            raise ConnectionError(f"{type(exc).__name__}: {exc}") from exc
+        except BaseException:
+            # A timed-out or interrupted exchange leaves the socket mid-response.
+            conn.close()
+            raise
+        conn.request(method, path, body=body, headers=headers or _NO_HEADERS)
+        response = conn.getresponse()
+        return response.status, response.read(), response.getheader("Content-Type", "")
+
+    def close(self) -> None:
+        with self._lock:
+            conns, self._conns = self._conns, []
+            self._generation += 1
+        for conn in conns:
+            conn.close()
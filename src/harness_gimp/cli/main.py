@@ -1,18 +1,20 @@
-import json
+import array
+import atexit
+import glob
 import os
 import signal
 import subprocess
 import sys
 import time
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import typer
 
 from harness_gimp import __version__
 from harness_gimp.bridge.client import BridgeClient, BridgeClientError
 from harness_gimp.bridge.protocol import ERROR_CODES, PROTOCOL_VERSION
-from harness_gimp.bridge.server import run_bridge_server
+from harness_gimp.core import codec
 
 app = typer.Typer(add_completion=False, help="Bridge-first CLI for GIMP editing")
 bridge_app = typer.Typer(add_completion=False, help="Bridge lifecycle and verification")
@@ -20,7 +22,14 @@ app.add_typer(bridge_app, name="bridge")
 
 
 def _print(payload: Dict[str, Any]) -> None:
-    typer.echo(json.dumps(payload, indent=2))
+    body = codec.dumps(payload, indent=True)
+    out = getattr(sys.stdout, "buffer", None)
+    if out is None:
+        typer.echo(body.decode("utf-8"))
+        return
+    sys.stdout.flush()
+    out.write(body + b"\n")
+    out.flush()
 
 
 def _ok(command: str, data: Dict[str, Any]) -> None:
@@ -28,6 +37,7 @@ def _ok(command: str, data: Dict[str, Any]) -> None:
 
 
 def _fail(command: str, code: str, message: str, retryable: bool = False) -> None:
+    exit_code = ERROR_CODES.get(code, 1)
     _print(
         {
             "ok": False,
@@ -36,7 +46,7 @@ def _fail(command: str, code: str, message: str, retryable: bool = False) -> Non
             "error": {"code": code, "message": message, "retryable": retryable},
         }
     )
-    raise SystemExit(ERROR_CODES.get(code, 1))
+    raise SystemExit(exit_code)
 
 
 def _bridge_state_dir() -> Path:
@@ -71,14 +81,30 @@ def _resolve_bridge_url() -> str:
     return "http://127.0.0.1:41749"
 
 
+_SESSION_CLIENT: Optional[BridgeClient] = None
+
+
 def _bridge_client() -> BridgeClient:
-    return BridgeClient(_resolve_bridge_url())
+    global _SESSION_CLIENT
+    url = _resolve_bridge_url()
+    if _SESSION_CLIENT is None or _SESSION_CLIENT.url != url:
+        _SESSION_CLIENT = BridgeClient(url)
+    return _SESSION_CLIENT
+
 
+@atexit.register
+def _close_session_client() -> None:
+    global _SESSION_CLIENT
+    if _SESSION_CLIENT is not None:
+        _SESSION_CLIENT.close()
+        _SESSION_CLIENT = None
 
-def _call_bridge(command: str, method: str, params: Dict[str, Any], timeout_seconds: float = 30) -> Dict[str, Any]:
-    client = _bridge_client()
+
+def _call_bridge(
+    command: str, method: str, params: Dict[str, Any], timeout_seconds: float = 30, cache_ttl: float = 0
+) -> Dict[str, Any]:
     try:
-        return client.call(method, params, timeout_seconds=timeout_seconds)
+        return _bridge_client().call(method, params, timeout_seconds=timeout_seconds, cache_ttl=cache_ttl)
     except BridgeClientError as exc:
         _fail(command, exc.code, exc.message, retryable=exc.code == "BRIDGE_UNAVAILABLE")
     except Exception as exc:  # pragma: no cover
@@ -86,56 +112,95 @@ def _call_bridge(command: str, method: str, params: Dict[str, Any], timeout_seco
     raise RuntimeError("unreachable")
 
 
+_HEALTH_TTL_SECONDS = 2.0
+
+
+def _img_out(image: Path, output: Optional[Path]) -> Tuple[str, str]:
+    img = str(image)
+    return img, str(output) if output else img
+
+
 def _ensure_bridge_ready(command: str) -> None:
-    _call_bridge(command, "system.health", {}, timeout_seconds=5)
+    # Only successful checks are cached, so a dead bridge is still reported on the next command.
+    _call_bridge(command, "system.health", {}, timeout_seconds=5, cache_ttl=_HEALTH_TTL_SECONDS)
 
 
 @bridge_app.command("serve")
-def bridge_serve(host: str = typer.Option("127.0.0.1", "--host"), port: int = typer.Option(41749, "--port")) -> None:
+def bridge_serve(
+    host: str = typer.Option("127.0.0.1", "--host"),
+    port: int = typer.Option(41749, "--port"),
+    socket_path: Optional[Path] = typer.Option(None, "--socket", help="Serve on a Unix domain socket instead of TCP"),
+) -> None:
+    # The server drags in http.server and every GIMP operation; only `bridge serve` needs them.
+    from harness_gimp.bridge.server import run_bridge_server, run_bridge_unix_server
+
+    if socket_path is not None:
+        run_bridge_unix_server(str(socket_path))
+        return
     run_bridge_server(host, port)
 
 
 @bridge_app.command("start")
-def bridge_start(host: str = typer.Option("127.0.0.1", "--host"), port: int = typer.Option(41749, "--port")) -> None:
+def bridge_start(
+    host: str = typer.Option("127.0.0.1", "--host"),
+    port: int = typer.Option(41749, "--port"),
+    socket_path: Optional[Path] = typer.Option(None, "--socket", help="Serve on a Unix domain socket instead of TCP"),
+) -> None:
     pid_file = _bridge_pid_file()
     url_file = _bridge_url_file()
+    serve_args = ["--host", host, "--port", str(port)]
     bridge_url = f"http://{host}:{port}"
-    if pid_file.exists():
-        try:
-            pid = int(pid_file.read_text(encoding="utf-8").strip())
-            os.kill(pid, 0)
-            if not url_file.exists():
-                url_file.write_text(bridge_url, encoding="utf-8")
-            _ok("bridge.start", {"status": "already-running", "pid": pid, "host": host, "port": port, "url": bridge_url})
-            return
-        except Exception:
-            pid_file.unlink(missing_ok=True)
+    if socket_path is not None:
+        socket_path = socket_path.resolve()
+        serve_args = ["--socket", str(socket_path)]
+        bridge_url = f"unix://{socket_path.as_posix()}"
+    running_pid: Optional[int] = None
+    try:
+        running_pid = int(pid_file.read_text(encoding="utf-8").strip())
+        os.kill(running_pid, 0)
+    except FileNotFoundError:
+        running_pid = None
+    except (OSError, ValueError):
+        running_pid = None
+        pid_file.unlink(missing_ok=True)
+    if running_pid is not None:
+        if not url_file.exists():
+            url_file.write_text(bridge_url, encoding="utf-8")
+        _ok("bridge.start", {"status": "already-running", "pid": running_pid, "host": host, "port": port, "url": bridge_url})
+        return
 
-    creationflags = 0
+    popen_kwargs: Dict[str, Any] = {}
     if os.name == "nt":
-        creationflags = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS
+        popen_kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS
+    else:
+        popen_kwargs["start_new_session"] = True
     child_env = os.environ.copy()
     child_env["HARNESS_GIMP_BRIDGE_URL"] = bridge_url
     process = subprocess.Popen(
-        [sys.executable, "-m", "harness_gimp", "bridge", "serve", "--host", host, "--port", str(port)],
+        [sys.executable, "-m", "harness_gimp", "bridge", "serve", *serve_args],
+        stdin=subprocess.DEVNULL,
         stdout=subprocess.DEVNULL,
         stderr=subprocess.DEVNULL,
-        creationflags=creationflags,
         env=child_env,
+        **popen_kwargs,
     )
     pid_file.write_text(str(process.pid), encoding="utf-8")
     url_file.write_text(bridge_url, encoding="utf-8")
     os.environ["HARNESS_GIMP_BRIDGE_URL"] = bridge_url
 
-    for _ in range(30):
-        time.sleep(0.1)
+    probe = BridgeClient(bridge_url)
+    delay = 0.01
+    deadline = time.monotonic() + 3.0
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, 0.2)
         try:
-            status = BridgeClient(bridge_url).health()
-            if status.get("ok"):
-                _ok("bridge.start", {"status": "started", "pid": process.pid, "host": host, "port": port, "url": bridge_url})
-                return
+            status = probe.health()
         except BridgeClientError:
             continue
+        if status.get("ok"):
+            _ok("bridge.start", {"status": "started", "pid": process.pid, "host": host, "port": port, "url": bridge_url})
+            return
     _fail("bridge.start", "BRIDGE_UNAVAILABLE", "Bridge process started but health check failed")
 
 
@@ -158,8 +223,8 @@ def bridge_stop() -> None:
 
 @bridge_app.command("status")
 def bridge_status() -> None:
-    client = _bridge_client()
     try:
+        client = _bridge_client()
         health = client.health()
         _ok("bridge.status", {"running": True, "health": health, "url": client.url})
     except BridgeClientError as exc:
@@ -170,18 +235,33 @@ def bridge_status() -> None:
 def bridge_verify(
     iterations: int = typer.Option(10, "--iterations", min=1, max=200),
     max_failures: int = typer.Option(0, "--max-failures", min=0),
+    server_side: bool = typer.Option(
+        False, "--server-side", help="Time health checks inside the bridge in one RPC instead of per round-trip"
+    ),
 ) -> None:
-    client = _bridge_client()
+    try:
+        client = _bridge_client()
+    except BridgeClientError as exc:
+        _fail("bridge.verify", exc.code, exc.message)
     failures = 0
-    latencies_ms = []
-    for _ in range(iterations):
-        start = time.perf_counter()
+    samples_ms: List[float] = []
+    if server_side:
         try:
-            client.call("system.health", {})
+            result = client.call("system.verify", {"iterations": iterations}, timeout_seconds=max(30, iterations))
+            failures = int(result.get("failures", 0))
+            samples_ms = list(result.get("samplesMs", []))
         except BridgeClientError:
-            failures += 1
-        latencies_ms.append(round((time.perf_counter() - start) * 1000, 3))
-        time.sleep(0.02)
+            failures = iterations
+    else:
+        latencies_ms = array.array("d", [0.0]) * iterations
+        for i in range(iterations):
+            start = time.perf_counter()
+            try:
+                client.call("system.health", {})
+            except BridgeClientError:
+                failures += 1
+            latencies_ms[i] = (time.perf_counter() - start) * 1000
+        samples_ms = [round(sample, 3) for sample in latencies_ms]
     stable = failures <= max_failures
     data = {
         "stable": stable,
@@ -189,10 +269,11 @@ def bridge_verify(
         "failures": failures,
         "maxFailuresAllowed": max_failures,
         "latencyMs": {
-            "min": min(latencies_ms),
-            "max": max(latencies_ms),
-            "avg": round(sum(latencies_ms) / len(latencies_ms), 3),
+            "min": min(samples_ms, default=0.0),
+            "max": max(samples_ms, default=0.0),
+            "avg": round(sum(samples_ms) / len(samples_ms), 3) if samples_ms else 0.0,
         },
+        "samplesMs": samples_ms,
     }
     _ok("bridge.verify", data)
     if not stable:
@@ -206,8 +287,8 @@ def bridge_soak(
     action_params_json: str = typer.Option("{}", "--action-params-json"),
 ) -> None:
     try:
-        params = json.loads(action_params_json)
-    except json.JSONDecodeError as exc:
+        params = codec.loads(action_params_json)
+    except codec.JSONDecodeError as exc:
         _fail("bridge.soak", "INVALID_INPUT", f"Invalid JSON: {exc}")
     if not isinstance(params, dict):
         _fail("bridge.soak", "INVALID_INPUT", "action-params-json must be an object")
@@ -246,8 +327,11 @@ def validate_image(image: Path) -> None:
 
 
 @app.command("diff")
-def diff_images(source: Path, target: Path) -> None:
-    _ok("diff", _call_bridge("diff", "image.diff", {"source": str(source), "target": str(target)}, timeout_seconds=180))
+def diff_images(source: Path, target: Path, hashes: bool = typer.Option(True, "--hashes/--no-hashes")) -> None:
+    _ok(
+        "diff",
+        _call_bridge("diff", "image.diff", {"source": str(source), "target": str(target), "hashes": hashes}, timeout_seconds=180),
+    )
 
 
 @app.command("snapshot")
@@ -265,6 +349,11 @@ def redo_image(image: Path) -> None:
     _ok("redo", _call_bridge("redo", "image.redo", {"image": str(image)}, timeout_seconds=30))
 
 
+@app.command("history-gc")
+def history_gc() -> None:
+    _ok("history-gc", _call_bridge("history-gc", "history.gc", {}, timeout_seconds=120))
+
+
 @app.command("open")
 def open_image(image: Path) -> None:
     _ok("open", _call_bridge("open", "image.open", {"image": str(image)}, timeout_seconds=180))
@@ -288,8 +377,8 @@ def clone_project(source: Path, target: Path, overwrite: bool = typer.Option(Fal
 def plan_edit(image: Path, action: str, params_json: str = "{}") -> None:
     _ensure_bridge_ready("plan-edit")
     try:
-        parsed = json.loads(params_json)
-    except json.JSONDecodeError as exc:
+        parsed = codec.loads(params_json)
+    except codec.JSONDecodeError as exc:
         _fail("plan-edit", "INVALID_INPUT", f"Invalid JSON: {exc}")
     if not isinstance(parsed, dict):
         _fail("plan-edit", "INVALID_INPUT", "params-json must be an object")
@@ -299,6 +388,37 @@ def plan_edit(image: Path, action: str, params_json: str = "{}") -> None:
     )
 
 
+@app.command("plan-edit-batch")
+def plan_edit_batch(image: Path, steps_json: str = typer.Option(..., "--steps-json")) -> None:
+    _ensure_bridge_ready("plan-edit-batch")
+    try:
+        steps = codec.loads(steps_json)
+    except codec.JSONDecodeError as exc:
+        _fail("plan-edit-batch", "INVALID_INPUT", f"Invalid JSON: {exc}")
+    if not isinstance(steps, list):
+        _fail("plan-edit-batch", "INVALID_INPUT", "steps-json must be a list")
+    _ok(
+        "plan-edit-batch",
+        _call_bridge(
+            "plan-edit-batch", "project.plan_edit_batch", {"image": str(image), "steps": steps}, timeout_seconds=600
+        ),
+    )
+
+
+@app.command("batch")
+def batch(spec: Path) -> None:
+    _ensure_bridge_ready("batch")
+    try:
+        ops = codec.loads(spec.read_bytes())
+    except OSError as exc:
+        _fail("batch", "NOT_FOUND", str(exc))
+    except codec.JSONDecodeError as exc:
+        _fail("batch", "INVALID_INPUT", f"Invalid JSON: {exc}")
+    if not isinstance(ops, list):
+        _fail("batch", "INVALID_INPUT", "batch spec must be a JSON list of {method, params}")
+    _ok("batch", _call_bridge("batch", "batch.run", {"ops": ops}, timeout_seconds=300 * max(1, len(ops))))
+
+
 @app.command("resize")
 def resize_image(
     image: Path,
@@ -307,16 +427,17 @@ def resize_image(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("resize")
+    img, out = _img_out(image, output)
     _ok(
         "resize",
         _call_bridge(
             "resize",
             "image.resize",
             {
-                "image": str(image),
+                "image": img,
                 "width": width,
                 "height": height,
-                "output": str(output) if output else str(image),
+                "output": out,
             },
             timeout_seconds=300,
         ),
@@ -333,12 +454,13 @@ def crop_image(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("crop")
+    img, out = _img_out(image, output)
     _ok(
         "crop",
         _call_bridge(
             "crop",
             "image.crop",
-            {"image": str(image), "x": x, "y": y, "width": width, "height": height, "output": str(output) if output else str(image)},
+            {"image": img, "x": x, "y": y, "width": width, "height": height, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -352,12 +474,13 @@ def crop_center_image(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("crop-center")
+    img, out = _img_out(image, output)
     _ok(
         "crop-center",
         _call_bridge(
             "crop-center",
             "image.crop_center",
-            {"image": str(image), "width": width, "height": height, "output": str(output) if output else str(image)},
+            {"image": img, "width": width, "height": height, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -370,12 +493,13 @@ def rotate_image(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("rotate")
+    img, out = _img_out(image, output)
     _ok(
         "rotate",
         _call_bridge(
             "rotate",
             "image.rotate",
-            {"image": str(image), "degrees": degrees, "output": str(output) if output else str(image)},
+            {"image": img, "degrees": degrees, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -388,12 +512,13 @@ def flip_image(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("flip")
+    img, out = _img_out(image, output)
     _ok(
         "flip",
         _call_bridge(
             "flip",
             "image.flip",
-            {"image": str(image), "axis": axis, "output": str(output) if output else str(image)},
+            {"image": img, "axis": axis, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -409,18 +534,19 @@ def canvas_size(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("canvas-size")
+    img, out = _img_out(image, output)
     _ok(
         "canvas-size",
         _call_bridge(
             "canvas-size",
             "image.canvas_size",
             {
-                "image": str(image),
+                "image": img,
                 "width": width,
                 "height": height,
                 "offsetX": offset_x,
                 "offsetY": offset_y,
-                "output": str(output) if output else str(image),
+                "output": out,
             },
             timeout_seconds=300,
         ),
@@ -441,8 +567,8 @@ def montage_grid(
 ) -> None:
     _ensure_bridge_ready("montage-grid")
     try:
-        images = json.loads(images_json)
-    except json.JSONDecodeError as exc:
+        images = codec.loads(images_json)
+    except codec.JSONDecodeError as exc:
         _fail("montage-grid", "INVALID_INPUT", f"Invalid JSON: {exc}")
     if not isinstance(images, list):
         _fail("montage-grid", "INVALID_INPUT", "images-json must be a JSON list of file paths")
@@ -485,17 +611,18 @@ def brightness_contrast(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("brightness-contrast")
+    img, out = _img_out(image, output)
     _ok(
         "brightness-contrast",
         _call_bridge(
             "brightness-contrast",
             "adjust.brightness_contrast",
             {
-                "image": str(image),
+                "image": img,
                 "brightness": brightness,
                 "contrast": contrast,
                 "layerIndex": layer_index,
-                "output": str(output) if output else str(image),
+                "output": out,
             },
             timeout_seconds=300,
         ),
@@ -512,18 +639,19 @@ def levels(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("levels")
+    img, out = _img_out(image, output)
     _ok(
         "levels",
         _call_bridge(
             "levels",
             "adjust.levels",
             {
-                "image": str(image),
+                "image": img,
                 "black": black,
                 "white": white,
                 "gamma": gamma,
                 "layerIndex": layer_index,
-                "output": str(output) if output else str(image),
+                "output": out,
             },
             timeout_seconds=300,
         ),
@@ -540,18 +668,19 @@ def hue_saturation(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("hue-saturation")
+    img, out = _img_out(image, output)
     _ok(
         "hue-saturation",
         _call_bridge(
             "hue-saturation",
             "adjust.hue_saturation",
             {
-                "image": str(image),
+                "image": img,
                 "hue": hue,
                 "saturation": saturation,
                 "lightness": lightness,
                 "layerIndex": layer_index,
-                "output": str(output) if output else str(image),
+                "output": out,
             },
             timeout_seconds=300,
         ),
@@ -569,19 +698,20 @@ def color_balance(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("color-balance")
+    img, out = _img_out(image, output)
     _ok(
         "color-balance",
         _call_bridge(
             "color-balance",
             "adjust.color_balance",
             {
-                "image": str(image),
+                "image": img,
                 "cyanRed": cyan_red,
                 "magentaGreen": magenta_green,
                 "yellowBlue": yellow_blue,
                 "transferMode": transfer_mode,
                 "layerIndex": layer_index,
-                "output": str(output) if output else str(image),
+                "output": out,
             },
             timeout_seconds=300,
         ),
@@ -597,9 +727,10 @@ def curves(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("curves")
+    img, out = _img_out(image, output)
     try:
-        points = json.loads(points_json)
-    except json.JSONDecodeError as exc:
+        points = codec.loads(points_json)
+    except codec.JSONDecodeError as exc:
         _fail("curves", "INVALID_INPUT", f"Invalid JSON: {exc}")
     _ok(
         "curves",
@@ -607,11 +738,11 @@ def curves(
             "curves",
             "adjust.curves",
             {
-                "image": str(image),
+                "image": img,
                 "channel": channel,
                 "points": points,
                 "layerIndex": layer_index,
-                "output": str(output) if output else str(image),
+                "output": out,
             },
             timeout_seconds=300,
         ),
@@ -626,12 +757,13 @@ def color_temperature(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("color-temperature")
+    img, out = _img_out(image, output)
     _ok(
         "color-temperature",
         _call_bridge(
             "color-temperature",
             "adjust.color_temperature",
-            {"image": str(image), "temperature": temperature, "layerIndex": layer_index, "output": str(output) if output else str(image)},
+            {"image": img, "temperature": temperature, "layerIndex": layer_index, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -640,12 +772,13 @@ def color_temperature(
 @app.command("invert")
 def invert(image: Path, layer_index: int = typer.Option(0, "--layer-index"), output: Optional[Path] = typer.Option(None, "--output")) -> None:
     _ensure_bridge_ready("invert")
+    img, out = _img_out(image, output)
     _ok(
         "invert",
         _call_bridge(
             "invert",
             "adjust.invert",
-            {"image": str(image), "layerIndex": layer_index, "output": str(output) if output else str(image)},
+            {"image": img, "layerIndex": layer_index, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -659,12 +792,13 @@ def desaturate(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("desaturate")
+    img, out = _img_out(image, output)
     _ok(
         "desaturate",
         _call_bridge(
             "desaturate",
             "adjust.desaturate",
-            {"image": str(image), "mode": mode, "layerIndex": layer_index, "output": str(output) if output else str(image)},
+            {"image": img, "mode": mode, "layerIndex": layer_index, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -678,12 +812,13 @@ def blur(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("blur")
+    img, out = _img_out(image, output)
     _ok(
         "blur",
         _call_bridge(
             "blur",
             "filter.blur",
-            {"image": str(image), "radius": radius, "layerIndex": layer_index, "output": str(output) if output else str(image)},
+            {"image": img, "radius": radius, "layerIndex": layer_index, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -698,17 +833,18 @@ def gaussian_blur(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("gaussian-blur")
+    img, out = _img_out(image, output)
     _ok(
         "gaussian-blur",
         _call_bridge(
             "gaussian-blur",
             "filter.gaussian_blur",
             {
-                "image": str(image),
+                "image": img,
                 "radiusX": radius_x,
                 "radiusY": radius_y,
                 "layerIndex": layer_index,
-                "output": str(output) if output else str(image),
+                "output": out,
             },
             timeout_seconds=300,
         ),
@@ -724,12 +860,13 @@ def sharpen(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("sharpen")
+    img, out = _img_out(image, output)
     _ok(
         "sharpen",
         _call_bridge(
             "sharpen",
             "filter.sharpen",
-            {"image": str(image), "radius": radius, "amount": amount, "layerIndex": layer_index, "output": str(output) if output else str(image)},
+            {"image": img, "radius": radius, "amount": amount, "layerIndex": layer_index, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -745,18 +882,19 @@ def unsharp_mask(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("unsharp-mask")
+    img, out = _img_out(image, output)
     _ok(
         "unsharp-mask",
         _call_bridge(
             "unsharp-mask",
             "filter.unsharp_mask",
             {
-                "image": str(image),
+                "image": img,
                 "radius": radius,
                 "amount": amount,
                 "threshold": threshold,
                 "layerIndex": layer_index,
-                "output": str(output) if output else str(image),
+                "output": out,
             },
             timeout_seconds=300,
         ),
@@ -771,12 +909,13 @@ def noise_reduction(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("noise-reduction")
+    img, out = _img_out(image, output)
     _ok(
         "noise-reduction",
         _call_bridge(
             "noise-reduction",
             "filter.noise_reduction",
-            {"image": str(image), "strength": strength, "layerIndex": layer_index, "output": str(output) if output else str(image)},
+            {"image": img, "strength": strength, "layerIndex": layer_index, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -795,12 +934,13 @@ def layer_add(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("layer-add")
+    img, out = _img_out(image, output)
     _ok(
         "layer-add",
         _call_bridge(
             "layer-add",
             "layer.add",
-            {"image": str(image), "name": name, "position": position, "output": str(output) if output else str(image)},
+            {"image": img, "name": name, "position": position, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -813,12 +953,13 @@ def layer_remove(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("layer-remove")
+    img, out = _img_out(image, output)
     _ok(
         "layer-remove",
         _call_bridge(
             "layer-remove",
             "layer.remove",
-            {"image": str(image), "layerIndex": layer_index, "output": str(output) if output else str(image)},
+            {"image": img, "layerIndex": layer_index, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -832,12 +973,13 @@ def layer_rename(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("layer-rename")
+    img, out = _img_out(image, output)
     _ok(
         "layer-rename",
         _call_bridge(
             "layer-rename",
             "layer.rename",
-            {"image": str(image), "layerIndex": layer_index, "name": name, "output": str(output) if output else str(image)},
+            {"image": img, "layerIndex": layer_index, "name": name, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -851,12 +993,13 @@ def layer_opacity(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("layer-opacity")
+    img, out = _img_out(image, output)
     _ok(
         "layer-opacity",
         _call_bridge(
             "layer-opacity",
             "layer.opacity",
-            {"image": str(image), "layerIndex": layer_index, "opacity": opacity, "output": str(output) if output else str(image)},
+            {"image": img, "layerIndex": layer_index, "opacity": opacity, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -870,12 +1013,13 @@ def layer_blend_mode(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("layer-blend-mode")
+    img, out = _img_out(image, output)
     _ok(
         "layer-blend-mode",
         _call_bridge(
             "layer-blend-mode",
             "layer.blend_mode",
-            {"image": str(image), "layerIndex": layer_index, "mode": mode, "output": str(output) if output else str(image)},
+            {"image": img, "layerIndex": layer_index, "mode": mode, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -888,12 +1032,13 @@ def layer_merge_down(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("layer-merge-down")
+    img, out = _img_out(image, output)
     _ok(
         "layer-merge-down",
         _call_bridge(
             "layer-merge-down",
             "layer.merge_down",
-            {"image": str(image), "layerIndex": layer_index, "output": str(output) if output else str(image)},
+            {"image": img, "layerIndex": layer_index, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -907,12 +1052,13 @@ def layer_duplicate(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("layer-duplicate")
+    img, out = _img_out(image, output)
     _ok(
         "layer-duplicate",
         _call_bridge(
             "layer-duplicate",
             "layer.duplicate",
-            {"image": str(image), "layerIndex": layer_index, "position": position, "output": str(output) if output else str(image)},
+            {"image": img, "layerIndex": layer_index, "position": position, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -926,12 +1072,13 @@ def layer_reorder(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("layer-reorder")
+    img, out = _img_out(image, output)
     _ok(
         "layer-reorder",
         _call_bridge(
             "layer-reorder",
             "layer.reorder",
-            {"image": str(image), "layerIndex": layer_index, "index": index, "output": str(output) if output else str(image)},
+            {"image": img, "layerIndex": layer_index, "index": index, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -945,12 +1092,13 @@ def add_layer_mask(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("add-layer-mask")
+    img, out = _img_out(image, output)
     _ok(
         "add-layer-mask",
         _call_bridge(
             "add-layer-mask",
             "mask.add",
-            {"image": str(image), "layerIndex": layer_index, "mode": mode, "output": str(output) if output else str(image)},
+            {"image": img, "layerIndex": layer_index, "mode": mode, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -963,12 +1111,13 @@ def apply_layer_mask(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("apply-layer-mask")
+    img, out = _img_out(image, output)
     _ok(
         "apply-layer-mask",
         _call_bridge(
             "apply-layer-mask",
             "mask.apply",
-            {"image": str(image), "layerIndex": layer_index, "output": str(output) if output else str(image)},
+            {"image": img, "layerIndex": layer_index, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -977,18 +1126,20 @@ def apply_layer_mask(
 @app.command("select-all")
 def select_all(image: Path, output: Optional[Path] = typer.Option(None, "--output")) -> None:
     _ensure_bridge_ready("select-all")
+    img, out = _img_out(image, output)
     _ok(
         "select-all",
-        _call_bridge("select-all", "selection.all", {"image": str(image), "output": str(output) if output else str(image)}, timeout_seconds=300),
+        _call_bridge("select-all", "selection.all", {"image": img, "output": out}, timeout_seconds=300),
     )
 
 
 @app.command("select-none")
 def select_none(image: Path, output: Optional[Path] = typer.Option(None, "--output")) -> None:
     _ensure_bridge_ready("select-none")
+    img, out = _img_out(image, output)
     _ok(
         "select-none",
-        _call_bridge("select-none", "selection.none", {"image": str(image), "output": str(output) if output else str(image)}, timeout_seconds=300),
+        _call_bridge("select-none", "selection.none", {"image": img, "output": out}, timeout_seconds=300),
     )
 
 
@@ -999,12 +1150,13 @@ def feather_selection(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("feather-selection")
+    img, out = _img_out(image, output)
     _ok(
         "feather-selection",
         _call_bridge(
             "feather-selection",
             "selection.feather",
-            {"image": str(image), "radius": radius, "output": str(output) if output else str(image)},
+            {"image": img, "radius": radius, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -1020,12 +1172,13 @@ def select_rectangle(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("select-rectangle")
+    img, out = _img_out(image, output)
     _ok(
         "select-rectangle",
         _call_bridge(
             "select-rectangle",
             "selection.rectangle",
-            {"image": str(image), "x": x, "y": y, "width": width, "height": height, "output": str(output) if output else str(image)},
+            {"image": img, "x": x, "y": y, "width": width, "height": height, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -1041,12 +1194,13 @@ def select_ellipse(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("select-ellipse")
+    img, out = _img_out(image, output)
     _ok(
         "select-ellipse",
         _call_bridge(
             "select-ellipse",
             "selection.ellipse",
-            {"image": str(image), "x": x, "y": y, "width": width, "height": height, "output": str(output) if output else str(image)},
+            {"image": img, "x": x, "y": y, "width": width, "height": height, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -1055,12 +1209,13 @@ def select_ellipse(
 @app.command("invert-selection")
 def invert_selection(image: Path, output: Optional[Path] = typer.Option(None, "--output")) -> None:
     _ensure_bridge_ready("invert-selection")
+    img, out = _img_out(image, output)
     _ok(
         "invert-selection",
         _call_bridge(
             "invert-selection",
             "selection.invert",
-            {"image": str(image), "output": str(output) if output else str(image)},
+            {"image": img, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -1079,13 +1234,14 @@ def add_text(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("add-text")
+    img, out = _img_out(image, output)
     _ok(
         "add-text",
         _call_bridge(
             "add-text",
             "text.add",
             {
-                "image": str(image),
+                "image": img,
                 "text": text,
                 "x": x,
                 "y": y,
@@ -1093,7 +1249,7 @@ def add_text(
                 "size": size,
                 "color": color,
                 "layerIndex": layer_index,
-                "output": str(output) if output else str(image),
+                "output": out,
             },
             timeout_seconds=300,
         ),
@@ -1108,12 +1264,13 @@ def update_text(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("update-text")
+    img, out = _img_out(image, output)
     _ok(
         "update-text",
         _call_bridge(
             "update-text",
             "text.update",
-            {"image": str(image), "layerIndex": layer_index, "text": text, "output": str(output) if output else str(image)},
+            {"image": img, "layerIndex": layer_index, "text": text, "output": out},
             timeout_seconds=300,
         ),
     )
@@ -1128,28 +1285,64 @@ def stroke_selection(
     output: Optional[Path] = typer.Option(None, "--output"),
 ) -> None:
     _ensure_bridge_ready("stroke-selection")
+    img, out = _img_out(image, output)
     _ok(
         "stroke-selection",
         _call_bridge(
             "stroke-selection",
             "annotation.stroke_selection",
-            {"image": str(image), "width": width, "color": color, "layerIndex": layer_index, "output": str(output) if output else str(image)},
+            {"image": img, "width": width, "color": color, "layerIndex": layer_index, "output": out},
             timeout_seconds=300,
         ),
     )
 
 
+def _glob_images(command: str, pattern: str) -> List[str]:
+    paths = sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+    if not paths:
+        _fail(command, "NOT_FOUND", f"No images match: {pattern}")
+    return paths
+
+
+def _call_bridge_each(
+    command: str, method: str, images: List[str], params: Dict[str, Any], timeout_seconds: float
+) -> None:
+    # One /rpc/batch round-trip; the bridge runs the entries back to back on its GIMP worker.
+    calls = [(method, {**params, "image": image}) for image in images]
+    try:
+        outcomes = _bridge_client().call_many(calls, timeout_seconds=timeout_seconds)
+    except BridgeClientError as exc:
+        _fail(command, exc.code, exc.message, retryable=exc.code == "BRIDGE_UNAVAILABLE")
+    results = []
+    for image, outcome in zip(images, outcomes):
+        if isinstance(outcome, BridgeClientError):
+            results.append({"image": image, "ok": False, "error": {"code": outcome.code, "message": outcome.message}})
+        else:
+            results.append({"image": image, "ok": True, "result": outcome})
+    failures = sum(1 for entry in results if not entry["ok"])
+    _ok(command, {"results": results, "failures": failures})
+    if failures:
+        raise SystemExit(ERROR_CODES["ERROR"])
+
+
 @app.command("run-macro")
 def run_macro(
-    image: Path,
+    image: Optional[Path] = typer.Argument(None),
     macro: str = typer.Option(..., "--macro"),
     params_json: str = typer.Option("{}", "--params-json"),
+    images: Optional[str] = typer.Option(None, "--images", help="Glob of images to run the macro on"),
 ) -> None:
+    if (image is None) == (images is None):
+        _fail("run-macro", "INVALID_INPUT", "Pass either an image or --images")
     _ensure_bridge_ready("run-macro")
     try:
-        params = json.loads(params_json)
-    except json.JSONDecodeError as exc:
+        params = codec.loads(params_json)
+    except codec.JSONDecodeError as exc:
         _fail("run-macro", "INVALID_INPUT", f"Invalid JSON: {exc}")
+    if images is not None:
+        paths = _glob_images("run-macro", images)
+        _call_bridge_each("run-macro", "macro.run", paths, {"macro": macro, "params": params}, timeout_seconds=600)
+        return
     _ok("run-macro", _call_bridge("run-macro", "macro.run", {"image": str(image), "macro": macro, "params": params}, timeout_seconds=600))
 
 
@@ -1167,6 +1360,13 @@ def apply_preset(image: Path, preset_name: str) -> None:
     )
 
 
+@app.command("apply-preset-batch")
+def apply_preset_batch(preset_name: str, images: str = typer.Option(..., "--images", help="Glob of images")) -> None:
+    _ensure_bridge_ready("apply-preset-batch")
+    paths = _glob_images("apply-preset-batch", images)
+    _call_bridge_each("apply-preset-batch", "preset.apply", paths, {"preset": preset_name}, timeout_seconds=600)
+
+
 @app.command("version")
 def version() -> None:
     _ok("version", {"packageVersion": __version__, "protocolVersion": PROTOCOL_VERSION})
@@ -0,0 +1,74 @@
+import json
+import threading
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class _MsgspecMsgpack:
+    # msgpack-compatible packb/unpackb backed by msgspec's reusable encoder and decoder.
+    _encoder = msgspec.msgpack.Encoder() if msgspec is not None else None
+    _decoder = msgspec.msgpack.Decoder() if msgspec is not None else None
+
+    @classmethod
+    def packb(cls, value: Any, use_bin_type: bool = True) -> bytes:
+        return cls._encoder.encode(value)
+
+    @classmethod
+    def unpackb(cls, data: bytes, raw: bool = False) -> Any:
+        return cls._decoder.decode(data)
+
+
+if msgspec is not None:
+    msgpack: Any = _MsgspecMsgpack
+else:
+    try:
+        import msgpack
+    except ImportError:
+        msgpack = None
+
+JSONDecodeError = json.JSONDecodeError
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+
+
+def dumps(value: Any, sort_keys: bool = False, indent: bool = False) -> bytes:
+    if orjson is not None:
+        option = (orjson.OPT_SORT_KEYS if sort_keys else 0) | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return orjson.dumps(value, option=option or None)
+        except TypeError:
+            # orjson is stricter than json (non-str keys, >64-bit ints); keep json's behaviour.
+            pass
+    return json.dumps(value, sort_keys=sort_keys, indent=2 if indent else None).encode("utf-8")
+
+
+def loads(raw: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+_packers = threading.local()
+
+
+def packb(value: Any) -> bytes:
+    packer_type = getattr(msgpack, "Packer", None)
+    if packer_type is None:
+        return msgpack.packb(value, use_bin_type=True)
+    # msgpack.packb builds a Packer (and its 1 MiB buffer) per call; keep one per thread instead.
+    packer = getattr(_packers, "packer", None)
+    if type(packer) is not packer_type:
+        packer = _packers.packer = packer_type(use_bin_type=True)
+    return packer.pack(value)
+
+
+def unpackb(raw: bytes) -> Any:
+    return msgpack.unpackb(raw, raw=False)
@@ -1,16 +1,23 @@
-import json
+import atexit
+import collections
+import functools
 import os
+import queue
 import subprocess
+import threading
+import time
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from harness_gimp.core import codec
 
 
 class GimpExecutionError(Exception):
     pass
 
 
-def resolve_gimp_binary() -> Path:
-    env = os.getenv("HARNESS_GIMP_BIN")
+@functools.lru_cache(maxsize=None)
+def _find_gimp_binary(env: Optional[str]) -> Path:
     if env:
         path = Path(env)
         if path.exists():
@@ -28,26 +35,311 @@ def resolve_gimp_binary() -> Path:
     raise GimpExecutionError("GIMP binary not found. Set HARNESS_GIMP_BIN.")
 
 
-def _profile_dir() -> Path:
-    env = os.getenv("HARNESS_GIMP_PROFILE_DIR")
-    if env:
-        path = Path(env)
-    else:
-        path = Path.cwd() / ".gimp-profile" / "GIMP" / "3.0"
+def resolve_gimp_binary(refresh: bool = False) -> Path:
+    if refresh:
+        _find_gimp_binary.cache_clear()
+    return _find_gimp_binary(os.getenv("HARNESS_GIMP_BIN"))
+
+
+@functools.lru_cache(maxsize=None)
+def _make_profile_dir(env: Optional[str], cwd: str) -> Path:
+    path = Path(env) if env else Path(cwd) / ".gimp-profile" / "GIMP" / "3.0"
     path.mkdir(parents=True, exist_ok=True)
     return path
 
 
-def resolve_profile_dir() -> Path:
+def _profile_dir() -> Path:
+    return _make_profile_dir(os.getenv("HARNESS_GIMP_PROFILE_DIR"), os.getcwd())
+
+
+def resolve_profile_dir(refresh: bool = False) -> Path:
+    if refresh:
+        _make_profile_dir.cache_clear()
     return _profile_dir()
 
 
+_WORKER_BOOTSTRAP = """
+import json
+import sys
+try:
+  from gi.repository import Gimp as _Gimp
+except ImportError:
+  _Gimp = None
+_state = {}
+print("HARNESS_READY", flush=True)
+for _line in sys.stdin:
+  if not _line.strip():
+    continue
+  _state.pop("result", None)
+  # Each request gets its own context so colours, brushes and line widths never leak into the next one.
+  _pushed = _Gimp is not None and _Gimp.context_push()
+  try:
+    exec(compile(json.loads(_line)["code"], "<harness>", "exec"), {"__name__": "__harness__", "HARNESS_STATE": _state})
+    _frame = {"result": _state.pop("result", None)}
+  except BaseException as _exc:
+    _frame = {"error": f"{type(_exc).__name__}: {_exc}"}
+  finally:
+    if _pushed:
+      _Gimp.context_pop()
+  sys.stdout.flush()
+  print("HARNESS_DONE:" + json.dumps(_frame), flush=True)
+"""
+
+
+def _parse_result(data_line: Optional[str]) -> Dict[str, Any]:
+    if not data_line:
+        raise GimpExecutionError("GIMP did not return structured output.")
+    try:
+        return codec.loads(data_line)
+    except codec.JSONDecodeError as exc:
+        raise GimpExecutionError(f"Invalid JSON from GIMP: {exc}") from exc
+
+
+_OUTPUT_TAIL_LINES = 200
+
+
+class GimpWorker:
+    def __init__(self, binary: Path, startup_timeout: float = 120.0):
+        self.binary = binary
+        self.startup_timeout = startup_timeout
+        self._proc: Optional[subprocess.Popen] = None
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def _start(self) -> None:
+        env = os.environ.copy()
+        env["GIMP3_DIRECTORY"] = str(_profile_dir())
+        self._lines = queue.Queue()
+        self._proc = subprocess.Popen(
+            [str(self.binary), "--no-interface", "--quit", "--batch-interpreter=python-fu-eval", "--batch", _WORKER_BOOTSTRAP],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            env=env,
+        )
+        threading.Thread(target=self._pump, args=(self._proc, self._lines), daemon=True).start()
+        self._read_until("HARNESS_READY", time.monotonic() + self.startup_timeout)
+
+    @staticmethod
+    def _pump(proc: subprocess.Popen, lines: "queue.Queue[Optional[str]]") -> None:
+        for line in proc.stdout:
+            lines.put(line.rstrip("\r\n"))
+        lines.put(None)
+
+    def _read_until(self, marker: str, deadline: float) -> Tuple[Deque[str], str, Optional[str]]:
+        # GIMP chatter is only kept as a bounded tail for error messages.
+        tail: Deque[str] = collections.deque(maxlen=_OUTPUT_TAIL_LINES)
+        data_line = None
+        while True:
+            try:
+                line = self._lines.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                self.close()
+                raise GimpExecutionError("GIMP worker timed out") from None
+            if line is None:
+                self.close()
+                raise GimpExecutionError("\n".join(tail).strip() or "GIMP worker exited unexpectedly")
+            if line == marker or line.startswith(marker + ":"):
+                return tail, line, data_line
+            if line.startswith("HARNESS_JSON:"):
+                data_line = line[len("HARNESS_JSON:") :].strip()
+            else:
+                tail.append(line)
+
+    def ensure_started(self) -> None:
+        with self._lock:
+            if not self.alive:
+                self._start()
+
+    def run(self, code: str, timeout_seconds: float = 180.0) -> Dict[str, Any]:
+        with self._lock:
+            if not self.alive:
+                self._start()
+            try:
+                self._proc.stdin.write(codec.dumps({"code": code}).decode("utf-8") + "\n")
+                self._proc.stdin.flush()
+            except OSError as exc:
+                self.close()
+                raise GimpExecutionError(f"GIMP worker is not accepting work: {exc}") from exc
+            tail, done, data_line = self._read_until("HARNESS_DONE", time.monotonic() + timeout_seconds)
+        try:
+            frame = codec.loads(done[len("HARNESS_DONE:") :])
+        except codec.JSONDecodeError as exc:
+            raise GimpExecutionError(f"Invalid frame from GIMP worker: {exc}") from exc
+        if frame.get("error") is not None:
+            raise GimpExecutionError(str(frame["error"]) + "\n" + "\n".join(list(tail)[-20:]))
+        if frame.get("result") is not None:
+            return frame["result"]
+        # Code that does not know about HARNESS_STATE still reports through stdout.
+        return _parse_result(data_line)
+
+    def close(self) -> None:
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            proc.kill()
+            proc.wait()
+
+
+_WORKERS: Dict[str, GimpWorker] = {}
+_BROKEN_WORKERS: Set[str] = set()
+_WORKERS_LOCK = threading.Lock()
+
+
+def _worker_enabled() -> bool:
+    return os.getenv("HARNESS_GIMP_WORKER", "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _get_worker(binary: Path) -> Optional[GimpWorker]:
+    key = str(binary)
+    with _WORKERS_LOCK:
+        if key in _BROKEN_WORKERS:
+            return None
+        worker = _WORKERS.get(key)
+        if worker is None:
+            worker = _WORKERS[key] = GimpWorker(binary)
+    return worker
+
+
+@atexit.register
+def shutdown_workers() -> None:
+    with _WORKERS_LOCK:
+        workers = list(_WORKERS.values())
+        _WORKERS.clear()
+    for worker in workers:
+        worker.close()
+
+
+def _started_worker(binary: Path) -> Optional[GimpWorker]:
+    worker = _get_worker(binary)
+    if worker is None:
+        return None
+    try:
+        worker.ensure_started()
+    except (OSError, GimpExecutionError):
+        # This GIMP build cannot host the worker loop; stay on one-shot batches.
+        with _WORKERS_LOCK:
+            _BROKEN_WORKERS.add(str(binary))
+            _WORKERS.pop(str(binary), None)
+        return None
+    return worker
+
+
+def _run_in_worker(code: str, timeout_seconds: float, binary: Path) -> Optional[Dict[str, Any]]:
+    worker = _started_worker(binary)
+    if worker is None:
+        return None
+    return worker.run(code, timeout_seconds)
+
+
+def _warm_worker() -> None:
+    try:
+        binary = resolve_gimp_binary()
+    except GimpExecutionError:
+        return
+    _started_worker(binary)
+
+
+def prewarm_worker() -> Optional[threading.Thread]:
+    # GIMP's first start (profile, fonts, plug-in scan) is the slow part; pay it while the bridge idles.
+    if not _worker_enabled() or os.getenv("HARNESS_GIMP_SKIP_WARMUP"):
+        return None
+    thread = threading.Thread(target=_warm_worker, name="gimp-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+# Scripts go through argv as they always have; only ones too big for the command line are piped
+# to this stub on stdin instead.
+_STDIN_STUB = "import sys; exec(compile(sys.stdin.read(), '<harness>', 'exec'))"
+_WINDOWS_CMDLINE_LIMIT = 32_000
+_POSIX_ARG_LIMIT = 120_000
+
+
+def _fits_argv(cmd: List[str]) -> bool:
+    if os.name == "nt":
+        return len(subprocess.list2cmdline(cmd)) < _WINDOWS_CMDLINE_LIMIT
+    # Linux caps a single argument at MAX_ARG_STRLEN (128 KiB).
+    return len(cmd[-1].encode("utf-8")) < _POSIX_ARG_LIMIT
+
+
+def _feed_stdin(proc: subprocess.Popen, code: str) -> None:
+    try:
+        with proc.stdin:
+            proc.stdin.write(code)
+    except OSError:
+        # GIMP exited before reading; the exit status and output tell the story.
+        pass
+
+
+def _run_one_shot(
+    cmd: List[str], stdin_code: Optional[str], env: Dict[str, str], timeout_seconds: float
+) -> Dict[str, Any]:
+    # Stream the merged output: keep only the last marker line and a tail for error reports,
+    # rather than buffering everything GEGL and the plug-ins print.
+    marker = "HARNESS_JSON:"
+    data_line = None
+    tail: Deque[str] = collections.deque(maxlen=_OUTPUT_TAIL_LINES)
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL if stdin_code is None else subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        env=env,
+    )
+    # Feed the script from a thread: GIMP may log enough at startup to fill the stdout pipe
+    # before its interpreter gets round to reading stdin.
+    if stdin_code is not None:
+        threading.Thread(target=_feed_stdin, args=(proc, stdin_code), daemon=True).start()
+    timed_out = threading.Event()
+
+    def _expire() -> None:
+        timed_out.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout_seconds, _expire)
+    timer.start()
+    try:
+        with proc.stdout:
+            for line in proc.stdout:
+                if line.startswith(marker):
+                    data_line = line[len(marker) :].strip()
+                else:
+                    tail.append(line)
+        proc.wait()
+    finally:
+        timer.cancel()
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout_seconds)
+    if proc.returncode != 0:
+        raise GimpExecutionError("".join(tail).strip() or "GIMP batch execution failed")
+    return _parse_result(data_line)
+
+
 def run_python_batch(
     code: str,
     timeout_seconds: float = 180.0,
     gimp_bin: Optional[Path] = None,
 ) -> Dict[str, Any]:
     binary = gimp_bin or resolve_gimp_binary()
+    if _worker_enabled():
+        result = _run_in_worker(code, timeout_seconds, binary)
+        if result is not None:
+            return result
     env = os.environ.copy()
     env["GIMP3_DIRECTORY"] = str(_profile_dir())
     cmd = [
@@ -58,24 +350,7 @@ def run_python_batch(
         "--batch",
         code,
     ]
-    proc = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        env=env,
-        timeout=timeout_seconds,
-    )
-    merged = (proc.stdout or "") + "\n" + (proc.stderr or "")
-    marker = "HARNESS_JSON:"
-    data_line = None
-    for line in merged.splitlines():
-        if line.startswith(marker):
-            data_line = line[len(marker) :].strip()
-    if proc.returncode != 0:
-        raise GimpExecutionError((merged.strip() or "GIMP batch execution failed"))
-    if not data_line:
-        raise GimpExecutionError("GIMP did not return structured output.")
-    try:
-        return json.loads(data_line)
-    except json.JSONDecodeError as exc:
-        raise GimpExecutionError(f"Invalid JSON from GIMP: {exc}") from exc
+    if _fits_argv(cmd):
+        return _run_one_shot(cmd, None, env, timeout_seconds)
+    cmd[-1] = _STDIN_STUB
+    return _run_one_shot(cmd, code, env, timeout_seconds)
@@ -0,0 +1,13 @@
+from pathlib import Path
+
+import pytest
+
+from harness_gimp.bridge import operations
+
+
+@pytest.fixture(autouse=True)
+def isolated_history(monkeypatch, tmp_path: Path) -> Path:
+    root = tmp_path / ".harness-gimp-history"
+    monkeypatch.setattr(operations, "HISTORY_ROOT", root)
+    monkeypatch.setattr(operations, "HISTORY_STATE", root / "state.json")
+    return root
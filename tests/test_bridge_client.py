@@ -0,0 +1,369 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+from http.client import HTTPSConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from harness_gimp.bridge import server as bridge_server
+from harness_gimp.bridge.client import BridgeClient, BridgeClientError
+from harness_gimp.bridge.operations import BridgeOperationError
+from harness_gimp.core import codec
+from harness_gimp.bridge.server import BridgeHandler, _bind_unix_server, run_bridge_unix_server
+
+
+@pytest.fixture
+def bridge_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BridgeHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_client_reuses_pool_across_calls(bridge_url: str) -> None:
+    client = BridgeClient(bridge_url)
+    assert client.health() == {"ok": True}
+    sock = client._pool._local.conn.sock
+    for _ in range(3):
+        assert "packageVersion" in client.call("system.version", {})
+    assert client._pool._local.conn.sock is sock
+    assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+    assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+    client.close()
+
+
+def test_clients_for_the_same_url_share_sockets(bridge_url: str) -> None:
+    first = BridgeClient(bridge_url)
+    first.health()
+    second = BridgeClient(bridge_url + "/")
+    assert second._pool is first._pool
+    second.health()
+    assert second._pool._local.conn is first._pool._local.conn
+    first.close()
+
+
+def test_close_releases_reconnected_sockets(bridge_url: str) -> None:
+    client = BridgeClient(bridge_url)
+    client.health()
+    client.close()
+    client.health()
+    conn = client._pool._local.conn
+    assert conn.sock is not None
+    client.close()
+    assert conn.sock is None
+
+
+def test_client_does_not_replay_posts_after_disconnect() -> None:
+    posts = []
+
+    class DroppingHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:  # noqa: N802
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def do_POST(self) -> None:  # noqa: N802
+            self.rfile.read(int(self.headers["Content-Length"]))
+            posts.append(self.path)
+            self.close_connection = True
+
+        def log_message(self, format: str, *args) -> None:  # noqa: A003
+            return
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DroppingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = BridgeClient(f"http://127.0.0.1:{server.server_address[1]}")
+        client.health()
+        with pytest.raises(BridgeClientError) as excinfo:
+            client.call("image.crop", {})
+        assert excinfo.value.code == "BRIDGE_UNAVAILABLE"
+        assert posts == ["/rpc"]
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_client_selects_transport_from_scheme() -> None:
+    conn = BridgeClient("https://bridge.example")._pool._new_connection(1)
+    assert isinstance(conn, HTTPSConnection)
+    assert conn.port == 443
+    with pytest.raises(BridgeClientError) as excinfo:
+        BridgeClient("ftp://bridge.example")
+    assert excinfo.value.code == "INVALID_INPUT"
+
+
+def test_call_async_runs_calls_concurrently(monkeypatch, bridge_url: str) -> None:
+    barrier = threading.Barrier(4, timeout=5)
+
+    def handle_method(method, params):
+        # Only returns once all four requests are in flight at the same time.
+        barrier.wait()
+        return {"ok": True}
+
+    monkeypatch.setattr(bridge_server, "handle_method", handle_method)
+    client = BridgeClient(bridge_url)
+
+    async def fan_out():
+        results = await asyncio.gather(*(client.call_async("system.health", {}) for _ in range(4)))
+        await client.aclose()
+        return results
+
+    assert asyncio.run(fan_out()) == [{"ok": True}] * 4
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="requires Unix domain sockets")
+def test_client_supports_unix_socket_urls(tmp_path: Path) -> None:
+    socket_path = str(tmp_path / "bridge.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+    server = _bind_unix_server(socket_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = BridgeClient(f"unix://{socket_path}")
+        assert client.health() == {"ok": True}
+        assert client.call("system.health", {}) == {"ok": True}
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="requires Unix domain sockets")
+def test_unix_server_refuses_to_replace_regular_files(tmp_path: Path) -> None:
+    target = tmp_path / "notes.txt"
+    target.write_text("keep me", encoding="utf-8")
+    with pytest.raises(OSError):
+        run_bridge_unix_server(str(target))
+    assert target.read_text(encoding="utf-8") == "keep me"
+
+
+def test_call_many_returns_per_entry_results(bridge_url: str) -> None:
+    client = BridgeClient(bridge_url)
+    results = client.call_many([("system.health", {}), ("no.such.method", {}), ("preset.list", {})])
+    assert results[0] == {"ok": True}
+    assert isinstance(results[1], BridgeClientError)
+    assert results[1].code == "INVALID_INPUT"
+    assert "thumbnail" in results[2]["presets"]
+
+
+def test_call_many_rejects_malformed_batch_responses(monkeypatch) -> None:
+    client = BridgeClient("http://127.0.0.1:1")
+    timeouts = []
+
+    def fake_post(path, request, timeout_seconds):
+        timeouts.append(timeout_seconds)
+        return {"ok": True, "results": [{"ok": True, "result": {}}]}
+
+    monkeypatch.setattr(client, "_post", fake_post)
+    with pytest.raises(BridgeClientError) as excinfo:
+        client.call_many([("system.health", {}), ("system.health", {})], timeout_seconds=10)
+    assert excinfo.value.code == "ERROR"
+    assert timeouts == [20]
+    monkeypatch.setattr(client, "_post", lambda *args: {"ok": True, "results": ["boom"]})
+    with pytest.raises(BridgeClientError):
+        client.call_many([("system.health", {})])
+
+
+def test_register_local_skips_the_transport(monkeypatch) -> None:
+    monkeypatch.setattr(BridgeClient, "_local_handlers", {})
+    seen = []
+
+    def crop(params):
+        seen.append(params)
+        if params.get("width") == 0:
+            raise BridgeOperationError("INVALID_INPUT", "width must be positive")
+        return {"ok": True}
+
+    BridgeClient.register_local("image.crop", crop)
+    client = BridgeClient("http://127.0.0.1:1")
+    params = {"width": 10}
+    assert client.call("image.crop", params) == {"ok": True}
+    assert seen[0] is params
+    with pytest.raises(BridgeClientError) as excinfo:
+        client.call("image.crop", {"width": 0})
+    assert excinfo.value.code == "INVALID_INPUT"
+    BridgeClient.register_local("image.crop", lambda params: params["missing"])
+    with pytest.raises(KeyError):
+        client.call("image.crop", params)
+    BridgeClient.register_local("image.crop", None)
+    with pytest.raises(BridgeClientError) as excinfo:
+        client.call("image.crop", params)
+    assert excinfo.value.code == "BRIDGE_UNAVAILABLE"
+
+
+class _FakeMsgpack:
+    @staticmethod
+    def packb(value: object, use_bin_type: bool) -> bytes:
+        return b"MP" + json.dumps(value).encode("utf-8")
+
+    @staticmethod
+    def unpackb(data: bytes, raw: bool) -> object:
+        return json.loads(data[2:])
+
+
+def test_msgpack_wire_round_trips(monkeypatch, bridge_url: str) -> None:
+    monkeypatch.setattr(codec, "msgpack", _FakeMsgpack)
+    client = BridgeClient(bridge_url, wire="msgpack")
+    assert client.call("system.health", {}) == {"ok": True}
+    assert client.wire == "msgpack"
+    client.close()
+
+
+def test_msgpack_wire_falls_back_to_json(monkeypatch, bridge_url: str) -> None:
+    assert BridgeClient(bridge_url, wire="msgpack").wire == ("msgpack" if codec.msgpack else "json")
+    monkeypatch.setattr(codec, "msgpack", None)
+    client = BridgeClient(bridge_url)
+    client.wire = "msgpack"
+    monkeypatch.setattr(codec, "packb", lambda value: b"\x80")
+    assert client.call("system.health", {}) == {"ok": True}
+    assert client.wire == "json"
+    client.close()
+
+
+def test_call_cache_ttl_skips_repeat_round_trips(monkeypatch, bridge_url: str) -> None:
+    calls = []
+
+    def handle_method(method, params):
+        calls.append(method)
+        return {"layers": len(calls)}
+
+    monkeypatch.setattr(bridge_server, "handle_method", handle_method)
+    client = BridgeClient(bridge_url)
+    first = client.call("image.inspect", {"image": "a.png", "verbose": True}, cache_ttl=60)
+    assert client.call("image.inspect", {"verbose": True, "image": "a.png"}, cache_ttl=60) == first
+    assert client.call("image.inspect", {"image": "b.png"}, cache_ttl=60) != first
+    assert client.call("image.inspect", {"image": "a.png", "verbose": True}) != first
+    assert len(calls) == 3
+    client.close()
+
+
+def test_client_maps_bridge_errors(bridge_url: str) -> None:
+    client = BridgeClient(bridge_url)
+    with pytest.raises(BridgeClientError) as excinfo:
+        client.call("no.such.method", {})
+    assert excinfo.value.code == "INVALID_INPUT"
+
+
+def test_client_reports_timeouts(monkeypatch, bridge_url: str) -> None:
+    release = threading.Event()
+    monkeypatch.setattr(bridge_server, "handle_method", lambda method, params: release.wait(5) and {})
+    client = BridgeClient(bridge_url)
+    with pytest.raises(BridgeClientError) as excinfo:
+        client.call("image.resize", {}, timeout_seconds=0.2)
+    release.set()
+    assert excinfo.value.code == "BRIDGE_TIMEOUT"
+    monkeypatch.setattr(bridge_server, "handle_method", lambda method, params: {"ok": True})
+    assert client.call("system.health", {}) == {"ok": True}
+    client.close()
+
+
+def test_client_reports_unavailable_bridge() -> None:
+    client = BridgeClient("http://127.0.0.1:1")
+    with pytest.raises(BridgeClientError) as excinfo:
+        client.health()
+    assert excinfo.value.code == "BRIDGE_UNAVAILABLE"
+
+
+def _raw_post(url: str, headers: str, body: bytes = b"") -> bytes:
+    host, port = url.rsplit("/", 1)[-1].split(":")
+    with socket.create_connection((host, int(port)), timeout=5) as sock:
+        sock.sendall(f"POST /rpc HTTP/1.1\r\nHost: {host}\r\n{headers}\r\n".encode("ascii") + body)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+
+def test_bridge_rejects_chunked_bodies_and_closes(bridge_url: str) -> None:
+    body = b'{"method": "system.health"}'
+    raw = _raw_post(bridge_url, "Transfer-Encoding: chunked\r\n", b"%x\r\n%s\r\n0\r\n\r\n" % (len(body), body))
+    assert raw.startswith(b"HTTP/1.1 411")
+    assert raw.count(b"HTTP/1.1") == 1
+
+
+def test_bridge_closes_connection_on_bad_content_length(bridge_url: str) -> None:
+    raw = _raw_post(bridge_url, "Content-Length: nope\r\n", b"GET /health HTTP/1.1\r\n\r\n")
+    assert raw.startswith(b"HTTP/1.1 500")
+    assert raw.count(b"HTTP/1.1") == 1
+
+
+def test_bridge_round_trips_utf8_and_rejects_bad_json(monkeypatch, bridge_url: str) -> None:
+    from http.client import HTTPConnection
+    from urllib.parse import urlsplit
+
+    monkeypatch.setattr(bridge_server, "handle_method", lambda method, params: {"echo": params["text"]})
+    client = BridgeClient(bridge_url)
+    assert client.call("text.add", {"text": "héllo ✓"}) == {"echo": "héllo ✓"}
+    client.close()
+    conn = HTTPConnection(urlsplit(bridge_url).netloc, timeout=5)
+    conn.request("POST", "/rpc", body=b"{not json", headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    assert response.status == 500
+    assert response.getheader("Connection") == "close"
+    assert codec.loads(response.read())["error"]["code"] == "ERROR"
+    conn.close()
+    conn = HTTPConnection(urlsplit(bridge_url).netloc, timeout=5)
+    conn.request("GET", "/health")
+    response = conn.getresponse()
+    body = response.read()
+    assert (response.status, response.reason) == (200, "OK")
+    assert response.getheader("Content-Type") == "application/json"
+    assert int(response.getheader("Content-Length")) == len(body)
+    assert response.getheader("Connection") is None
+    conn.close()
+
+
+def test_bridge_server_reuses_pooled_worker_threads() -> None:
+    server = bridge_server.BridgeHTTPServer(("127.0.0.1", 0), BridgeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        for _ in range(3):
+            client = BridgeClient(url)
+            assert client.health() == {"ok": True}
+            client.close()
+            deadline = time.monotonic() + 5
+            while server._idle < 1 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        assert server._workers == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_idle_keep_alive_connections_release_pooled_workers() -> None:
+    from http.client import HTTPConnection
+
+    class QuickIdleHandler(BridgeHandler):
+        timeout = 0.2
+
+    server = bridge_server.BridgeHTTPServer(("127.0.0.1", 0), QuickIdleHandler)
+    server.max_workers = 1
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        idle = HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+        idle.request("GET", "/health")
+        assert idle.getresponse().read() == b'{"ok":true}'
+        started = time.monotonic()
+        client = BridgeClient(f"http://127.0.0.1:{server.server_address[1]}")
+        assert client.health() == {"ok": True}
+        assert time.monotonic() - started < 2
+        client.close()
+        idle.close()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -1,5 +1,7 @@
 from pathlib import Path
 
+import pytest
+
 from harness_gimp.cli import main as cli_main
 
 
@@ -15,3 +17,149 @@ def test_resolve_bridge_url_uses_persisted_state(monkeypatch, tmp_path: Path) ->
     state_dir.mkdir(parents=True, exist_ok=True)
     (state_dir / "bridge.url").write_text("http://127.0.0.1:47777", encoding="utf-8")
     assert cli_main._resolve_bridge_url() == "http://127.0.0.1:47777"
+
+
+def test_bridge_start_records_unix_socket_url(monkeypatch, tmp_path: Path) -> None:
+    launched = []
+
+    class FakeProcess:
+        pid = 4242
+
+    class FakeClient:
+        def __init__(self, url: str):
+            self.url = url
+
+        def health(self):
+            return {"ok": True}
+
+    def fake_popen(args, **kwargs):
+        launched.append(args)
+        return FakeProcess()
+
+    monkeypatch.setenv("HARNESS_GIMP_BRIDGE_URL", "http://127.0.0.1:41749")
+    monkeypatch.setenv("HARNESS_GIMP_STATE_DIR", str(tmp_path / "state"))
+    monkeypatch.setattr(cli_main.subprocess, "Popen", fake_popen)
+    monkeypatch.setattr(cli_main, "BridgeClient", FakeClient)
+    monkeypatch.setattr(cli_main.time, "sleep", lambda _: None)
+    socket_path = tmp_path / "bridge.sock"
+    cli_main.bridge_start(host="127.0.0.1", port=41749, socket_path=socket_path)
+    assert launched[0][-2:] == ["--socket", str(socket_path.resolve())]
+    url = (tmp_path / "state" / "bridge.url").read_text(encoding="utf-8")
+    assert url == f"unix://{socket_path.resolve().as_posix()}"
+
+
+def test_bridge_client_is_reused_per_url(monkeypatch) -> None:
+    monkeypatch.setattr(cli_main, "_SESSION_CLIENT", None)
+    monkeypatch.setenv("HARNESS_GIMP_BRIDGE_URL", "http://127.0.0.1:49998")
+    first = cli_main._bridge_client()
+    assert cli_main._bridge_client() is first
+    monkeypatch.setenv("HARNESS_GIMP_BRIDGE_URL", "http://127.0.0.1:49997")
+    second = cli_main._bridge_client()
+    assert second is not first
+    assert second.url == "http://127.0.0.1:49997"
+
+
+def test_ensure_bridge_ready_caches_healthy_result(monkeypatch) -> None:
+    calls = []
+
+    class FakeClient(cli_main.BridgeClient):
+        def _post(self, path, request, timeout_seconds):
+            calls.append(request["method"])
+            return {"ok": True, "result": {"ok": True}}
+
+    monkeypatch.setattr(cli_main, "_SESSION_CLIENT", FakeClient("http://127.0.0.1:49996"))
+    monkeypatch.setenv("HARNESS_GIMP_BRIDGE_URL", "http://127.0.0.1:49996")
+    cli_main._ensure_bridge_ready("resize")
+    cli_main._ensure_bridge_ready("crop")
+    assert calls == ["system.health"]
+
+
+def test_bridge_start_backs_off_with_one_probe_client(monkeypatch, tmp_path: Path) -> None:
+    clients = []
+    sleeps = []
+    launched = {}
+
+    class FakeProcess:
+        pid = 4343
+
+    class FakeClient:
+        def __init__(self, url: str):
+            self.url = url
+            self.probes = 0
+            clients.append(self)
+
+        def health(self):
+            self.probes += 1
+            if self.probes < 4:
+                raise cli_main.BridgeClientError("BRIDGE_UNAVAILABLE", "connection refused")
+            return {"ok": True}
+
+    def fake_popen(args, **kwargs):
+        launched.update(kwargs)
+        return FakeProcess()
+
+    monkeypatch.setenv("HARNESS_GIMP_BRIDGE_URL", "http://127.0.0.1:41749")
+    monkeypatch.setenv("HARNESS_GIMP_STATE_DIR", str(tmp_path / "state"))
+    monkeypatch.setattr(cli_main.subprocess, "Popen", fake_popen)
+    monkeypatch.setattr(cli_main, "BridgeClient", FakeClient)
+    monkeypatch.setattr(cli_main.time, "sleep", sleeps.append)
+    cli_main.bridge_start(host="127.0.0.1", port=41750, socket_path=None)
+    assert len(clients) == 1 and clients[0].probes == 4
+    assert sleeps == [0.01, 0.02, 0.04, 0.08]
+    if cli_main.os.name != "nt":
+        assert launched["start_new_session"] is True
+
+
+def test_print_writes_utf8_json_bytes(capsysbinary) -> None:
+    cli_main._ok("inspect", {"name": "café"})
+    out = capsysbinary.readouterr().out
+    assert out.endswith(b"}\n")
+    assert cli_main.codec.loads(out)["data"] == {"name": "café"}
+
+
+def test_bridge_start_reports_running_pid_and_clears_corrupt_file(monkeypatch, tmp_path: Path, capsys) -> None:
+    state = tmp_path / "state"
+    monkeypatch.setenv("HARNESS_GIMP_STATE_DIR", str(state))
+    state.mkdir()
+    (state / "bridge.pid").write_text(str(cli_main.os.getpid()), encoding="utf-8")
+    cli_main.bridge_start(host="127.0.0.1", port=41751, socket_path=None)
+    assert '"already-running"' in capsys.readouterr().out
+
+    (state / "bridge.pid").write_text("not-a-pid", encoding="utf-8")
+    monkeypatch.setattr(cli_main.subprocess, "Popen", lambda *a, **k: (_ for _ in ()).throw(RuntimeError("spawned")))
+    with pytest.raises(RuntimeError, match="spawned"):
+        cli_main.bridge_start(host="127.0.0.1", port=41751, socket_path=None)
+    assert not (state / "bridge.pid").exists()
+
+
+def test_apply_preset_batch_sends_one_batch_request(monkeypatch, tmp_path: Path, capsys) -> None:
+    for name in ("b.png", "a.png", "notes.txt"):
+        (tmp_path / name).write_bytes(b"x")
+    sent = []
+
+    class FakeClient(cli_main.BridgeClient):
+        def call(self, method, params, timeout_seconds=30, cache_ttl=0):
+            return {"ok": True}
+
+        def call_many(self, calls, timeout_seconds=30):
+            sent.append(calls)
+            return [{"preset": "web"}, cli_main.BridgeClientError("ERROR", "bad image")]
+
+    monkeypatch.setattr(cli_main, "_SESSION_CLIENT", FakeClient("http://127.0.0.1:49995"))
+    monkeypatch.setenv("HARNESS_GIMP_BRIDGE_URL", "http://127.0.0.1:49995")
+    with pytest.raises(SystemExit):
+        cli_main.apply_preset_batch("web", images=str(tmp_path / "*.png"))
+    assert [params["image"] for _, params in sent[0]] == [str(tmp_path / "a.png"), str(tmp_path / "b.png")]
+    data = cli_main.codec.loads(capsys.readouterr().out)["data"]
+    assert data["failures"] == 1 and data["results"][1]["error"]["message"] == "bad image"
+
+
+@pytest.mark.parametrize("server_side", [False, True])
+def test_bridge_verify_reports_unreachable_bridge_as_unstable(monkeypatch, capsys, server_side: bool) -> None:
+    monkeypatch.setattr(cli_main, "_SESSION_CLIENT", None)
+    monkeypatch.setenv("HARNESS_GIMP_BRIDGE_URL", "http://127.0.0.1:1")
+    with pytest.raises(SystemExit):
+        cli_main.bridge_verify(iterations=3, max_failures=0, server_side=server_side)
+    out = cli_main.codec.loads(capsys.readouterr().out)
+    assert out["data"]["stable"] is False and out["data"]["failures"] == 3
+    assert len(out["data"]["samplesMs"]) == (0 if server_side else 3)
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from harness_gimp.core import codec
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(codec, "orjson", None)
+    elif codec.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+def test_codec_round_trips(backend: str) -> None:
+    payload = {"method": "image.resize", "params": {"width": 10, "name": "café"}}
+    assert codec.loads(codec.dumps(payload)) == payload
+    assert codec.loads(codec.dumps(payload).decode("utf-8")) == payload
+
+
+def test_codec_matches_json_for_non_str_keys(backend: str) -> None:
+    value = {1: "a", "big": 2**70}
+    assert codec.loads(codec.dumps(value)) == json.loads(json.dumps(value))
+
+
+def test_codec_indent_matches_json_layout(backend: str) -> None:
+    value = {"ok": True, "data": {"layers": [1, 2], "empty": {}}}
+    assert codec.dumps(value, indent=True).decode("utf-8") == json.dumps(value, indent=2)
+
+
+def test_codec_raises_json_decode_error(backend: str) -> None:
+    with pytest.raises(codec.JSONDecodeError):
+        codec.loads(b"{not json")
+
+
+def test_msgspec_backs_msgpack_when_installed() -> None:
+    pytest.importorskip("msgspec")
+    assert codec.msgpack is codec._MsgspecMsgpack
+    payload = {"method": "image.resize", "params": {"width": 10, "name": "café", "blob": b"\x00\x01"}}
+    assert codec.unpackb(codec.packb(payload)) == payload
+
+
+def test_packb_reuses_a_packer_per_thread(monkeypatch) -> None:
+    created = []
+
+    class FakePacker:
+        def __init__(self, use_bin_type: bool) -> None:
+            created.append(self)
+
+        def pack(self, value: object) -> bytes:
+            return json.dumps(value).encode("utf-8")
+
+    monkeypatch.setattr(codec, "msgpack", type("FakeMsgpack", (), {"Packer": FakePacker}))
+    assert codec.packb({"a": 1}) == b'{"a": 1}'
+    assert codec.packb([2]) == b"[2]"
+    assert len(created) == 1
@@ -0,0 +1,169 @@
+import os
+import stat
+import sys
+from pathlib import Path
+
+import pytest
+
+from harness_gimp.core import gimp
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="fake GIMP binary is a POSIX script")
+
+RESULT_PID = 'import json, os\nprint("HARNESS_JSON:" + json.dumps({"pid": os.getpid()}))'
+
+
+def _fake_gimp(tmp_path: Path, body: str) -> Path:
+    binary = tmp_path / "gimp-console"
+    binary.write_text(f"#!{sys.executable}\nimport sys\ncode = sys.argv[sys.argv.index('--batch') + 1]\n{body}\n", encoding="utf-8")
+    binary.chmod(binary.stat().st_mode | stat.S_IEXEC)
+    return binary
+
+
+@pytest.fixture(autouse=True)
+def isolated_workers(monkeypatch, tmp_path: Path):
+    monkeypatch.setenv("HARNESS_GIMP_PROFILE_DIR", str(tmp_path / "profile"))
+    monkeypatch.delenv("HARNESS_GIMP_WORKER", raising=False)
+    yield
+    gimp.shutdown_workers()
+    gimp._BROKEN_WORKERS.clear()
+
+
+def test_worker_reuses_one_gimp_process(tmp_path: Path) -> None:
+    binary = _fake_gimp(tmp_path, "exec(code)")
+    first = gimp.run_python_batch(RESULT_PID, timeout_seconds=30, gimp_bin=binary)
+    second = gimp.run_python_batch(RESULT_PID, timeout_seconds=30, gimp_bin=binary)
+    assert first["pid"] == second["pid"] != os.getpid()
+    with pytest.raises(gimp.GimpExecutionError, match="boom"):
+        gimp.run_python_batch('raise RuntimeError("boom")', timeout_seconds=30, gimp_bin=binary)
+    assert gimp.run_python_batch(RESULT_PID, timeout_seconds=30, gimp_bin=binary) == first
+
+
+def test_worker_returns_results_in_the_done_frame(tmp_path: Path) -> None:
+    binary = _fake_gimp(tmp_path, "exec(code)")
+    code = 'print("HARNESS_JSON: ignored")\nHARNESS_STATE["result"] = {"framed": True}'
+    assert gimp.run_python_batch(code, timeout_seconds=30, gimp_bin=binary) == {"framed": True}
+    assert gimp.run_python_batch(RESULT_PID, timeout_seconds=30, gimp_bin=binary)["pid"] != os.getpid()
+
+
+def test_worker_falls_back_to_one_shot_batches(tmp_path: Path) -> None:
+    binary = _fake_gimp(tmp_path, "if 'HARNESS_READY' in code:\n    sys.exit(1)\nexec(code)")
+    first = gimp.run_python_batch(RESULT_PID, timeout_seconds=30, gimp_bin=binary)
+    second = gimp.run_python_batch(RESULT_PID, timeout_seconds=30, gimp_bin=binary)
+    assert first["pid"] != second["pid"]
+    assert str(binary) in gimp._BROKEN_WORKERS
+
+
+def test_worker_can_be_disabled(monkeypatch, tmp_path: Path) -> None:
+    monkeypatch.setenv("HARNESS_GIMP_WORKER", "0")
+    binary = _fake_gimp(tmp_path, "exec(code)")
+    first = gimp.run_python_batch(RESULT_PID, timeout_seconds=30, gimp_bin=binary)
+    assert first["pid"] != gimp.run_python_batch(RESULT_PID, timeout_seconds=30, gimp_bin=binary)["pid"]
+    assert not gimp._WORKERS
+
+
+def test_gimp_binary_lookup_is_cached_until_refresh(monkeypatch, tmp_path: Path) -> None:
+    binary = _fake_gimp(tmp_path, "exec(code)")
+    monkeypatch.setenv("HARNESS_GIMP_BIN", str(binary))
+    gimp.resolve_gimp_binary(refresh=True)
+    binary.unlink()
+    assert gimp.resolve_gimp_binary() == binary
+    with pytest.raises(gimp.GimpExecutionError):
+        gimp.resolve_gimp_binary(refresh=True)
+
+
+def test_one_shot_batches_stream_output(monkeypatch, tmp_path: Path) -> None:
+    monkeypatch.setenv("HARNESS_GIMP_WORKER", "0")
+    chatty = "for i in range(5000):\n    print('GEGL-WARNING: noise', i, file=sys.stderr if i % 2 else sys.stdout)\nexec(code)"
+    binary = _fake_gimp(tmp_path, chatty)
+    assert gimp.run_python_batch(RESULT_PID, timeout_seconds=30, gimp_bin=binary)["pid"] != os.getpid()
+
+    failing = _fake_gimp(tmp_path, "print('early line')\nfor i in range(500):\n    print('late', i)\nsys.exit(3)")
+    with pytest.raises(gimp.GimpExecutionError) as excinfo:
+        gimp.run_python_batch(RESULT_PID, timeout_seconds=30, gimp_bin=failing)
+    assert "late 499" in str(excinfo.value) and "early line" not in str(excinfo.value)
+
+    hanging = _fake_gimp(tmp_path, "import time\ntime.sleep(30)")
+    with pytest.raises(gimp.subprocess.TimeoutExpired):
+        gimp.run_python_batch(RESULT_PID, timeout_seconds=0.5, gimp_bin=hanging)
+
+
+def test_one_shot_batches_use_stdin_only_for_oversized_scripts(monkeypatch, tmp_path: Path) -> None:
+    monkeypatch.setenv("HARNESS_GIMP_WORKER", "0")
+    binary = _fake_gimp(tmp_path, "exec(code)")
+    padding = "#" + "x" * 200_000 + "\n"
+    code = padding * 20 + 'import json\nprint("HARNESS_JSON:" + json.dumps({"argv": len(sys.argv[-1])}))'
+    assert gimp.run_python_batch(code, timeout_seconds=30, gimp_bin=binary) == {"argv": len(gimp._STDIN_STUB)}
+
+    small = 'import json\nprint("HARNESS_JSON:" + json.dumps({"argv": len(sys.argv[-1])}))'
+    assert gimp.run_python_batch(small, timeout_seconds=30, gimp_bin=binary) == {"argv": len(small)}
+
+
+def test_prewarm_starts_the_worker_in_the_background(monkeypatch, tmp_path: Path) -> None:
+    binary = _fake_gimp(tmp_path, "exec(code)")
+    monkeypatch.setenv("HARNESS_GIMP_BIN", str(binary))
+    gimp.resolve_gimp_binary(refresh=True)
+    thread = gimp.prewarm_worker()
+    thread.join(timeout=30)
+    worker = gimp._WORKERS[str(binary)]
+    assert worker.alive
+    pid = worker._proc.pid
+    assert gimp.run_python_batch(RESULT_PID, timeout_seconds=30)["pid"] == pid
+    monkeypatch.setenv("HARNESS_GIMP_SKIP_WARMUP", "1")
+    assert gimp.prewarm_worker() is None
+    gimp.resolve_gimp_binary(refresh=True)
+
+
+def test_worker_keeps_a_bounded_output_tail(tmp_path: Path) -> None:
+    binary = _fake_gimp(tmp_path, "exec(code)")
+    noisy = 'import sys\nfor i in range(5000):\n    print("GEGL-WARNING", i, file=sys.stderr)\n'
+    assert gimp.run_python_batch(noisy + RESULT_PID, timeout_seconds=30, gimp_bin=binary)["pid"] != os.getpid()
+    with pytest.raises(gimp.GimpExecutionError) as excinfo:
+        gimp.run_python_batch(noisy + 'raise RuntimeError("boom")', timeout_seconds=30, gimp_bin=binary)
+    message = str(excinfo.value)
+    assert "boom" in message and "GEGL-WARNING 4999" in message and "GEGL-WARNING 10\n" not in message
+
+
+_FAKE_GIMP_CONTEXT = """
+import types
+_stack = []
+_context = {"foreground": "black"}
+
+class Gimp:
+    @staticmethod
+    def context_push():
+        _stack.append(dict(_context))
+        return True
+
+    @staticmethod
+    def context_pop():
+        _context.clear()
+        _context.update(_stack.pop())
+        return True
+
+    @staticmethod
+    def context_set_foreground(color):
+        _context["foreground"] = color
+
+    @staticmethod
+    def context_get_foreground():
+        return _context["foreground"]
+
+gi = types.ModuleType("gi")
+gi.repository = types.ModuleType("gi.repository")
+gi.repository.Gimp = Gimp
+sys.modules["gi"] = gi
+sys.modules["gi.repository"] = gi.repository
+exec(code)
+"""
+
+
+def test_worker_isolates_gimp_context_between_requests(tmp_path: Path) -> None:
+    binary = _fake_gimp(tmp_path, _FAKE_GIMP_CONTEXT)
+    read = 'from gi.repository import Gimp\nHARNESS_STATE["result"] = {"fg": Gimp.context_get_foreground()}'
+    paint = 'from gi.repository import Gimp\nGimp.context_set_foreground("red")\n' + read.split("\n", 1)[1]
+    assert gimp.run_python_batch(paint, timeout_seconds=30, gimp_bin=binary) == {"fg": "red"}
+    assert gimp.run_python_batch(read, timeout_seconds=30, gimp_bin=binary) == {"fg": "black"}
+    with pytest.raises(gimp.GimpExecutionError):
+        gimp.run_python_batch(paint + "\nraise RuntimeError('boom')", timeout_seconds=30, gimp_bin=binary)
+    assert gimp.run_python_batch(read, timeout_seconds=30, gimp_bin=binary) == {"fg": "black"}
+    assert str(binary) in gimp._WORKERS
@@ -1,9 +1,117 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import threading
+import types
 from pathlib import Path
 
+import pytest
+
 from harness_gimp.bridge import operations
 from PIL import Image
 
 
+class _FakeEnum(str):
+    def __getattr__(self, name: str) -> "_FakeEnum":
+        return _FakeEnum(name)
+
+
+class _FakeLayer:
+    def get_id(self) -> int:
+        return 1
+
+    def get_name(self) -> str:
+        return "Background"
+
+    def get_opacity(self) -> float:
+        return 100.0
+
+    def get_mode(self) -> str:
+        return "NORMAL"
+
+    def set_mode(self, mode: str) -> None:
+        self.mode = mode
+
+
+class _FakeImage:
+    def __init__(self, gimp: "_FakeGimp"):
+        self.gimp = gimp
+        self.deleted = False
+
+    def get_width(self) -> int:
+        return 64
+
+    def get_height(self) -> int:
+        return 32
+
+    def get_layers(self) -> list:
+        return [_FakeLayer()]
+
+    def duplicate(self) -> "_FakeImage":
+        return _FakeImage(self.gimp)
+
+    def delete(self) -> None:
+        self.deleted = True
+
+
+class _FakeProcedure:
+    def __init__(self, gimp: "_FakeGimp", name: str):
+        self.gimp = gimp
+        self.name = name
+
+    def create_config(self) -> types.SimpleNamespace:
+        props = {}
+        return types.SimpleNamespace(props=props, set_property=props.__setitem__)
+
+    def get_return_values(self) -> list:
+        return [None]
+
+    def run(self, cfg: types.SimpleNamespace) -> types.SimpleNamespace:
+        self.gimp.calls.append((self.name, cfg.props))
+        returned = {
+            "gimp-file-load": lambda: _FakeImage(self.gimp),
+            "gimp-drawable-filter-new": lambda: types.SimpleNamespace(get_config=self.create_config),
+        }.get(self.name, lambda: None)()
+        values = ["SUCCESS", returned]
+        return types.SimpleNamespace(index=values.__getitem__)
+
+
+class _FakeGimp:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name: str) -> _FakeEnum:
+        return _FakeEnum(name)
+
+    def get_pdb(self) -> types.SimpleNamespace:
+        return types.SimpleNamespace(lookup_procedure=lambda name: _FakeProcedure(self, name))
+
+
+@pytest.fixture
+def fake_gimp(monkeypatch):
+    gimp = _FakeGimp()
+    gio = types.SimpleNamespace(File=types.SimpleNamespace(new_for_path=lambda path: path))
+    repository = types.ModuleType("gi.repository")
+    repository.Gimp = gimp
+    repository.Gio = gio
+    monkeypatch.setitem(sys.modules, "gi", types.ModuleType("gi"))
+    monkeypatch.setitem(sys.modules, "gi.repository", repository)
+    return gimp
+
+
+def _exec_script(payload: dict, capsys, state: dict | None = None) -> dict:
+    namespace = {"__name__": "__harness__"}
+    if state is not None:
+        namespace["HARNESS_STATE"] = state
+    exec(compile(operations._script(payload), "<harness>", "exec"), namespace)
+    if state is not None:
+        return state.pop("result")
+    lines = [line for line in capsys.readouterr().out.splitlines() if line.startswith("HARNESS_JSON:")]
+    return json.loads(lines[-1][len("HARNESS_JSON:") :])
+
+
 def test_actions_contains_core_methods() -> None:
     data = operations.handle_method("system.actions", {})
     actions = data["actions"]
@@ -39,6 +147,520 @@ def test_run_action_uses_batch_runner(monkeypatch) -> None:
     assert out["ok"] is True
 
 
+def test_script_is_valid_python() -> None:
+    code = operations._script({"action": "resize", "image": "x.png", "width": 1, "height": 1, "output": "y.png"})
+    compile(code, "<harness>", "exec")
+    assert "HARNESS_STATE" in code
+
+
+def test_worker_state_reuses_decoded_images(fake_gimp, capsys, tmp_path: Path) -> None:
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    state: dict = {}
+    assert _exec_script({"action": "inspect", "image": str(image)}, capsys, state)["width"] == 64
+    assert _exec_script({"action": "inspect", "image": str(image)}, capsys, state)["layerCount"] == 1
+    assert [name for name, _ in fake_gimp.calls].count("gimp-file-load") == 1
+    image.write_bytes(b"png-changed")
+    _exec_script({"action": "inspect", "image": str(image)}, capsys, state)
+    assert [name for name, _ in fake_gimp.calls].count("gimp-file-load") == 2
+    assert len(state["images"]) == 1
+    st = os.stat(image)
+    image.write_bytes(b"png-CHANGED")
+    os.utime(image, ns=(st.st_atime_ns, st.st_mtime_ns))
+    _exec_script({"action": "inspect", "image": str(image)}, capsys, state)
+    assert [name for name, _ in fake_gimp.calls].count("gimp-file-load") == 3
+    assert len(state["images"]) == 1
+    _exec_script({"action": "inspect", "image": str(image)}, capsys)
+    assert [name for name, _ in fake_gimp.calls].count("gimp-file-load") == 4
+
+
+def test_script_embeds_non_ascii_payload(fake_gimp, capsys, tmp_path: Path) -> None:
+    image = tmp_path / "café \'\'\' {x} \\.png"
+    image.write_bytes(b"png")
+    result = _exec_script({"action": "inspect", "image": str(image)}, capsys)
+    assert result["width"] == 64
+    assert fake_gimp.calls[0][1]["file"] == str(image)
+
+
+def test_script_dispatches_actions_through_handler_table(fake_gimp, capsys, tmp_path: Path) -> None:
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    out = str(tmp_path / "b.png")
+    result = _exec_script({"action": "selection_invert", "image": str(image), "output": out}, capsys)
+    assert result == {"output": out, "action": "selection_invert"}
+    assert [name for name, _ in fake_gimp.calls] == ["gimp-file-load", "gimp-selection-invert", "gimp-file-save"]
+    with pytest.raises(RuntimeError, match="Unsupported action: nope"):
+        _exec_script({"action": "nope"}, capsys)
+
+
+def test_unknown_method_is_rejected_before_dispatch() -> None:
+    with pytest.raises(operations.BridgeOperationError) as exc:
+        operations.handle_method("image.nope", {})
+    assert exc.value.code == "INVALID_INPUT"
+    assert operations.handle_method("system.actions", {})["actions"] is operations.ACTION_METHODS
+    assert isinstance(operations.ACTION_METHODS, tuple)
+
+
+def test_every_action_method_has_a_handler() -> None:
+    assert set(operations._HANDLERS) == operations.ACTION_METHODS_SET
+
+
+def test_soak_resolves_the_action_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = []
+    monkeypatch.setitem(operations._HANDLERS, "system.version", lambda params: calls.append(params) or {})
+    result = operations.handle_method("system.soak", {"iterations": 3, "action": "system.version"})
+    assert result["failures"] == 0 and len(calls) == 3
+    assert operations.handle_method("system.soak", {"iterations": 5})["stable"] is True
+    unknown = operations.handle_method("system.soak", {"iterations": 2, "action": "image.nope"})
+    assert unknown["failures"] == 2 and unknown["stable"] is False
+
+
+def test_verify_samples_health_in_process() -> None:
+    result = operations.handle_method("system.verify", {"iterations": 4})
+    assert result["iterations"] == 4 and result["failures"] == 0
+    assert set(result["latencyMs"]) == {"min", "max", "avg"}
+    assert len(result["samplesMs"]) == 4 and max(result["samplesMs"]) == result["latencyMs"]["max"]
+
+
+def test_presets_are_read_only() -> None:
+    with pytest.raises(TypeError):
+        operations.PRESETS["custom"] = ()  # type: ignore[index]
+    assert operations.handle_method("preset.list", {})["presets"] == sorted(operations.PRESETS)
+    method, base = operations._COMPILED_PRESETS["thumbnail"][0]
+    assert (method, dict(base)) == ("image.resize", {"width": 512, "height": 512})
+    with pytest.raises(TypeError):
+        base["width"] = 1  # type: ignore[index]
+    step = operations.PRESETS["thumbnail"][0]
+    with pytest.raises(TypeError):
+        step["method"] = "image.crop"  # type: ignore[index]
+    with pytest.raises(TypeError):
+        step["params"]["width"] = 1  # type: ignore[index]
+    assert dict(step["params"]) == {"width": 512, "height": 512}
+
+
+def test_run_action_snapshots_relative_and_absolute_same_target(monkeypatch, tmp_path: Path) -> None:
+    image = tmp_path / "img.png"
+    image.write_bytes(b"png")
+    snapshots = []
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(operations, "run_python_batch", lambda code, timeout_seconds=0: {"output": "img.png"})
+    monkeypatch.setattr(operations, "_snapshot_image", lambda path, label: snapshots.append((str(path), label)))
+    operations._run_action("invert", {"image": "img.png", "output": str(image)})
+    operations._run_action("invert", {"image": "img.png", "output": str(tmp_path / "other.png")})
+    assert snapshots == [("img.png", "auto-after-invert")]
+
+
+def test_require_path_reports_missing_files(tmp_path: Path) -> None:
+    existing = tmp_path / "a.png"
+    existing.write_bytes(b"png")
+    assert operations._require_path(str(existing)) == existing
+    for missing in (str(tmp_path / "nope.png"), str(existing / "child.png"), "bad\0path"):
+        with pytest.raises(operations.BridgeOperationError) as exc:
+            operations._require_path(missing)
+        assert exc.value.code == "NOT_FOUND"
+
+
+def test_require_path_stats_once_per_request(monkeypatch, tmp_path: Path) -> None:
+    existing = tmp_path / "a.png"
+    existing.write_bytes(b"png")
+    stats = []
+    real_stat = os.stat
+    monkeypatch.setattr(operations.os, "stat", lambda path, *a, **k: stats.append(path) or real_stat(path, *a, **k))
+    with operations._path_scope():
+        with operations._path_scope():
+            operations._require_path(str(existing))
+        operations._require_path(str(existing))
+        with pytest.raises(operations.BridgeOperationError):
+            operations._require_path(str(tmp_path / "nope.png"))
+    assert stats == [str(existing), str(tmp_path / "nope.png")]
+    operations._require_path(str(existing))
+    assert len(stats) == 3
+
+
+def test_macro_rejects_unknown_methods_before_running_any_step(monkeypatch, tmp_path: Path) -> None:
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    seen = []
+    monkeypatch.setitem(operations._HANDLERS, "adjust.invert", lambda params: seen.append(params) or {"ok": True})
+    macro = [{"method": "adjust.invert"}, {"method": "image.nope"}]
+    with pytest.raises(operations.BridgeOperationError) as exc:
+        operations.handle_method("macro.run", {"image": str(image), "macro": macro})
+    assert exc.value.code == "INVALID_INPUT" and seen == []
+    out = operations.handle_method("macro.run", {"image": str(image), "macro": macro[:1], "params": {"k": 1}})
+    assert out == {"steps": [{"method": "adjust.invert", "result": {"ok": True}}]}
+    assert seen == [{"image": str(image), "k": 1}]
+    seen.clear()
+    macro = [{"method": "adjust.invert", "params": {"k": 2, "image": "other.png"}}]
+    operations.handle_method("macro.run", {"image": str(image), "macro": macro, "params": {"k": 1, "j": 3}})
+    assert seen == [{"image": "other.png", "k": 2, "j": 3}]
+
+
+def test_macro_files_are_parsed_once_per_version(monkeypatch, tmp_path: Path) -> None:
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    macro = tmp_path / "macro.json"
+    macro.write_text(json.dumps([{"method": "adjust.invert"}]), encoding="utf-8")
+    monkeypatch.setitem(operations._HANDLERS, "adjust.invert", lambda params: {"ok": True})
+    monkeypatch.setitem(operations._HANDLERS, "adjust.desaturate", lambda params: {"gray": True})
+    reads = []
+    real_loads = operations.codec.loads
+    monkeypatch.setattr(operations.codec, "loads", lambda raw: reads.append(raw) or real_loads(raw))
+    operations._load_macro.cache_clear()
+    for _ in range(3):
+        out = operations.handle_method("macro.run", {"image": str(image), "macro": str(macro)})
+        assert out["steps"][0]["result"] == {"ok": True}
+    assert len(reads) == 1
+    macro.write_text(json.dumps([{"method": "adjust.desaturate"}, {"method": "adjust.invert"}]), encoding="utf-8")
+    out = operations.handle_method("macro.run", {"image": str(image), "macro": str(macro)})
+    assert [step["method"] for step in out["steps"]] == ["adjust.desaturate", "adjust.invert"]
+    assert len(reads) == 2
+
+
+def test_colors_are_normalised_before_gimp_runs(monkeypatch, tmp_path: Path) -> None:
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    seen = []
+    monkeypatch.setattr(operations, "_run_action", lambda action, payload, timeout_seconds=0: seen.append(payload) or {})
+    params = {"image": str(image), "output": str(tmp_path / "b.png")}
+    operations.handle_method("text.add", dict(params, text="hi", color="RGB(255, 0, 16)"))
+    operations.handle_method("annotation.stroke_selection", params)
+    assert [p["color"] for p in seen] == ["#ff0010", "#ffffff"]
+    operations.handle_method("text.add", dict(params, text="hi"))
+    assert seen[-1]["color"] is None
+    with pytest.raises(operations.BridgeOperationError) as exc:
+        operations.handle_method("text.add", dict(params, color="#12345g"))
+    assert exc.value.code == "INVALID_INPUT" and len(seen) == 3
+
+
+def test_selection_toggles_snapshot_and_dispatch(monkeypatch, tmp_path: Path) -> None:
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    seen = []
+    monkeypatch.setattr(operations, "_snapshot_image", lambda path, label: seen.append((path, label)))
+    monkeypatch.setattr(operations, "_run_action", lambda action, payload, timeout_seconds=0: seen.append(action) or {})
+    operations.handle_method("selection.invert", {"image": str(image)})
+    assert seen == [(image, "auto-before-selection-invert"), "selection_invert"]
+
+
+def test_system_version_reports_script_version() -> None:
+    result = operations.handle_method("system.version", {})
+    assert result["scriptVersion"] == operations.SCRIPT_VERSION
+    assert len(operations.SCRIPT_VERSION) == 16
+
+
+def _fake_batch(scripts: list):
+    def run(code: str, timeout_seconds: float = 0, gimp_bin=None) -> dict:  # noqa: ANN001
+        scripts.append(code)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            exec(compile(code, "<harness>", "exec"), {"__name__": "__harness__"})
+        line = [row for row in out.getvalue().splitlines() if row.startswith("HARNESS_JSON:")][-1]
+        return json.loads(line[len("HARNESS_JSON:") :])
+
+    return run
+
+
+def test_preset_apply_runs_steps_in_one_gimp_call(fake_gimp, monkeypatch, tmp_path: Path) -> None:
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    scripts: list = []
+    monkeypatch.setattr(operations, "run_python_batch", _fake_batch(scripts))
+    out = operations.handle_method("preset.apply", {"image": str(image), "preset": "web-optimize"})
+    assert len(scripts) == 1
+    assert [name for name, _ in fake_gimp.calls] == [
+        "gimp-file-load",
+        "gimp-image-scale",
+        "gimp-drawable-levels",
+        "gimp-file-save",
+    ]
+    assert [step["method"] for step in out["results"]] == ["image.resize", "adjust.levels"]
+    assert out["results"][0]["result"] == {"output": str(image), "width": 1920, "height": 1080}
+    assert _history_descriptions(image) == ["auto-before-chain", "auto-after-chain"]
+
+
+def test_plan_edit_batch_runs_steps_in_one_gimp_call(fake_gimp, monkeypatch, tmp_path: Path) -> None:
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    scripts: list = []
+    monkeypatch.setattr(operations, "run_python_batch", _fake_batch(scripts))
+    steps = [
+        {"action": "resize", "params": {"width": 64, "height": 32}},
+        {"action": "sharpen"},
+        {"action": "invert"},
+    ]
+    out = operations.handle_method("project.plan_edit_batch", {"image": str(image), "steps": steps})
+    assert len(scripts) == 1
+    assert [name for name, _ in fake_gimp.calls][0] == "gimp-file-load"
+    assert [name for name, _ in fake_gimp.calls].count("gimp-file-save") == 1
+    assert [step["method"] for step in out["steps"]] == ["image.resize", "filter.sharpen", "adjust.invert"]
+    with pytest.raises(operations.BridgeOperationError):
+        operations.handle_method("project.plan_edit_batch", {"image": str(image), "steps": [{"action": "nope"}]})
+
+
+def test_batch_run_chains_in_place_ops(fake_gimp, monkeypatch, tmp_path: Path) -> None:
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    scripts: list = []
+    monkeypatch.setattr(operations, "run_python_batch", _fake_batch(scripts))
+    ops = [
+        {"method": "adjust.invert", "params": {"image": str(image), "output": str(image)}},
+        {"method": "filter.sharpen", "params": {"image": str(image), "output": str(image)}},
+    ]
+    out = operations.handle_method("batch.run", {"ops": ops})
+    assert len(scripts) == 1
+    assert [entry["method"] for entry in out["results"]] == ["adjust.invert", "filter.sharpen"]
+    assert _history_descriptions(image) == ["auto-before-chain", "auto-after-chain"]
+    for bad in ([], [{"method": "batch.run"}], [{"method": "adjust.invert", "params": []}]):
+        with pytest.raises(operations.BridgeOperationError):
+            operations.handle_method("batch.run", {"ops": bad})
+
+
+def _history_descriptions(image: Path) -> list:
+    state = operations._image_history(str(image.resolve()))
+    return [entry["description"] for entry in state["snapshots"]]
+
+
+def test_batch_run_fallback_snapshots_each_op_once(fake_gimp, monkeypatch, tmp_path: Path) -> None:
+    first = tmp_path / "a.png"
+    second = tmp_path / "b.png"
+    first.write_bytes(b"png")
+    second.write_bytes(b"png")
+    scripts: list = []
+    monkeypatch.setattr(operations, "run_python_batch", _fake_batch(scripts))
+    ops = [
+        {"method": "adjust.invert", "params": {"image": str(first), "output": str(first)}},
+        {"method": "filter.sharpen", "params": {"image": str(second), "output": str(second)}},
+        {"method": "adjust.desaturate", "params": {"image": str(first), "output": str(tmp_path / "c.png")}},
+    ]
+    operations.handle_method("batch.run", {"ops": ops})
+    assert len(scripts) == 3
+    assert _history_descriptions(first) == ["auto-before-invert", "auto-after-invert"]
+    assert _history_descriptions(second) == ["auto-before-sharpen", "auto-after-sharpen"]
+
+
+def test_run_chain_fallback_snapshots_each_step_once(fake_gimp, monkeypatch, tmp_path: Path) -> None:
+    first = tmp_path / "a.png"
+    second = tmp_path / "b.png"
+    first.write_bytes(b"png")
+    second.write_bytes(b"png")
+    monkeypatch.setattr(operations, "run_python_batch", _fake_batch([]))
+    operations._run_chain(
+        [
+            ("adjust.invert", {"image": str(first), "output": str(first)}),
+            ("filter.sharpen", {"image": str(second), "output": str(second)}),
+        ]
+    )
+    assert _history_descriptions(first) == ["auto-before-invert", "auto-after-invert"]
+    assert _history_descriptions(second) == ["auto-before-sharpen", "auto-after-sharpen"]
+
+
+def test_plan_edits_take_one_snapshot_up_front(fake_gimp, monkeypatch, tmp_path: Path) -> None:
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    labels: list = []
+    monkeypatch.setattr(operations, "run_python_batch", _fake_batch([]))
+    monkeypatch.setattr(operations, "_snapshot_image", lambda path, label: labels.append(label))
+    steps = [{"action": "invert"}, {"action": "sharpen"}, {"action": "desaturate"}]
+    operations.handle_method("project.plan_edit_batch", {"image": str(image), "steps": steps})
+    assert labels == ["auto-before-plan", "auto-after-chain"]
+    labels.clear()
+    operations.handle_method("project.plan_edit", {"image": str(image), "action": "invert"})
+    assert labels == ["auto-before-plan-invert", "auto-after-invert"]
+
+
+def test_chain_merges_consecutive_gegl_filters_once(fake_gimp, capsys, tmp_path: Path) -> None:
+    image = str(tmp_path / "a.png")
+    Path(image).write_bytes(b"png")
+    steps = [
+        {"action": "blur", "radius": 2.0},
+        {"action": "sharpen"},
+        {"action": "invert"},
+        {"action": "noise_reduction"},
+    ]
+    result = _exec_script({"action": "chain", "image": image, "output": image, "steps": steps}, capsys)
+    assert len(result["results"]) == 4
+    assert [name for name, _ in fake_gimp.calls] == [
+        "gimp-file-load",
+        "gimp-drawable-filter-new",
+        "gimp-drawable-filter-new",
+        "gimp-drawable-merge-filters",
+        "gimp-drawable-invert",
+        "gimp-drawable-filter-new",
+        "gimp-drawable-merge-filters",
+        "gimp-file-save",
+    ]
+
+
+def test_run_chain_falls_back_when_steps_write_elsewhere(fake_gimp, monkeypatch, tmp_path: Path) -> None:
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    scripts: list = []
+    monkeypatch.setattr(operations, "run_python_batch", _fake_batch(scripts))
+    other = str(tmp_path / "b.png")
+    results = operations._run_chain(
+        [
+            ("adjust.invert", {"image": str(image), "output": other}),
+            ("image.crop_center", {"image": str(image), "width": 8, "height": 8}),
+        ]
+    )
+    assert len(scripts) == 3
+    assert results[0] == {"output": other}
+
+
+def test_script_normalizes_enum_names(fake_gimp, capsys, tmp_path: Path) -> None:
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    payload = {"image": str(image), "output": str(image)}
+    result = _exec_script(dict(payload, action="desaturate", mode=" Average"), capsys)
+    assert result["mode"] == "average"
+    result = _exec_script(dict(payload, action="layer_blend_mode", layerIndex=0, mode="soft light"), capsys)
+    assert result["mode"] == "SOFT_LIGHT"
+
+
+@pytest.mark.parametrize("file_digest", [True, False])
+def test_sha256_matches_hashlib(monkeypatch, tmp_path: Path, file_digest: bool) -> None:
+    import hashlib
+
+    if not file_digest:
+        monkeypatch.delattr(hashlib, "file_digest", raising=False)
+    data = bytes(range(256)) * 5000
+    path = tmp_path / "blob.bin"
+    path.write_bytes(data)
+    assert operations._sha256(path) == hashlib.sha256(data).hexdigest()
+
+
+def test_sha256_is_cached_until_the_file_changes(monkeypatch, tmp_path: Path) -> None:
+    import hashlib
+
+    path = tmp_path / "blob.bin"
+    path.write_bytes(b"one")
+    first = operations._sha256(path)
+    opened = []
+    real_open = open
+    monkeypatch.setattr("builtins.open", lambda *a, **k: opened.append(a[0]) or real_open(*a, **k))
+    assert operations._sha256(path) == first
+    assert opened == []
+    path.write_bytes(b"two!")
+    assert operations._sha256(path) == hashlib.sha256(b"two!").hexdigest()
+    assert opened == [str(path)]
+
+
+def test_image_diff_overlaps_inspects(monkeypatch, tmp_path: Path) -> None:
+    import threading
+
+    source = tmp_path / "a.png"
+    target = tmp_path / "b.png"
+    source.write_bytes(b"same")
+    target.write_bytes(b"same")
+    barrier = threading.Barrier(2, timeout=5)
+
+    def fake_run_action(action: str, payload: dict, timeout_seconds: float = 0):  # noqa: ANN001
+        barrier.wait()
+        return {"width": 4, "height": 3 if payload["image"] == str(source) else 5}
+
+    monkeypatch.setattr(operations, "_run_action", fake_run_action)
+    out = operations.handle_method("image.diff", {"source": str(source), "target": str(target)})
+    assert out["sameBytes"] is True
+    assert out["sameDimensions"] is False
+    assert (out["source"]["height"], out["target"]["height"]) == (3, 5)
+
+
+def test_image_diff_skips_work_stat_already_answers(monkeypatch, tmp_path: Path) -> None:
+    source = tmp_path / "a.png"
+    source.write_bytes(b"abc")
+    link = tmp_path / "link.png"
+    os.link(source, link)
+    other = tmp_path / "b.png"
+    other.write_bytes(b"abcd")
+    inspected = []
+    hashed = []
+    real_sha256 = operations._sha256
+
+    def fake_run_action(action: str, payload: dict, timeout_seconds: float = 0):  # noqa: ANN001
+        inspected.append(payload["image"])
+        return {"width": 1, "height": 1}
+
+    monkeypatch.setattr(operations, "_run_action", fake_run_action)
+    monkeypatch.setattr(operations, "_sha256", lambda path: hashed.append(path) or real_sha256(path))
+    out = operations.handle_method("image.diff", {"source": str(source), "target": str(link)})
+    assert out["sameBytes"] is True and len(inspected) == 1 and len(hashed) == 1
+    hashed.clear()
+    out = operations.handle_method("image.diff", {"source": str(source), "target": str(other), "hashes": False})
+    assert out["sameBytes"] is False and hashed == []
+    assert out["source"]["sha256"] is None
+
+
+
+def test_image_diff_sees_same_size_rewrites_in_one_mtime_tick(monkeypatch, tmp_path: Path) -> None:
+    source = tmp_path / "a.png"
+    target = tmp_path / "b.png"
+    source.write_bytes(b"same")
+    target.write_bytes(b"same")
+    inspect = {"width": 1, "height": 1}
+    monkeypatch.setattr(operations, "_run_action", lambda action, payload, timeout_seconds=0: inspect)
+    params = {"source": str(source), "target": str(target)}
+    operations._sha256(target)
+    assert operations.handle_method("image.diff", params)["sameBytes"] is True
+    st = os.stat(target)
+    target.write_bytes(b"diff")
+    os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns))
+    out = operations.handle_method("image.diff", params)
+    assert out["sameBytes"] is False and out["source"]["sha256"] != out["target"]["sha256"]
+
+def test_history_is_an_append_only_journal(tmp_path: Path) -> None:
+    image = tmp_path / "img.png"
+    image.write_bytes(b"one")
+    key = str(image.resolve())
+    operations._snapshot_image(image, "a")
+    journal = operations._journal_path(key)
+    first = journal.read_bytes()
+    image.write_bytes(b"two")
+    operations._snapshot_image(image, "b")
+    operations._undo_redo(image, -1)
+    assert journal.read_bytes().startswith(first)
+    assert len(journal.read_bytes().splitlines()) == 3
+    operations._JOURNALS.clear()
+    assert operations._image_history(key)["index"] == 0
+    operations._snapshot_image(image, "c")
+    history = operations._image_history(key)
+    assert [entry["description"] for entry in history["snapshots"]] == ["a", "c"]
+
+
+def test_history_reads_legacy_state(tmp_path: Path) -> None:
+    image = tmp_path / "img.png"
+    image.write_bytes(b"new")
+    old = tmp_path / "old.png"
+    old.write_bytes(b"old")
+    operations.HISTORY_ROOT.mkdir()
+    state = {"images": {str(image.resolve()): {"snapshots": [str(old)], "index": 0}}}
+    operations.HISTORY_STATE.write_text(json.dumps(state), encoding="utf-8")
+    operations._snapshot_image(image, "next")
+    operations._undo_redo(image, -1)
+    assert image.read_bytes() == b"old"
+
+
+def test_copy_file_copies_bytes_and_falls_back(monkeypatch, tmp_path: Path) -> None:
+    import errno
+    import shutil
+
+    src = tmp_path / "src.bin"
+    src.write_bytes(bytes(range(256)) * 4096)
+    dst = tmp_path / "dst.bin"
+    dst.write_bytes(b"stale contents that are longer than nothing")
+    operations._copy_file(src, dst)
+    assert dst.read_bytes() == src.read_bytes()
+    with pytest.raises(shutil.SameFileError):
+        operations._copy_file(src, src)
+
+    def cross_device(*args):  # noqa: ANN002
+        raise OSError(errno.EXDEV, "cross-device")
+
+    monkeypatch.setattr(operations.os, "copy_file_range", cross_device, raising=False)
+    other = tmp_path / "other.bin"
+    operations._copy_file(src, other)
+    assert other.read_bytes() == src.read_bytes()
+
+
 def test_curves_accepts_xy_pairs(monkeypatch, tmp_path: Path) -> None:
     image = tmp_path / "image.png"
     image.write_text("x", encoding="utf-8")
@@ -55,6 +677,16 @@ def test_curves_accepts_xy_pairs(monkeypatch, tmp_path: Path) -> None:
     assert out["payload"]["points"] == [[0, 0], [255, 255]]
 
 
+def test_script_curves_uses_outermost_sorted_points(fake_gimp, capsys, tmp_path: Path) -> None:
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    points = [{"x": 200, "y": 255}, [51, 0], {"x": 128, "y": 128}]
+    _exec_script({"action": "curves", "image": str(image), "output": str(image), "points": points}, capsys)
+    levels = [props for name, props in fake_gimp.calls if name == "gimp-drawable-levels"][0]
+    assert levels["low-input"] == 51 / 255.0
+    assert levels["high-input"] == 200 / 255.0
+
+
 def test_layer_id_alias_is_supported(monkeypatch, tmp_path: Path) -> None:
     image = tmp_path / "image.xcf"
     image.write_text("x", encoding="utf-8")
@@ -107,6 +739,108 @@ def test_montage_grid_composes_tiles(tmp_path: Path) -> None:
     assert result["cols"] == 2
 
 
+def test_montage_grid_single_tile_skips_the_thread_pool(monkeypatch, tmp_path: Path) -> None:
+    source = tmp_path / "a.png"
+    Image.new("RGB", (10, 10), (1, 2, 3)).save(source)
+    monkeypatch.setattr(operations, "ThreadPoolExecutor", None)
+    out = tmp_path / "grid.png"
+    operations.handle_method(
+        "image.montage_grid",
+        {"images": [str(source)], "rows": 1, "cols": 1, "tileWidth": 10, "tileHeight": 10, "output": str(out)},
+    )
+    assert Image.open(out).getpixel((5, 5)) == (1, 2, 3)
+
+
+def test_montage_grid_contain_centers_tiles_on_background(tmp_path: Path) -> None:
+    wide = tmp_path / "wide.jpg"
+    tall = tmp_path / "tall.png"
+    Image.new("RGB", (400, 100), (255, 255, 255)).save(wide)
+    Image.new("L", (10, 40), 255).save(tall)
+
+    out = tmp_path / "grid.png"
+    operations.handle_method(
+        "image.montage_grid",
+        {
+            "images": [str(wide), str(tall)],
+            "rows": 1,
+            "cols": 2,
+            "tileWidth": 40,
+            "tileHeight": 40,
+            "gutter": 4,
+            "background": "#ff0000",
+            "fitMode": "contain",
+            "output": str(out),
+        },
+    )
+    image = Image.open(out).convert("RGB")
+    assert image.size == (84, 40)
+    assert image.getpixel((20, 0)) == (255, 0, 0)
+    assert image.getpixel((20, 20))[1] > 200
+    assert image.getpixel((42, 20)) == (255, 0, 0)
+    assert image.getpixel((44, 20)) == (255, 0, 0)
+    assert image.getpixel((64, 20)) == (255, 255, 255)
+
+
+def test_montage_grid_accepts_formats_outside_the_fast_path(tmp_path: Path) -> None:
+    tiff = tmp_path / "a.tiff"
+    png = tmp_path / "b.png"
+    Image.new("RGB", (10, 10), (0, 0, 255)).save(tiff)
+    Image.new("RGB", (10, 10), (0, 255, 0)).save(png)
+    out = tmp_path / "grid.png"
+    operations.handle_method(
+        "image.montage_grid",
+        {"images": [str(tiff), str(png)], "rows": 1, "cols": 2, "tileWidth": 10, "tileHeight": 10, "output": str(out)},
+    )
+    image = Image.open(out)
+    assert image.getpixel((5, 5)) == (0, 0, 255)
+    assert image.getpixel((15, 5)) == (0, 255, 0)
+
+
+class _FakeVipsImage:
+    def __init__(self, width: int, height: int, bands: int = 4):
+        self.width = width
+        self.height = height
+        self.bands = bands
+
+    def colourspace(self, space: str) -> "_FakeVipsImage":
+        return self
+
+    def extract_band(self, band: int, n: int = 1) -> "_FakeVipsImage":
+        return _FakeVipsImage(self.width, self.height, n)
+
+    def write_to_memory(self) -> bytes:
+        return bytes([0, 255, 0]) * (self.width * self.height)
+
+
+def test_montage_grid_prefers_pyvips_thumbnails(monkeypatch, tmp_path: Path) -> None:
+    seen = []
+
+    class FakeVips:
+        Error = RuntimeError
+
+        class Image:
+            @staticmethod
+            def thumbnail(path: str, width: int, height: int, **kwargs) -> _FakeVipsImage:  # noqa: ANN003
+                seen.append((Path(path).name, kwargs))
+                if path.endswith(".bmp"):
+                    raise RuntimeError("unsupported")
+                return _FakeVipsImage(width, height)
+
+    monkeypatch.setattr(operations, "_pyvips", lambda: FakeVips)
+    sources = [tmp_path / "a.jpg", tmp_path / "b.bmp"]
+    for path in sources:
+        Image.new("RGB", (30, 30), (255, 0, 0)).save(path)
+    out = tmp_path / "grid.png"
+    operations.handle_method(
+        "image.montage_grid",
+        {"images": [str(p) for p in sources], "rows": 1, "cols": 2, "tileWidth": 10, "tileHeight": 10, "output": str(out)},
+    )
+    assert sorted(seen) == [("a.jpg", {"crop": "centre"}), ("b.bmp", {"crop": "centre"})]
+    image = Image.open(out)
+    assert image.getpixel((5, 5)) == (0, 255, 0)
+    assert image.getpixel((15, 5)) == (255, 0, 0)
+
+
 def test_crop_center_uses_inspected_dimensions(monkeypatch, tmp_path: Path) -> None:
     image = tmp_path / "img.png"
     image.write_text("x", encoding="utf-8")
@@ -127,9 +861,82 @@ def test_crop_center_uses_inspected_dimensions(monkeypatch, tmp_path: Path) -> N
     assert out["ok"] is True
 
 
+def test_crop_center_reads_dimensions_from_the_header(monkeypatch, tmp_path: Path) -> None:
+    image = tmp_path / "img.png"
+    Image.new("RGB", (100, 60)).save(image)
+    seen = []
+
+    def fake_run_action(action: str, payload: dict, timeout_seconds: float = 0):  # noqa: ANN001
+        seen.append((action, payload))
+        return {"ok": True}
+
+    monkeypatch.setattr(operations, "_run_action", fake_run_action)
+    operations.handle_method("image.crop_center", {"image": str(image), "width": 40, "height": 20})
+    assert [a for a, _ in seen] == ["crop"]
+    assert (seen[0][1]["x"], seen[0][1]["y"]) == (30, 20)
+
+
+def test_auto_snapshot_only_for_in_place_edits(monkeypatch, tmp_path: Path) -> None:
+    image = tmp_path / "img.png"
+    image.write_bytes(b"png")
+    seen = []
+    monkeypatch.setattr(operations, "_snapshot_image", lambda path, label: seen.append(label))
+    monkeypatch.chdir(tmp_path)
+    operations._maybe_auto_snapshot(image, {}, "a")
+    operations._maybe_auto_snapshot(image, {"output": str(image)}, "b")
+    operations._maybe_auto_snapshot(image, {"output": "img.png"}, "c")
+    operations._maybe_auto_snapshot(image, {"output": str(tmp_path / "other.png")}, "d")
+    assert seen == ["auto-before-a", "auto-before-b", "auto-before-c"]
+
+
+def test_snapshots_share_content_addressed_blobs(tmp_path: Path) -> None:
+    image = tmp_path / "img.png"
+    image.write_bytes(b"one")
+    first = operations.handle_method("image.snapshot", {"image": str(image), "description": "a"})
+    second = operations.handle_method("image.snapshot", {"image": str(image), "description": "b"})
+    assert first["snapshot"] == second["snapshot"]
+    assert second["count"] == 2
+    image.write_bytes(b"two")
+    operations.handle_method("image.snapshot", {"image": str(image)})
+    operations.handle_method("image.undo", {"image": str(image)})
+    assert image.read_bytes() == b"one"
+    operations.handle_method("image.snapshot", {"image": str(image)})
+    assert operations.handle_method("history.gc", {}) == {"removed": 1, "freedBytes": 3}
+    assert Path(first["snapshot"]).exists()
+
+
+def test_history_gc_waits_for_in_flight_snapshots(monkeypatch, tmp_path: Path) -> None:
+    image = tmp_path / "img.png"
+    image.write_bytes(b"fresh")
+    stored = threading.Event()
+    release = threading.Event()
+    append = operations._history_append
+
+    def slow_append(key, op):  # noqa: ANN001
+        stored.set()
+        release.wait(10)
+        append(key, op)
+
+    monkeypatch.setattr(operations, "_history_append", slow_append)
+    snapshot = threading.Thread(target=operations.handle_method, args=("image.snapshot", {"image": str(image)}))
+    snapshot.start()
+    assert stored.wait(10)
+    gc_result: list = []
+    gc = threading.Thread(target=lambda: gc_result.append(operations.handle_method("history.gc", {})))
+    gc.start()
+    gc.join(0.2)
+    assert gc.is_alive()
+    release.set()
+    snapshot.join(10)
+    gc.join(10)
+    assert gc_result == [{"removed": 0, "freedBytes": 0}]
+    state = operations._image_history(str(image.resolve()))
+    assert operations._snapshot_path(state["snapshots"][-1]).exists()
+
+
 def test_doctor_verbose_includes_runtime(monkeypatch, tmp_path: Path) -> None:
-    monkeypatch.setattr(operations, "resolve_gimp_binary", lambda: tmp_path / "gimp.exe")
-    monkeypatch.setattr(operations, "resolve_profile_dir", lambda: tmp_path / "profile")
+    monkeypatch.setattr(operations, "resolve_gimp_binary", lambda refresh=False: tmp_path / "gimp.exe")
+    monkeypatch.setattr(operations, "resolve_profile_dir", lambda refresh=False: tmp_path / "profile")
 
     class DummyProc:
         returncode = 0
@@ -141,3 +948,21 @@ def test_doctor_verbose_includes_runtime(monkeypatch, tmp_path: Path) -> None:
     assert out["healthy"] is True
     assert "runtime" in out
     assert "pythonExecutable" in out["runtime"]
+
+
+def test_bounded_map_keeps_order_and_caps_in_flight() -> None:
+    in_flight = []
+    submitted = []
+
+    class Recorder(operations.ThreadPoolExecutor):
+        def submit(self, fn, *args):
+            submitted.append(args[0])
+            in_flight.append(len(submitted) - len(done))
+            return super().submit(fn, *args)
+
+    done: list = []
+    with Recorder(max_workers=2) as executor:
+        for value in operations._bounded_map(executor, lambda x: x * 10, list(range(7)), 3):
+            done.append(value)
+    assert done == [0, 10, 20, 30, 40, 50, 60]
+    assert max(in_flight) <= 3